@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class AdminApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'admin_api' 
\ No newline at end of file
+    name = 'admin_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,115 @@
+"""
+Authentication for the admin API
+
+Admin requests carry either the JWT issued by admin_login
+(`Authorization: Bearer <jwt>`) or a REST framework token
+(`Authorization: Token <key>`). Verifying either means a signature check
+or a token lookup plus a user query, and the admin dashboard fires dozens
+of requests per page, so the verified user is kept in the default cache
+(Redis, shared by every worker, see the CACHES setting) under the SHA-256
+of the token, for at most ADMIN_AUTH_CACHE_TTL seconds and never past the
+JWT's expiry. Only access tokens authenticate: the refresh token
+admin_login issues alongside is good for refresh_token alone.
+
+Each user's cached tokens are tagged with a per-user generation, which
+admin_api.signals replaces whenever the user is saved or deleted (so a
+change to is_staff, is_superuser or is_active takes effect on the next
+request) or one of their tokens is deleted. Queryset updates send no
+signals; the TTL bounds how long those go unnoticed.
+"""
+import hashlib
+import logging
+import time
+import uuid
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def _token_key(raw_token):
+    return f"admin:auth:{hashlib.sha256(raw_token.encode()).hexdigest()}"
+
+
+def _generation_key(user_id):
+    return f"admin:auth:user:{user_id}:generation"
+
+
+def invalidate_user(user_id):
+    """Forget every cached token of a user"""
+    cache.set(_generation_key(user_id), uuid.uuid4().hex, settings.ADMIN_AUTH_CACHE_TTL)
+
+
+class AdminAuthentication(authentication.BaseAuthentication):
+    """
+    Bearer JWT or Token authentication, with the verified user cached per token
+    """
+    def authenticate(self, request):
+        parts = authentication.get_authorization_header(request).split()
+        if len(parts) != 2 or parts[0] not in (b'Bearer', b'Token'):
+            return None
+        scheme, raw_token = parts[0].decode(), parts[1].decode('latin-1')
+
+        user = self._cached(raw_token)
+        if user is None:
+            if scheme == 'Bearer':
+                user_id, expires_at = self._verify_jwt(raw_token)
+            else:
+                user_id, expires_at = self._verify_token(raw_token), None
+            # Taken before the user is read: if a save replaces it meanwhile, the entry is not kept
+            generation = self._generation(user_id)
+            try:
+                user = User.objects.get(pk=user_id)
+            except (User.DoesNotExist, ValueError, TypeError):
+                logger.warning(f"Admin token for unknown user {user_id}")
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            self._cache(raw_token, generation, user, expires_at)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return user, raw_token
+
+    def authenticate_header(self, request):
+        return 'Bearer'
+
+    def _verify_jwt(self, raw_token):
+        try:
+            payload = jwt.decode(raw_token, settings.SECRET_KEY, algorithms=['HS256'], options={'require': ['exp']})
+        except jwt.ExpiredSignatureError:
+            raise exceptions.AuthenticationFailed('Token expired.')
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if payload.get('token_type', 'access') != 'access':
+            raise exceptions.AuthenticationFailed('Invalid token type.')
+        return payload.get('user_id'), payload['exp']
+
+    def _verify_token(self, raw_token):
+        user_id = Token.objects.filter(key=raw_token).values_list('user_id', flat=True).first()
+        if user_id is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return user_id
+
+    def _generation(self, user_id):
+        cache.add(_generation_key(user_id), uuid.uuid4().hex, settings.ADMIN_AUTH_CACHE_TTL)
+        return cache.get(_generation_key(user_id))
+
+    def _cached(self, raw_token):
+        entry = cache.get(_token_key(raw_token))
+        if entry is None:
+            return None
+        generation, user = entry
+        if cache.get(_generation_key(user.pk)) != generation:
+            return None
+        return user
+
+    def _cache(self, raw_token, generation, user, expires_at):
+        timeout = settings.ADMIN_AUTH_CACHE_TTL
+        if expires_at is not None:
+            timeout = min(timeout, int(expires_at - time.time()))
+        if generation is not None and timeout > 0 and cache.get(_generation_key(user.pk)) == generation:
+            cache.set(_token_key(raw_token), (generation, user), timeout)
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from edufundz.stats_cache import LOANS, TRANSACTIONS, USERS, WALLETS, invalidate_stats
+from loans.models import Loan
+from users.models import User
+from wallet.models import Transaction, Wallet
+from .authentication import invalidate_user
+
+
+# Cached admin principals (see admin_api.authentication) go stale when their
+# user changes, is_staff included, or when a token is revoked
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    invalidate_stats(USERS)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+# Bulk writes send no signals, they invalidate the stats themselves
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def loan_changed(sender, instance, **kwargs):
+    invalidate_stats(LOANS)
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+def wallet_changed(sender, instance, **kwargs):
+    invalidate_stats(WALLETS)
+
+
+# Transaction stats count by type, which is fixed at creation
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_stats(TRANSACTIONS)
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_deleted(sender, instance, **kwargs):
+    invalidate_stats(TRANSACTIONS)
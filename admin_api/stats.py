@@ -0,0 +1,42 @@
+"""
+Admin statistics, one conditional aggregate query per table, cached
+
+See edufundz.stats_cache for how the cache is kept current.
+"""
+from django.db.models import Count, Q, Sum
+from edufundz.stats_cache import LOANS, TRANSACTIONS, USERS, WALLETS, cached_stats
+from loans.models import Loan
+from users.models import User
+from wallet.models import Transaction, Wallet
+
+
+def user_stats():
+    return cached_stats(USERS, lambda: User.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    ))
+
+
+def loan_stats():
+    return cached_stats(LOANS, lambda: Loan.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        paid=Count('id', filter=Q(status='paid')),
+        defaulted=Count('id', filter=Q(status='defaulted')),
+        active_amount=Sum('amount', filter=Q(status='active')),
+    ))
+
+
+def transaction_stats():
+    return cached_stats(TRANSACTIONS, lambda: Transaction.objects.aggregate(
+        total=Count('id'),
+        deposits=Count('id', filter=Q(transaction_type='deposit')),
+        withdrawals=Count('id', filter=Q(transaction_type='withdrawal')),
+    ))
+
+
+def wallet_stats():
+    return cached_stats(WALLETS, lambda: Wallet.objects.aggregate(
+        total=Count('id'),
+        balance=Sum('balance'),
+    ))
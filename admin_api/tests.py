@@ -0,0 +1,176 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from loans.approvals import approve_application
+from loans.models import Loan, LoanApplication, Repayment
+from users.models import User
+from wallet.ledger import credit_wallet
+from wallet.models import Wallet
+
+
+class AdminAPITestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@example.com', username='admin', password='pw', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_application(self, amount='1200.00'):
+        borrower = User.objects.create_user(
+            email=f"borrower{User.objects.count()}@example.com", username=f"borrower{User.objects.count()}"
+        )
+        return LoanApplication.objects.create(user=borrower, amount=Decimal(amount), reason='tuition')
+
+    def create_loan(self, amount='1200.00', term_months=12):
+        return approve_application(self.create_application(amount), Decimal('0'), term_months)
+
+
+class BulkApprovalTests(AdminAPITestCase):
+    url = '/api/admin/loan-applications/bulk_approve/'
+
+    def test_approves_each_application(self):
+        applications = [self.create_application() for _ in range(3)]
+
+        response = self.client.post(self.url, {
+            'applications': [{'id': application.id} for application in applications],
+            'term_months': 6,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['approved'], 3)
+        self.assertEqual(Loan.objects.filter(term_months=6).count(), 3)
+
+    def test_rejects_terms_over_600_months(self):
+        application = self.create_application()
+
+        for payload in (
+            {'applications': [{'id': application.id}], 'term_months': 601},
+            {'applications': [{'id': application.id, 'term_months': 601}]},
+        ):
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, 400)
+
+        self.assertFalse(Loan.objects.exists())
+
+
+class RepaymentAdminTests(AdminAPITestCase):
+    url = '/api/admin/repayments/'
+
+    def test_creating_a_paid_repayment_counts_towards_the_loan(self):
+        loan = self.create_loan(amount='100.00', term_months=1)
+        Repayment.objects.filter(loan=loan).delete()
+
+        response = self.client.post(self.url, {
+            'loan': loan.id, 'amount': '100.00', 'due_date': '2030-01-01', 'status': 'paid',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user'], loan.user_id)
+        loan.refresh_from_db()
+        self.assertEqual(loan.amount_paid, Decimal('100.00'))
+        self.assertEqual(loan.status, 'paid')
+
+    def test_creating_a_pending_repayment_leaves_the_loan_alone(self):
+        loan = self.create_loan()
+
+        response = self.client.post(self.url, {
+            'loan': loan.id, 'amount': '50.00', 'due_date': '2030-01-01',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        loan.refresh_from_db()
+        self.assertEqual(loan.amount_paid, Decimal('0.00'))
+
+    def test_editing_and_deleting_keep_the_running_total(self):
+        loan = self.create_loan()
+        repayment = loan.repayments.order_by('due_date').first()
+
+        self.client.patch(f"{self.url}{repayment.id}/", {'status': 'paid'}, format='json')
+        loan.refresh_from_db()
+        self.assertEqual(loan.amount_paid, repayment.amount)
+
+        self.client.delete(f"{self.url}{repayment.id}/")
+        loan.refresh_from_db()
+        self.assertEqual(loan.amount_paid, Decimal('0.00'))
+
+
+class StatsTests(AdminAPITestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def test_wallet_stats_follow_balance_changes(self):
+        wallets = [Wallet.objects.create(user=self.create_application().user) for _ in range(2)]
+        response = self.client.get('/api/admin/wallets/stats/')
+        self.assertEqual(response.data, {'total_wallets': 2, 'total_balance': 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            credit_wallet(wallets[0].id, Decimal('10.50'), 'paystack')
+            credit_wallet(wallets[1].id, Decimal('4.25'), 'paystack')
+
+        response = self.client.get('/api/admin/wallets/stats/')
+        self.assertEqual(response.data, {'total_wallets': 2, 'total_balance': Decimal('14.75')})
+
+    def test_loan_stats_follow_new_loans(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_loan(amount='500.00')
+        self.assertEqual(self.client.get('/api/admin/dashboard/stats/').data['totalLoanAmount'], Decimal('500.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_loan(amount='250.00')
+        response = self.client.get('/api/admin/loans/stats/')
+        self.assertEqual(response.data['active_loans'], 2)
+        self.assertEqual(self.client.get('/api/admin/dashboard/stats/').data['totalLoanAmount'], Decimal('750.00'))
+
+
+class AdminAuthenticationTests(TestCase):
+    url = '/api/admin/test-auth/'
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(email='admin@example.com', username='admin', password='pw', is_staff=True)
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/admin/login/', {'email': 'admin@example.com', 'password': 'pw'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get(self, authorization):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=authorization).status_code
+
+    def test_accepts_access_tokens_only(self):
+        tokens = self.login()
+
+        self.assertEqual(self.get(f"Bearer {tokens['access_token']}"), 200)
+        self.assertEqual(self.get(f"Bearer {tokens['refresh_token']}"), 401)
+        self.assertEqual(self.get('Bearer not-a-jwt'), 401)
+
+    def test_demotion_takes_effect_on_the_next_request(self):
+        authorization = f"Bearer {self.login()['access_token']}"
+        self.assertEqual(self.get(authorization), 200)
+
+        # Queryset updates send no signal, the cached user stands until the TTL
+        User.objects.filter(pk=self.admin.pk).update(is_staff=False)
+        self.assertEqual(self.get(authorization), 200)
+
+        self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(self.get(authorization), 403)
+
+    def test_deactivation_takes_effect_on_the_next_request(self):
+        authorization = f"Bearer {self.login()['access_token']}"
+        self.assertEqual(self.get(authorization), 200)
+
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.get(authorization), 401)
+
+    def test_deleted_token_is_revoked(self):
+        token = Token.objects.create(user=self.admin)
+        self.assertEqual(self.get(f"Token {token.key}"), 200)
+
+        token.delete()
+        self.assertEqual(self.get(f"Token {token.key}"), 401)
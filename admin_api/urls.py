@@ -9,6 +9,8 @@ from .views import (
     TransactionAdminViewSet,
     VirtualAccountAdminViewSet,
     dashboard_stats,
+    aging_report,
+    cash_flow_projection,
     admin_login,
     refresh_token,
     test_auth
@@ -26,6 +28,8 @@ router.register(r'virtual-accounts', VirtualAccountAdminViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/stats/', dashboard_stats, name='dashboard-stats'),
+    path('reports/aging/', aging_report, name='aging-report'),
+    path('reports/cash-flow/', cash_flow_projection, name='cash-flow-projection'),
     path('login/', admin_login, name='admin-login'),
     path('refresh-token/', refresh_token, name='refresh-token'),
     path('test-auth/', test_auth, name='test-auth'),
@@ -1,19 +1,26 @@
 from rest_framework import viewsets, permissions, status, views
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
+from rest_framework.filters import OrderingFilter
 from django.contrib.auth import authenticate
 from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from users.models import User
 from loans.models import Loan, LoanApplication, Repayment
 from wallet.models import Wallet, Transaction, VirtualAccount
 from users.serializers import UserSerializer
-from loans.serializers import LoanSerializer, LoanApplicationSerializer, RepaymentSerializer
+from loans.serializers import LoanSerializer, LoanApplicationAdminSerializer, RepaymentSerializer, BulkApprovalSerializer, LoanPaymentSerializer
+from loans.approvals import approve_application, bulk_approve_applications
+from loans.reamortization import apply_payment
+from loans.reports import AGING_GROUPS, portfolio_aging
+from loans.projection import iter_csv, parse_curve, project_cash_flows
 from wallet.serializers import WalletSerializer, TransactionSerializer, VirtualAccountSerializer
-from django.db.models import Sum
+from .authentication import AdminAuthentication
+from .stats import loan_stats, transaction_stats, user_stats, wallet_stats
+from django.db import transaction
 import jwt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
 from rest_framework.permissions import AllowAny
 
@@ -23,82 +30,17 @@ logger = logging.getLogger(__name__)
 class AdminPermission(permissions.BasePermission):
     """
     Custom permission to only allow admin users to access admin API
+    
+    Pairs with AdminAuthentication, which verifies the Bearer or Token header
     """
     def has_permission(self, request, view):
-        # Log the request details for debugging
-        logger.info(f"AdminPermission check - Path: {request.path}, Method: {request.method}")
-        logger.info(f"Headers: {request.META.get('HTTP_AUTHORIZATION', 'No Authorization header')}")
-        
-        # Check for Authorization header
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        logger.info(f"Auth header: {auth_header}")
-        
-        if not auth_header:
-            logger.warning("Missing Authorization header")
+        user = request.user
+        if not user or not user.is_authenticated:
             return False
-        
-        # Support both Token and Bearer formats
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            logger.info("Using Bearer token format")
-            try:
-                # Decode token and verify
-                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                user_id = payload.get('user_id')
-                
-                # Check if token is expired
-                exp = payload.get('exp')
-                if datetime.fromtimestamp(exp) < datetime.now():
-                    logger.warning(f"Token expired for user {user_id}")
-                    return False
-                    
-                # Get user and check if admin
-                user = User.objects.get(id=user_id)
-                if not user.is_staff and not user.is_superuser:
-                    logger.warning(f"User {user.email} is not an admin")
-                    return False
-                    
-                # Attach user to request
-                request.user = user
-                logger.info(f"Successfully authenticated admin user: {user.email}")
-                return True
-                
-            except jwt.ExpiredSignatureError:
-                logger.warning("Token signature expired")
-                return False
-            except jwt.InvalidTokenError:
-                logger.warning("Invalid token")
-                return False
-            except User.DoesNotExist:
-                logger.warning(f"User with ID {user_id} not found")
-                return False
-            except Exception as e:
-                logger.error(f"Error validating token: {str(e)}")
-                return False
-        elif auth_header.startswith('Token '):
-            # Support legacy token format for compatibility
-            token_key = auth_header.split(' ')[1]
-            logger.info("Using Token format")
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-                if not user.is_staff and not user.is_superuser:
-                    logger.warning(f"User {user.email} is not an admin (Token auth)")
-                    return False
-                    
-                # Attach user to request
-                request.user = user
-                logger.info(f"Successfully authenticated admin user via Token: {user.email}")
-                return True
-            except Token.DoesNotExist:
-                logger.warning("Invalid token key")
-                return False
-            except Exception as e:
-                logger.error(f"Error validating token: {str(e)}")
-                return False
-        else:
-            logger.warning(f"Unsupported authorization format: {auth_header[:15]}...")
+        if not user.is_staff and not user.is_superuser:
+            logger.warning(f"User {user.email} is not an admin")
             return False
+        return True
 
 
 @csrf_exempt
@@ -272,17 +214,17 @@ class UserAdminViewSet(viewsets.ModelViewSet):
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    authentication_classes = [AdminAuthentication]
     permission_classes = [AdminPermission]
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get user statistics"""
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
+        stats = user_stats()
         
         return Response({
-            'total_users': total_users,
-            'active_users': active_users,
+            'total_users': stats['total'],
+            'active_users': stats['active'],
         })
 
 
@@ -292,31 +234,61 @@ class LoanAdminViewSet(viewsets.ModelViewSet):
     """
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
+    authentication_classes = [AdminAuthentication]
     permission_classes = [AdminPermission]
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get loan statistics"""
-        total_loans = Loan.objects.count()
-        active_loans = Loan.objects.filter(status='active').count()
-        paid_loans = Loan.objects.filter(status='paid').count()
-        defaulted_loans = Loan.objects.filter(status='defaulted').count()
+        stats = loan_stats()
         
         return Response({
-            'total_loans': total_loans,
-            'active_loans': active_loans,
-            'paid_loans': paid_loans,
-            'defaulted_loans': defaulted_loans,
+            'total_loans': stats['total'],
+            'active_loans': stats['active'],
+            'paid_loans': stats['paid'],
+            'defaulted_loans': stats['defaulted'],
         })
+    
+    @action(detail=True, methods=['post'])
+    def apply_payment(self, request, pk=None):
+        """
+        Record a payment received outside the wallet (e.g. a bank transfer)
+        
+        Settles whole installments and re-amortizes the rest of the schedule
+        with the given strategy (reduce_installment or reduce_term).
+        """
+        loan = self.get_object()
+        serializer = LoanPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        result = apply_payment(
+            loan.id,
+            data['amount'],
+            strategy=data['strategy'],
+            payment_date=data.get('payment_date'),
+            transaction_id=data.get('transaction_id') or None
+        )
+        if result['status'] != 'applied':
+            return Response({'detail': result['detail']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        logger.info(f"Payment of {data['amount']} applied to loan #{loan.id} by {request.user.email}")
+        return Response(result)
 
 
 class LoanApplicationAdminViewSet(viewsets.ModelViewSet):
     """
     API endpoint for admin to manage loan applications
+    
+    Sortable with ?ordering=, e.g. ?ordering=-risk_score for riskiest first
     """
     queryset = LoanApplication.objects.all()
-    serializer_class = LoanApplicationSerializer
+    serializer_class = LoanApplicationAdminSerializer
+    authentication_classes = [AdminAuthentication]
     permission_classes = [AdminPermission]
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['risk_score', 'created_at', 'amount']
+    ordering = ['-created_at']
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -329,14 +301,44 @@ class LoanApplicationAdminViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update application status
-        application.status = 'approved'
-        application.save()
+        try:
+            approve_application(
+                application=application,
+                interest_rate=request.data.get('interest_rate', 5.0),
+                term_months=request.data.get('term_months', 12)
+            )
+        except Exception as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Return updated application
         serializer = self.get_serializer(application)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        """
+        Approve many applications in one call
+        
+        Expects {"applications": [{"id": 1, "interest_rate": 5, "term_months": 12}, ...]},
+        with optional batch-wide "interest_rate" and "term_months" defaults.
+        Returns one result per application.
+        """
+        serializer = BulkApprovalSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = bulk_approve_applications(
+            serializer.validated_data['applications'],
+            chunk_size=getattr(settings, 'LOAN_BULK_APPROVAL_CHUNK_SIZE', 500)
+        )
+        approved = sum(1 for result in results if result['status'] == 'approved')
+        logger.info(f"Bulk approval by {request.user.email}: {approved}/{len(results)} approved")
+        
+        return Response({
+            'approved': approved,
+            'failed': len(results) - approved,
+            'results': results,
+        })
+    
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
         """Reject a loan application"""
@@ -363,7 +365,35 @@ class RepaymentAdminViewSet(viewsets.ModelViewSet):
     """
     queryset = Repayment.objects.all()
     serializer_class = RepaymentSerializer
+    authentication_classes = [AdminAuthentication]
     permission_classes = [AdminPermission]
+    
+    def perform_create(self, serializer):
+        # A repayment created as paid counts towards the loan like a settled one
+        with transaction.atomic():
+            loan = serializer.validated_data['loan']
+            repayment = serializer.save(user_id=loan.user_id)
+            if repayment.status == 'paid':
+                Loan.record_payment(repayment.loan_id, repayment.amount)
+    
+    def perform_update(self, serializer):
+        # Keep the loan's running total in step with manual status/amount edits
+        with transaction.atomic():
+            previous = Repayment.objects.select_for_update().get(pk=serializer.instance.pk)
+            repayment = serializer.save()
+            delta = self._paid_amount(repayment) - self._paid_amount(previous)
+            if delta:
+                Loan.record_payment(repayment.loan_id, delta)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            if instance.status == 'paid':
+                Loan.record_payment(instance.loan_id, -instance.amount)
+            instance.delete()
+    
+    @staticmethod
+    def _paid_amount(repayment):
+        return repayment.amount if repayment.status == 'paid' else 0
 
 
 class WalletAdminViewSet(viewsets.ModelViewSet):
@@ -372,17 +402,17 @@ class WalletAdminViewSet(viewsets.ModelViewSet):
     """
     queryset = Wallet.objects.all()
     serializer_class = WalletSerializer
+    authentication_classes = [AdminAuthentication]
     permission_classes = [AdminPermission]
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get wallet statistics"""
-        total_wallets = Wallet.objects.count()
-        total_balance = sum(wallet.balance for wallet in Wallet.objects.all())
+        stats = wallet_stats()
         
         return Response({
-            'total_wallets': total_wallets,
-            'total_balance': total_balance,
+            'total_wallets': stats['total'],
+            'total_balance': stats['balance'] or 0,
         })
 
 
@@ -392,19 +422,18 @@ class TransactionAdminViewSet(viewsets.ModelViewSet):
     """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    authentication_classes = [AdminAuthentication]
     permission_classes = [AdminPermission]
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get transaction statistics"""
-        total_transactions = Transaction.objects.count()
-        total_deposits = Transaction.objects.filter(transaction_type='deposit').count()
-        total_withdrawals = Transaction.objects.filter(transaction_type='withdrawal').count()
+        stats = transaction_stats()
         
         return Response({
-            'total_transactions': total_transactions,
-            'total_deposits': total_deposits,
-            'total_withdrawals': total_withdrawals,
+            'total_transactions': stats['total'],
+            'total_deposits': stats['deposits'],
+            'total_withdrawals': stats['withdrawals'],
         })
 
 
@@ -414,43 +443,97 @@ class VirtualAccountAdminViewSet(viewsets.ModelViewSet):
     """
     queryset = VirtualAccount.objects.all()
     serializer_class = VirtualAccountSerializer
+    authentication_classes = [AdminAuthentication]
     permission_classes = [AdminPermission] 
 
 
 @api_view(['GET'])
+@authentication_classes([AdminAuthentication])
 @permission_classes([AdminPermission])
 def dashboard_stats(request):
     """
     Aggregated statistics for the admin dashboard
-    """
-    # User stats
-    total_users = User.objects.count()
     
-    # Loan stats
-    active_loans = Loan.objects.filter(status='active').count()
-    total_loans = Loan.objects.count()
-    paid_loans = Loan.objects.filter(status='paid').count()
-    
-    # Calculate loan amounts
-    total_loan_amount = Loan.objects.filter(status='active').aggregate(
-        Sum('amount')
-    )['amount__sum'] or 0
+    One aggregate query per table, served from the stats cache
+    """
+    users = user_stats()
+    loans = loan_stats()
     
     # Calculate repayment rate
     repayment_rate = 0
-    if total_loans > 0:
-        repayment_rate = (paid_loans / total_loans) * 100
+    if loans['total'] > 0:
+        repayment_rate = (loans['paid'] / loans['total']) * 100
         repayment_rate = round(repayment_rate, 1)  # Round to 1 decimal place
     
     return Response({
-        'totalUsers': total_users,
-        'activeLoans': active_loans,
-        'totalLoanAmount': total_loan_amount,
+        'totalUsers': users['total'],
+        'activeLoans': loans['active'],
+        'totalLoanAmount': loans['active_amount'] or 0,
         'repaymentRate': repayment_rate,
     })
 
 
 @api_view(['GET'])
+@authentication_classes([AdminAuthentication])
+@permission_classes([AdminPermission])
+def aging_report(request):
+    """
+    Outstanding repayments bucketed by days past due
+    
+    Optional ?group_by=loan_status|reason|school
+    """
+    group_by = request.query_params.get('group_by') or None
+    if group_by is not None and group_by not in AGING_GROUPS:
+        return Response(
+            {'detail': f"group_by must be one of: {', '.join(AGING_GROUPS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        'as_of': date.today(),
+        'group_by': group_by,
+        'results': portfolio_aging(group_by=group_by),
+    })
+
+
+@api_view(['GET'])
+@authentication_classes([AdminAuthentication])
+@permission_classes([AdminPermission])
+def cash_flow_projection(request):
+    """
+    Expected monthly inflows across all active loans
+    
+    Query params: months (default 12), default_curve and prepayment_curve
+    (comma-separated monthly rates by loan age), output=json|csv
+    """
+    try:
+        months = int(request.query_params.get('months', 12))
+        default_curve = request.query_params.get('default_curve')
+        prepayment_curve = request.query_params.get('prepayment_curve')
+        default_curve = parse_curve(default_curve) if default_curve else None
+        prepayment_curve = parse_curve(prepayment_curve) if prepayment_curve else None
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not 1 <= months <= 120:
+        return Response({'detail': 'months must be between 1 and 120'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    projection = project_cash_flows(
+        months=months,
+        default_curve=default_curve,
+        prepayment_curve=prepayment_curve
+    )
+    
+    if request.query_params.get('output') == 'csv':
+        response = StreamingHttpResponse(iter_csv(projection), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="cash-flow-projection.csv"'
+        return response
+    
+    return Response({'months': months, 'results': projection})
+
+
+@api_view(['GET'])
+@authentication_classes([AdminAuthentication])
 @permission_classes([AdminPermission])
 def test_auth(request):
     """
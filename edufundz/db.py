@@ -0,0 +1,66 @@
+from django.db import connections, router
+
+
+def bulk_update_values(objs, fields, batch_size=1000, increment=()):
+    """
+    Write per-row values of `fields` for many saved objects of one model
+
+    Does what QuerySet.bulk_update does, but as a join against a VALUES list
+    (UPDATE ... FROM (VALUES ...)) instead of one CASE WHEN per row and field,
+    so the cost stays linear in the number of rows. Works on PostgreSQL and
+    SQLite 3.33+. Like bulk_update, it sends no signals and does not touch
+    auto_now fields unless they are listed.
+
+    Args:
+        objs (list): Saved model instances of the same model
+        fields (list): Names of the concrete fields to write
+        increment (list, optional): Fields among `fields` whose values are
+            added to the current column value instead of replacing it
+
+    Returns:
+        int: Number of rows updated
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+
+    model = type(objs[0])
+    meta = model._meta
+    # The connection itself, not the django.db.connection proxy: values are prepared per row and field
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(meta.db_table)
+    pk = meta.pk
+    fields = [meta.get_field(name) for name in fields]
+
+    def placeholder(field):
+        # PostgreSQL types VALUES columns from their contents, cast so NULLs and dates land correctly
+        if connection.vendor == 'postgresql':
+            return f"CAST(%s AS {field.db_type(connection)})"
+        return '%s'
+
+    row_sql = '(' + ', '.join(placeholder(field) for field in [pk, *fields]) + ')'
+
+    def assignment(position, field):
+        column = connection.ops.quote_name(field.column)
+        if field.name in increment:
+            return f"{column} = {table}.{column} + v.column{position}"
+        return f"{column} = v.column{position}"
+
+    assignments = ', '.join(assignment(position, field) for position, field in enumerate(fields, start=2))
+
+    updated = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            params = []
+            for obj in batch:
+                params.append(pk.get_db_prep_save(obj.pk, connection))
+                params.extend(field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields)
+            cursor.execute(
+                f"UPDATE {table} SET {assignments} "
+                f"FROM (VALUES {', '.join([row_sql] * len(batch))}) AS v "
+                f"WHERE {table}.{connection.ops.quote_name(pk.column)} = v.column1",
+                params
+            )
+            updated += cursor.rowcount
+    return updated
@@ -1,16 +1,67 @@
 import re
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+# A sync-only middleware makes Django run the whole chain below it, async
+# views included, through a thread per request. Both middlewares here support
+# either mode so the async views stay on the event loop under ASGI.
 
 class CSRFExemptMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
         self.csrf_exempt_urls = [re.compile(url) for url in getattr(settings, 'CSRF_EXEMPT_URLS', [])]
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        self.exempt(request)
+        response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        self.exempt(request)
+        return await self.get_response(request)
+
+    def exempt(self, request):
         # Mark the request as CSRF exempt if the path matches any exempt URLs
         path = request.path.lstrip('/')
         if any(pattern.match(path) for pattern in self.csrf_exempt_urls):
             request._dont_enforce_csrf_checks = True
-            
-        response = self.get_response(request)
-        return response 
\ No newline at end of file
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise middleware that also runs in async mode
+
+    Static files are still served by WhiteNoise's sync code, off the event
+    loop; every other request goes straight on to the async handler.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,125 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a (timestamp, id) key, newest first
+
+    REST framework's CursorPagination keys on the first ordering field only
+    and skips rows sharing its value with an OFFSET. This pages on the full
+    (timestamp, id) key instead: a page is one range condition plus LIMIT,
+    so with an index ending in (timestamp, id) page N costs what page 1
+    does. Responses look like CursorPagination's: next, previous, results.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    timestamp_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+        field = self.timestamp_field
+
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            timestamp, pk, reverse = cursor
+            if not reverse:
+                # The redundant bound on the timestamp alone lets the database
+                # seek into the index instead of filtering from its start
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}),
+                    **{f'{field}__lte': timestamp}
+                ).order_by(f'-{field}', '-id')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}),
+                    **{f'{field}__gte': timestamp}
+                ).order_by(field, 'id')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Paging backwards means there is a next page, and the other way round
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def decode_cursor(self, request):
+        """The (timestamp, id, reverse) position in the request, or None on the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            timestamp, pk, reverse = urlsafe_b64decode(encoded.encode()).decode().split('|')
+            timestamp = parse_datetime(timestamp)
+            if timestamp is None:
+                raise ValueError
+            return timestamp, int(pk), reverse == 'r'
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        position = f"{getattr(row, self.timestamp_field).isoformat()}|{row.pk}|{'r' if reverse else 'f'}"
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, urlsafe_b64encode(position.encode()).decode()
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -62,7 +63,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'edufundz.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise, async capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
     'django.middleware.common.CommonMiddleware',
@@ -106,6 +107,22 @@ DATABASES = {
     )
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The wallet id, admin token and admin statistics caches are invalidated by
+# whichever worker handles the write, so every worker must share one cache:
+# Redis at REDIS_URL. Development falls back to the per-process memory cache.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif not DEBUG:
+    raise ImproperlyConfigured('REDIS_URL must be set when DEBUG is off, the worker processes share its cache')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -172,6 +189,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -210,3 +228,46 @@ AUTHENTICATION_BACKENDS = [
 # Paystack settings (using environment variables)
 PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', 'sk_test_your_paystack_test_key')
 PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY', 'pk_test_your_paystack_test_key')
+# Point at a local stand-in (python manage.py run_fake_paystack) for load tests
+PAYSTACK_BASE_URL = os.environ.get('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+# Paystack HTTP client: timeouts in seconds, retries apply to idempotent calls only
+PAYSTACK_CONNECT_TIMEOUT = float(os.environ.get('PAYSTACK_CONNECT_TIMEOUT', 3.05))
+PAYSTACK_READ_TIMEOUT = float(os.environ.get('PAYSTACK_READ_TIMEOUT', 10))
+PAYSTACK_MAX_RETRIES = int(os.environ.get('PAYSTACK_MAX_RETRIES', 2))
+PAYSTACK_RETRY_BACKOFF = float(os.environ.get('PAYSTACK_RETRY_BACKOFF', 0.25))
+PAYSTACK_POOL_SIZE = int(os.environ.get('PAYSTACK_POOL_SIZE', 20))
+# Calls the async client keeps in flight per event loop, beyond this they queue
+PAYSTACK_ASYNC_MAX_CONNECTIONS = int(os.environ.get('PAYSTACK_ASYNC_MAX_CONNECTIONS', 100))
+# Consecutive failures before calls fail fast, and seconds before a trial call
+PAYSTACK_BREAKER_THRESHOLD = int(os.environ.get('PAYSTACK_BREAKER_THRESHOLD', 5))
+PAYSTACK_BREAKER_RESET_TIMEOUT = float(os.environ.get('PAYSTACK_BREAKER_RESET_TIMEOUT', 30))
+
+# Idempotency-Key store: hours a key replays its response, and seconds after
+# which a request holding a key is presumed dead and the key can be reclaimed
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+IDEMPOTENCY_KEY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_KEY_LOCK_TIMEOUT', 120))
+
+# Seconds the user -> wallet id mapping stays in the cache (see wallet.resolver)
+WALLET_ID_CACHE_TTL = int(os.environ.get('WALLET_ID_CACHE_TTL', 60))
+# Seconds a verified admin token keeps its user in the cache, never past the
+# token's expiry (see admin_api.authentication)
+ADMIN_AUTH_CACHE_TTL = int(os.environ.get('ADMIN_AUTH_CACHE_TTL', 300))
+# Seconds the admin statistics stay cached between the writes that invalidate
+# them (see edufundz.stats_cache)
+ADMIN_STATS_CACHE_TTL = int(os.environ.get('ADMIN_STATS_CACHE_TTL', 60))
+
+# Loan settings
+LOAN_BULK_APPROVAL_CHUNK_SIZE = int(os.environ.get('LOAN_BULK_APPROVAL_CHUNK_SIZE', 500))
+LOAN_AMORTIZATION_CACHE_SIZE = int(os.environ.get('LOAN_AMORTIZATION_CACHE_SIZE', 1024))
+# 'materialized' stores every installment at approval, 'virtual' derives them on read
+LOAN_SCHEDULE_MODE = os.environ.get('LOAN_SCHEDULE_MODE', 'materialized')
+
+# Repayment status sweep thresholds (days past due)
+REPAYMENT_LATE_AFTER_DAYS = int(os.environ.get('REPAYMENT_LATE_AFTER_DAYS', 1))
+REPAYMENT_MISSED_AFTER_DAYS = int(os.environ.get('REPAYMENT_MISSED_AFTER_DAYS', 30))
+LOAN_DEFAULT_AFTER_DAYS = int(os.environ.get('LOAN_DEFAULT_AFTER_DAYS', 90))
+
+# Cash-flow projection curves: monthly default / prepayment rates by loan age in months,
+# the last rate applies to all older loans
+LOAN_PROJECTION_DEFAULT_CURVE = [float(rate) for rate in os.environ.get('LOAN_PROJECTION_DEFAULT_CURVE', '0.005').split(',')]
+LOAN_PROJECTION_PREPAYMENT_CURVE = [float(rate) for rate in os.environ.get('LOAN_PROJECTION_PREPAYMENT_CURVE', '0.002').split(',')]
@@ -0,0 +1,38 @@
+"""
+Cache for the admin statistics
+
+Each statistics group (one aggregate query over one table) is kept in the
+default cache for ADMIN_STATS_CACHE_TTL seconds. Writes that change what a
+group counts invalidate it once they commit: model signals cover saves and
+deletes (see admin_api.signals), and the bulk paths and ledger balance
+updates, which send no signals, call invalidate_stats themselves. The TTL
+bounds anything that slips past both, such as a query run while a write
+commits.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+LOANS = 'loans'
+TRANSACTIONS = 'transactions'
+USERS = 'users'
+WALLETS = 'wallets'
+
+
+def _key(name):
+    return f"admin:stats:{name}"
+
+
+def cached_stats(name, compute):
+    """The cached statistics group `name`, computed with `compute()` on a miss"""
+    stats = cache.get(_key(name))
+    if stats is None:
+        stats = compute()
+        cache.set(_key(name), stats, settings.ADMIN_STATS_CACHE_TTL)
+    return stats
+
+
+def invalidate_stats(*names):
+    """Drop the statistics groups `names` once the current transaction commits"""
+    keys = [_key(name) for name in names]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,11 +1,11 @@
 from django.contrib import admin
-from .models import Loan, LoanApplication, Repayment
+from .models import Loan, LoanApplication, Prepayment, Repayment
 
 class LoanApplicationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'amount', 'reason', 'status', 'created_at')
+    list_display = ('id', 'user', 'amount', 'reason', 'status', 'risk_score', 'created_at')
     list_filter = ('status', 'reason', 'created_at')
     search_fields = ('user__email', 'user__username', 'reason', 'reason_details')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('risk_score', 'scored_at', 'created_at', 'updated_at')
     list_per_page = 20
 
 class LoanAdmin(admin.ModelAdmin):
@@ -22,7 +22,15 @@ class RepaymentAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     list_per_page = 20
 
+class PrepaymentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'loan', 'user', 'amount', 'payment_date', 'transaction_id')
+    list_filter = ('payment_date',)
+    search_fields = ('user__email', 'user__username', 'loan__id')
+    readonly_fields = ('created_at',)
+    list_per_page = 20
+
 # Register the models
 admin.site.register(LoanApplication, LoanApplicationAdmin)
 admin.site.register(Loan, LoanAdmin)
-admin.site.register(Repayment, RepaymentAdmin) 
\ No newline at end of file
+admin.site.register(Repayment, RepaymentAdmin)
+admin.site.register(Prepayment, PrepaymentAdmin)
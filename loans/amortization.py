@@ -0,0 +1,106 @@
+from django.conf import settings
+from datetime import date
+from functools import lru_cache
+import decimal
+
+CENT = decimal.Decimal('0.01')
+
+
+def normalize_rate(interest_rate):
+    """Annual interest rate in percentage as a 2dp Decimal (the Loan field precision)"""
+    return decimal.Decimal(str(interest_rate)).quantize(CENT)
+
+
+@lru_cache(maxsize=getattr(settings, 'LOAN_AMORTIZATION_CACHE_SIZE', 1024))
+def amortization_factor(interest_rate, term_months):
+    """
+    Monthly payment per unit of principal for an annual rate and term
+
+    M = P * (r * (1 + r)^n) / ((1 + r)^n - 1)
+    where M = monthly payment, P = principal, r = monthly interest rate, n = number of payments
+
+    Memoized per (rate, term), callers should pass a normalized rate.
+    """
+    monthly_rate = interest_rate / 100 / 12
+
+    # Avoid division by zero for 0% interest loans
+    if monthly_rate == 0:
+        return 1 / decimal.Decimal(term_months)
+
+    growth = (1 + monthly_rate) ** term_months
+    return monthly_rate * growth / (growth - 1)
+
+
+def monthly_payment(principal, interest_rate, term_months):
+    """
+    Calculate the rounded monthly payment for a loan
+
+    Args:
+        principal (Decimal): Loan amount
+        interest_rate (Decimal): Annual interest rate in percentage
+        term_months (int): Number of monthly payments
+
+    Returns:
+        Decimal: Monthly payment rounded to 2 decimal places
+    """
+    factor = amortization_factor(normalize_rate(interest_rate), int(term_months))
+    return round(decimal.Decimal(principal) * factor, 2)
+
+
+def next_due_date(current_date):
+    """Same day next month, capped at the 28th to avoid month length issues"""
+    return date(
+        year=current_date.year + current_date.month // 12,
+        month=current_date.month % 12 + 1,
+        day=min(current_date.day, 28)
+    )
+
+
+def due_dates(start_date, term_months):
+    """Due dates of every installment for a loan disbursed on start_date"""
+    dates = []
+    current_date = start_date
+    for _ in range(term_months):
+        current_date = next_due_date(current_date)
+        dates.append(current_date)
+    return dates
+
+
+def installment_amounts(principal, payment, term_months):
+    """
+    Amount of every installment
+
+    All installments equal the monthly payment except the last, which is
+    adjusted to account for rounding.
+    """
+    if term_months <= 0:
+        return []
+    final = max(CENT, principal - payment * (term_months - 1))
+    return [payment] * (term_months - 1) + [final]
+
+
+def build_schedule(principal, interest_rate, term_months, start_date):
+    """
+    Compute a full repayment schedule without touching the database
+
+    Args:
+        principal (Decimal): Loan amount
+        interest_rate (Decimal): Annual interest rate in percentage
+        term_months (int): Number of monthly payments
+        start_date (date): Disbursement date
+
+    Returns:
+        dict: Monthly payment and the list of installments
+    """
+    principal = decimal.Decimal(principal)
+    payment = monthly_payment(principal, interest_rate, term_months)
+    amounts = installment_amounts(principal, payment, term_months)
+
+    return {
+        'monthly_payment': payment,
+        'total_repayable': sum(amounts, decimal.Decimal('0.00')),
+        'schedule': [
+            {'installment': number, 'due_date': due_date, 'amount': amount}
+            for number, (due_date, amount) in enumerate(zip(due_dates(start_date, term_months), amounts), start=1)
+        ],
+    }
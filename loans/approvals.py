@@ -0,0 +1,145 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from edufundz.stats_cache import LOANS, invalidate_stats
+from .models import LoanApplication, Loan, Repayment
+from datetime import date
+
+
+def approve_application(application, interest_rate, term_months, disbursed_date=None):
+    """
+    Approve a pending application and create its loan and repayment schedule
+    
+    The status change, the loan and the schedule are written in one
+    transaction, so a failure at any step leaves the application pending.
+    
+    Args:
+        application (LoanApplication): Application to approve
+        interest_rate (Decimal): Annual interest rate in percentage
+        term_months (int): Loan term in months
+        disbursed_date (date, optional): Disbursement date, defaults to today
+        
+    Returns:
+        Loan: The saved loan
+    """
+    if application.status != 'pending':
+        raise ValidationError("Only pending applications can be approved")
+    
+    if disbursed_date is None:
+        disbursed_date = date.today()
+    
+    try:
+        with transaction.atomic():
+            # Update application status
+            application.status = 'approved'
+            application.save(update_fields=['status', 'updated_at'])
+            
+            # Create a loan from the application
+            loan = Loan.create_from_application(
+                application=application,
+                interest_rate=interest_rate,
+                term_months=int(term_months),
+                disbursed_date=disbursed_date
+            )
+            loan.save()
+            
+            # Generate repayment schedule, virtual schedules are derived on read
+            if loan.schedule_mode == 'materialized':
+                Repayment.generate_repayment_schedule(loan)
+    except Exception:
+        # The transaction rolled back, keep the instance in sync with the database
+        application.status = 'pending'
+        raise
+    
+    return loan
+
+
+def bulk_approve_applications(items, chunk_size=500, disbursed_date=None):
+    """
+    Approve many pending applications, creating their loans and schedules
+    
+    Applications are processed in chunks, each chunk in its own transaction
+    with one SELECT ... FOR UPDATE, one bulk INSERT for the loans, one for
+    the repayments and one UPDATE for the application statuses. A chunk that
+    fails at the database level is reported as failed without affecting
+    the chunks before or after it.
+    
+    Args:
+        items (list): Dicts with 'id', 'interest_rate' and 'term_months'
+        chunk_size (int): Number of applications per transaction
+        disbursed_date (date, optional): Disbursement date, defaults to today
+        
+    Returns:
+        list: One result dict per requested application, in request order
+    """
+    if disbursed_date is None:
+        disbursed_date = date.today()
+    
+    results = {}
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        try:
+            results.update(_approve_chunk(chunk, disbursed_date))
+        except Exception as e:
+            for item in chunk:
+                results[item['id']] = {'id': item['id'], 'status': 'error', 'detail': str(e)}
+    
+    return [results[item['id']] for item in items]
+
+
+def _approve_chunk(chunk, disbursed_date):
+    results = {}
+    loans = []
+    
+    with transaction.atomic():
+        applications = LoanApplication.objects.select_for_update(of=('self',)).select_related('user').in_bulk(
+            [item['id'] for item in chunk]
+        )
+        
+        for item in chunk:
+            application = applications.get(item['id'])
+            if application is None:
+                results[item['id']] = {'id': item['id'], 'status': 'error', 'detail': 'Application not found'}
+                continue
+            if application.status != 'pending':
+                results[item['id']] = {
+                    'id': item['id'],
+                    'status': 'skipped',
+                    'detail': f"Application is already {application.status}"
+                }
+                continue
+            
+            try:
+                application.status = 'approved'
+                loan = Loan.create_from_application(
+                    application=application,
+                    interest_rate=item['interest_rate'],
+                    term_months=int(item['term_months']),
+                    disbursed_date=disbursed_date
+                )
+                loan.clean()
+            except Exception as e:
+                application.status = 'pending'
+                results[item['id']] = {'id': item['id'], 'status': 'error', 'detail': str(e)}
+                continue
+            
+            loans.append(loan)
+        
+        if loans:
+            loans = Loan.objects.bulk_create(loans)
+            invalidate_stats(LOANS)
+            
+            repayments = []
+            for loan in loans:
+                if loan.schedule_mode == 'materialized':
+                    repayments.extend(Repayment.build_repayment_schedule(loan))
+            Repayment.objects.bulk_create(repayments, batch_size=1000)
+            
+            LoanApplication.objects.filter(id__in=[loan.application_id for loan in loans]).update(
+                status='approved', updated_at=timezone.now()
+            )
+    
+    for loan in loans:
+        results[loan.application_id] = {'id': loan.application_id, 'status': 'approved', 'loan_id': loan.id}
+    
+    return results
@@ -0,0 +1,87 @@
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from wallet.models import Transaction
+from .models import Loan, LoanApplication, Repayment
+
+
+def extract_features(application_ids):
+    """
+    Raw scoring features for a set of applications, in five set-based queries
+
+    One query each for the applications, the school-level loan outcomes,
+    the applicants' previous loans, their repayment history and their
+    wallet transactions. Every value is a plain int or float so the result
+    can be pickled cheaply to worker processes.
+
+    Args:
+        application_ids (list): LoanApplication ids
+
+    Returns:
+        list: (application_id, raw features) pairs, see loans.scoring.derive
+    """
+    applications = list(
+        LoanApplication.objects.filter(id__in=application_ids).values_list('id', 'user_id', 'amount', 'user__school')
+    )
+    user_ids = {user_id for _, user_id, _, _ in applications}
+    schools = {school for _, _, _, school in applications if school}
+
+    school_stats = {
+        row['user__school']: row
+        for row in Loan.objects.filter(user__school__in=schools).values('user__school').annotate(
+            loans=Count('id'),
+            defaulted=Count('id', filter=Q(status='defaulted')),
+        )
+    }
+
+    loan_stats = {
+        row['user_id']: row
+        for row in Loan.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+            loans=Count('id'),
+            defaulted=Count('id', filter=Q(status='defaulted')),
+            paid=Count('id', filter=Q(status='paid')),
+            outstanding=Sum(
+                ExpressionWrapper(F('amount') - F('amount_paid'), output_field=DecimalField(max_digits=10, decimal_places=2)),
+                filter=Q(status='active')
+            ),
+        )
+    }
+
+    repayment_stats = {
+        row['user_id']: row
+        for row in Repayment.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+            paid=Count('id', filter=Q(status='paid')),
+            late=Count('id', filter=Q(status='late')),
+            missed=Count('id', filter=Q(status='missed')),
+        )
+    }
+
+    transaction_stats = {
+        row['wallet__user_id']: row
+        for row in Transaction.objects.filter(wallet__user_id__in=user_ids).values('wallet__user_id').annotate(
+            transactions=Count('id'),
+            failed=Count('id', filter=Q(status='failed')),
+            deposited=Sum('amount', filter=Q(transaction_type='deposit', status='completed')),
+        )
+    }
+
+    features = []
+    for application_id, user_id, amount, school in applications:
+        school_row = school_stats.get(school, {})
+        loan_row = loan_stats.get(user_id, {})
+        repayment_row = repayment_stats.get(user_id, {})
+        transaction_row = transaction_stats.get(user_id, {})
+        features.append((application_id, {
+            'amount': float(amount),
+            'school_loans': school_row.get('loans', 0),
+            'school_defaulted': school_row.get('defaulted', 0),
+            'loans': loan_row.get('loans', 0),
+            'loans_defaulted': loan_row.get('defaulted', 0),
+            'loans_paid': loan_row.get('paid', 0),
+            'outstanding': float(loan_row.get('outstanding') or 0),
+            'repayments_paid': repayment_row.get('paid', 0),
+            'repayments_late': repayment_row.get('late', 0),
+            'repayments_missed': repayment_row.get('missed', 0),
+            'transactions': transaction_row.get('transactions', 0),
+            'transactions_failed': transaction_row.get('failed', 0),
+            'deposited': float(transaction_row.get('deposited') or 0),
+        }))
+    return features
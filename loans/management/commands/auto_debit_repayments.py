@@ -0,0 +1,58 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from loans.models import Repayment
+from loans.repayments import auto_debit, virtual_loan_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        'Settle due installments from their borrowers\' wallet balances, oldest first. '
+        'Runs as chunked, set-based transactions ordered by due date; safe to re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                            help='Settle installments due on or before this date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Installments considered per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many installments are due')
+
+    def handle(self, *args, **options):
+        as_of = options['as_of'] or date.today()
+
+        if options['dry_run']:
+            due = Repayment.objects.filter(
+                status__in=Repayment.OUTSTANDING_STATUSES, due_date__lte=as_of
+            ).aggregate(count=Count('id'), total=Sum('amount'))
+            virtual = [
+                repayment.amount
+                for loans in virtual_loan_chunks(options['chunk_size'])
+                for repayment in Repayment.derive_installments(loans, through=as_of)
+            ]
+            self.stdout.write(
+                f"[dry run] as of {as_of}: {due['count'] + len(virtual)} installment(s) due "
+                f"({len(virtual)} not stored yet), {(due['total'] or 0) + sum(virtual)} in total"
+            )
+            return
+
+        started = time.perf_counter()
+        considered = paid = 0
+        amount = 0
+        for chunk in auto_debit(as_of=as_of, chunk_size=options['chunk_size']):
+            considered += chunk['considered']
+            paid += chunk['paid']
+            amount += chunk['amount']
+            if options['verbosity'] >= 2:
+                due_date, repayment_id = chunk['last']
+                self.stdout.write(
+                    f"up to {due_date} #{repayment_id}: {paid}/{considered} paid "
+                    f"({considered / (time.perf_counter() - started):,.0f}/s)"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"As of {as_of}: {paid} of {considered} due installment(s) paid from wallets ({amount} in total), "
+            f"{considered - paid} not covered by the balance, in {time.perf_counter() - started:.1f}s"
+        ))
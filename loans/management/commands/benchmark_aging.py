@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from loans.models import Loan, LoanApplication, Repayment
+from loans.reports import AGING_GROUPS, portfolio_aging
+from users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seed repayment rows and time the portfolio aging report (seeded rows are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repayments', type=int, default=1000000,
+                            help='Number of repayment rows to seed')
+        parser.add_argument('--term', type=int, default=12,
+                            help='Installments per seeded loan')
+        parser.add_argument('--iterations', type=int, default=5,
+                            help='Timed runs per grouping')
+        parser.add_argument('--keep', action='store_true',
+                            help='Commit the seeded rows instead of rolling them back')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                self._seed(options['repayments'], options['term'])
+                self.stdout.write(f"Seeded {options['repayments']} repayments in {time.perf_counter() - start:.1f}s")
+
+                for group_by in [None, *AGING_GROUPS]:
+                    timings = []
+                    for _ in range(options['iterations']):
+                        start = time.perf_counter()
+                        portfolio_aging(group_by=group_by)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    self.stdout.write(
+                        f"group_by={group_by or '-':<12} median {statistics.median(timings):8.1f} ms"
+                        f"  max {max(timings):8.1f} ms"
+                    )
+
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, repayment_count, term):
+        rng = random.Random(0)
+        today = date.today()
+        loan_count = max(1, repayment_count // term)
+        schools = [f"Benchmark School {i}" for i in range(20)]
+
+        users = User.objects.bulk_create([
+            User(email=f"benchmark-aging-{i}@edufundz.invalid", username=f"benchmark-aging-{i}",
+                 school=schools[i % len(schools)])
+            for i in range(min(loan_count, 5000))
+        ])
+
+        reasons = [choice for choice, _ in LoanApplication.REASON_CHOICES]
+        applications = LoanApplication.objects.bulk_create([
+            LoanApplication(user=users[i % len(users)], amount=Decimal('1200.00'),
+                            reason=reasons[i % len(reasons)], status='approved')
+            for i in range(loan_count)
+        ], batch_size=5000)
+
+        loans = []
+        for application in applications:
+            disbursed = today - timedelta(days=rng.randint(0, 540))
+            loans.append(Loan(
+                application=application, user=application.user, amount=Decimal('1200.00'),
+                interest_rate=Decimal('5.00'), term_months=term, monthly_payment=Decimal('100.00'),
+                status=rng.choice(['active', 'active', 'active', 'defaulted']),
+                disbursed_date=disbursed, due_date=disbursed + timedelta(days=30 * term)
+            ))
+        loans = Loan.objects.bulk_create(loans, batch_size=5000)
+
+        batch = []
+        for loan in loans:
+            for month in range(1, term + 1):
+                due_date = loan.disbursed_date + timedelta(days=30 * month)
+                paid = due_date < today and rng.random() < 0.7
+                batch.append(Repayment(
+                    loan=loan, user_id=loan.user_id, amount=Decimal('100.00'), due_date=due_date,
+                    status='paid' if paid else 'pending', payment_date=due_date if paid else None
+                ))
+            if len(batch) >= 10000:
+                Repayment.objects.bulk_create(batch)
+                batch = []
+        Repayment.objects.bulk_create(batch)
@@ -0,0 +1,74 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from loans.approvals import approve_application
+from loans.models import Loan, LoanApplication, Repayment
+from users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark loan approval latency against term length (all writes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', default='6,12,24,36,48,60',
+                            help='Comma-separated term lengths in months')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Approvals timed per term length')
+
+    def handle(self, *args, **options):
+        terms = [int(term) for term in options['terms'].split(',')]
+        iterations = options['iterations']
+
+        self.stdout.write(f"{'term':>6} {'bulk ms':>10} {'queries':>8} {'per-row ms':>11} {'queries':>8}")
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email='benchmark-approval@edufundz.invalid',
+                    username='benchmark-approval',
+                    password=None
+                )
+                for term in terms:
+                    bulk_ms, bulk_queries = self._time(user, term, iterations, self._approve)
+                    row_ms, row_queries = self._time(user, term, iterations, self._approve_per_row)
+                    self.stdout.write(
+                        f"{term:>6} {bulk_ms:>10.2f} {bulk_queries:>8} {row_ms:>11.2f} {row_queries:>8}"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _time(self, user, term, iterations, approve):
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            application = LoanApplication.objects.create(
+                user=user, amount=Decimal('250000.00'), reason='tuition'
+            )
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                approve(application, term)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(captured)
+        return statistics.median(timings), queries
+
+    def _approve(self, application, term):
+        approve_application(application, interest_rate=Decimal('5.00'), term_months=term)
+
+    def _approve_per_row(self, application, term):
+        # The previous implementation: no transaction, one INSERT per installment
+        application.status = 'approved'
+        application.save()
+        loan = Loan.create_from_application(application, interest_rate=Decimal('5.00'), term_months=term)
+        loan.save()
+        loan.repayments.filter(status='pending').delete()
+        for repayment in Repayment.build_repayment_schedule(loan):
+            repayment.save()
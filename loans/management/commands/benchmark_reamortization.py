@@ -0,0 +1,75 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from loans.models import Loan, LoanApplication, Repayment
+from loans.reamortization import STRATEGIES, apply_payments
+from users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seed loans and time a batch of partial prepayments through the re-amortization engine (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=100000,
+                            help='Number of payments (one per seeded loan)')
+        parser.add_argument('--term', type=int, default=12, help='Installments per seeded loan')
+        parser.add_argument('--strategy', choices=STRATEGIES, default='reduce_installment')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Loans per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                loans = self._seed(options['payments'], options['term'])
+                self.stdout.write(f"Seeded {len(loans)} loans in {time.perf_counter() - start:.1f}s")
+
+                # One and a half installments: settles one, prepays against the tail
+                payments = [
+                    {'loan_id': loan.id, 'amount': loan.monthly_payment * Decimal('1.5'), 'transaction_id': None}
+                    for loan in loans
+                ]
+
+                start = time.perf_counter()
+                results = apply_payments(payments, strategy=options['strategy'], chunk_size=options['chunk_size'])
+                elapsed = time.perf_counter() - start
+
+                applied = sum(1 for result in results if result['status'] == 'applied')
+                self.stdout.write(
+                    f"{applied}/{len(payments)} payments applied ({options['strategy']}) in {elapsed:.2f}s: "
+                    f"{len(payments) / elapsed:,.0f} payments/s"
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, count, term):
+        disbursed = date.today() - timedelta(days=15)
+        user = User.objects.create_user(
+            email='benchmark-reamortization@edufundz.invalid', username='benchmark-reamortization', password=None
+        )
+        applications = LoanApplication.objects.bulk_create([
+            LoanApplication(user=user, amount=Decimal('1200.00'), reason='tuition', status='approved')
+            for _ in range(count)
+        ], batch_size=5000)
+        loans = Loan.objects.bulk_create([
+            Loan.create_from_application(application, interest_rate=Decimal('5.00'), term_months=term,
+                                         disbursed_date=disbursed, schedule_mode='materialized')
+            for application in applications
+        ], batch_size=5000)
+
+        batch = []
+        for loan in loans:
+            batch.extend(Repayment.build_repayment_schedule(loan))
+            if len(batch) >= 10000:
+                Repayment.objects.bulk_create(batch)
+                batch = []
+        Repayment.objects.bulk_create(batch)
+        return loans
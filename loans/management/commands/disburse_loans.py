@@ -0,0 +1,142 @@
+import asyncio
+import time
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.models import Loan
+from wallet.disbursements import (
+    FINAL_FAILURES, apply_outcomes, claim_for_submission, create_disbursements, next_attempts
+)
+from wallet.models import Transaction, Wallet
+from wallet.paystack import MAX_BULK_TRANSFERS, AsyncRateLimiter, abulk_transfer
+
+
+class Command(BaseCommand):
+    help = ('Pay out active loans: create their disbursement transactions in bulk and send them to Paystack '
+            'as bulk transfers; outcomes arrive as transfer webhooks or through reconcile_disbursements')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loan-ids', type=int, nargs='+', help='Disburse these loans')
+        parser.add_argument('--disbursed-on', type=date.fromisoformat,
+                            help='Disburse the active loans with this disbursement date (YYYY-MM-DD), today by default')
+        parser.add_argument('--transfers-per-call', type=int, default=MAX_BULK_TRANSFERS,
+                            help=f'Transfers per bulk transfer call, at most {MAX_BULK_TRANSFERS}')
+        parser.add_argument('--concurrency', type=int, default=5, help='Bulk transfer calls in flight')
+        parser.add_argument('--rate', type=float, default=10, help='Paystack calls per second at most')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Loans per transaction when creating disbursements, and outcomes applied per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be disbursed without writing')
+
+    def handle(self, *args, **options):
+        if not 0 < options['transfers_per_call'] <= MAX_BULK_TRANSFERS:
+            raise CommandError(f"--transfers-per-call must be between 1 and {MAX_BULK_TRANSFERS}")
+
+        loans = Loan.objects.filter(status='active')
+        if options['loan_ids']:
+            loans = loans.filter(id__in=options['loan_ids'])
+        else:
+            loans = loans.filter(disbursed_date=options['disbursed_on'] or date.today())
+
+        if options['dry_run']:
+            rows = list(loans.values_list('id', 'user_id'))
+            wallet_ids = list(Wallet.objects.filter(user_id__in={user_id for _, user_id in rows}).values_list('id', flat=True))
+            attempts = next_attempts({loan_id for loan_id, _ in rows}, wallet_ids)
+            retries = sum(1 for attempt in attempts.values() if attempt > 1)
+            self.stdout.write(
+                f"{len(rows)} loan(s) selected, {len(attempts)} to disburse ({retries} retrying a failed transfer)"
+            )
+            return
+
+        created = create_disbursements(loans, chunk_size=options['batch_size'])
+        self.stdout.write(f"Created {created} disbursement(s)")
+
+        # Everything not sent yet, including what earlier runs left behind
+        unsent = list(Transaction.objects.filter(
+            transaction_type='loan_disbursement', status='pending', paystack_reference__isnull=True
+        ).order_by('id').values_list('id', 'wallet__paystack_recipient_code'))
+        candidates = [transaction_id for transaction_id, recipient in unsent if recipient]
+        if len(candidates) < len(unsent):
+            self.stdout.write(self.style.WARNING(
+                f"{len(unsent) - len(candidates)} disbursement(s) wait for a transfer recipient on the borrower's wallet"
+            ))
+        self.stdout.write(f"{len(candidates)} disbursement(s) to send")
+        if not candidates:
+            return
+
+        start = time.perf_counter()
+        outcomes, applied, rejections = asyncio.run(self._submit(candidates, options, start))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Paystack: {self._summary(outcomes)}")
+        for message, count in rejections.items():
+            self.stdout.write(self.style.ERROR(f"  {count} rejected: {message}"))
+        self.stdout.write(f"Applied: {self._summary(applied)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {len(candidates)} disbursement(s) in {elapsed:.1f}s ({len(candidates) / elapsed:,.0f}/s)"
+        ))
+
+    async def _submit(self, candidates, options, start):
+        limiter = AsyncRateLimiter(options['rate'])
+        size = options['transfers_per_call']
+        remaining = iter([candidates[index:index + size] for index in range(0, len(candidates), size)])
+        outcomes, applied, rejections = {}, {}, {}
+        buffer = {'queued': [], 'succeeded': [], 'failed': [], 'unsent': []}
+        sent = 0
+
+        def count(counts, name, number):
+            counts[name] = counts.get(name, 0) + number
+
+        async def flush():
+            nonlocal buffer
+            batch, buffer = buffer, {name: [] for name in buffer}
+            for result, number in (await sync_to_async(apply_outcomes)(**batch)).items():
+                count(applied, result, number)
+            self.stdout.write(f"  {sent}/{len(candidates)} sent ({sent / (time.perf_counter() - start):,.0f}/s)")
+
+        async def worker():
+            nonlocal sent
+            # The workers share one iterator, each takes the next call's worth when free
+            for batch in remaining:
+                claimed = await sync_to_async(claim_for_submission)(batch)
+                if not claimed:
+                    continue
+                await limiter.acquire()
+                result = await abulk_transfer([
+                    {'amount': amount, 'recipient': recipient, 'reference': reference}
+                    for _, reference, amount, recipient in claimed
+                ], reason='EduFundz loan disbursement')
+                sent += len(claimed)
+
+                if result['status']:
+                    by_reference = {reference: transaction_id for transaction_id, reference, _, _ in claimed}
+                    for transfer in result['data']:
+                        transaction_id = by_reference.pop(transfer.get('reference'), None)
+                        if transaction_id is None:
+                            continue
+                        buffer['queued'].append((transaction_id, transfer.get('transfer_code') or transfer['reference']))
+                        if transfer.get('status') == 'success':
+                            buffer['succeeded'].append(transaction_id)
+                        elif transfer.get('status') in FINAL_FAILURES:
+                            buffer['failed'].append(transaction_id)
+                    count(outcomes, 'queued', len(claimed) - len(by_reference))
+                    # Left out of the answer: stay in flight until reconciliation finds out
+                    count(outcomes, 'unconfirmed', len(by_reference))
+                elif result.get('rejected'):
+                    buffer['unsent'].extend(transaction_id for transaction_id, _, _, _ in claimed)
+                    count(outcomes, 'rejected', len(claimed))
+                    count(rejections, result['message'], len(claimed))
+                else:
+                    # No answer, the transfers may exist: reconcile_disbursements verifies them
+                    count(outcomes, 'unconfirmed', len(claimed))
+
+                if sum(len(items) for items in buffer.values()) >= options['batch_size']:
+                    await flush()
+
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        await flush()
+        return outcomes, applied, rejections
+
+    def _summary(self, counts):
+        return ', '.join(f"{number} {name}" for name, number in sorted(counts.items()) if number) or 'nothing'
@@ -0,0 +1,41 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.projection import iter_csv, parse_curve, project_cash_flows
+
+
+class Command(BaseCommand):
+    help = 'Project expected monthly inflows across all active loans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help='Projection horizon in months')
+        parser.add_argument('--default-curve', default=None,
+                            help='Comma-separated monthly default rates by loan age, e.g. 0.01,0.008,0.005')
+        parser.add_argument('--prepayment-curve', default=None,
+                            help='Comma-separated monthly prepayment rates by loan age')
+        parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+        try:
+            default_curve = parse_curve(options['default_curve']) if options['default_curve'] else None
+            prepayment_curve = parse_curve(options['prepayment_curve']) if options['prepayment_curve'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        projection = project_cash_flows(
+            months=options['months'],
+            default_curve=default_curve,
+            prepayment_curve=prepayment_curve
+        )
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(projection, indent=2))
+        else:
+            for line in iter_csv(projection):
+                self.stdout.write(line, ending='')
+        self.stderr.write(f"Projected in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from loans.models import Loan, Prepayment, Repayment
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify Loan.amount_paid from the paid repayment and prepayment rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report loans whose amount_paid does not match their repayments and prepayments')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Loans per UPDATE statement')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        paid_total = self._total(Repayment.objects.filter(status='paid')) + self._total(Prepayment.objects.all())
+
+        max_id = Loan.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        mismatched = 0
+        for start in range(0, max_id + 1, chunk_size):
+            loans = Loan.objects.filter(id__gte=start, id__lt=start + chunk_size)
+            if options['verify']:
+                drift = loans.annotate(expected=paid_total).exclude(amount_paid=F('expected'))
+                for loan_id, amount_paid, expected in drift.values_list('id', 'amount_paid', 'expected'):
+                    self.stdout.write(f"Loan #{loan_id}: amount_paid={amount_paid}, repayments={expected}")
+                    mismatched += 1
+            else:
+                loans.update(amount_paid=paid_total)
+
+        if options['verify']:
+            self.stdout.write(f"{mismatched} loan(s) out of sync")
+            if mismatched:
+                raise SystemExit(1)
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt amount_paid for loans up to #{max_id}"))
+
+    def _total(self, rows):
+        """Per-loan sum of the rows' amounts, as a subquery on the loan"""
+        return Coalesce(
+            Subquery(
+                rows.filter(loan=OuterRef('pk'))
+                .values('loan')
+                .annotate(total=Sum('amount'))
+                .values('total')
+            ),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
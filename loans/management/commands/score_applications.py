@@ -0,0 +1,91 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from edufundz.db import bulk_update_values
+from loans.features import extract_features
+from loans.models import LoanApplication
+from loans.scoring import score_batch
+
+
+class Command(BaseCommand):
+    help = 'Score pending loan applications for risk and store the result on LoanApplication.risk_score'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Scoring processes (0 scores in this process)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Applications per feature extraction and write')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Applications per task sent to a worker')
+        parser.add_argument('--rescore', action='store_true',
+                            help='Also rescore applications that already have a score')
+
+    def handle(self, *args, **options):
+        pending = LoanApplication.objects.filter(status='pending')
+        if not options['rescore']:
+            pending = pending.filter(risk_score__isnull=True)
+
+        start = time.perf_counter()
+        workers = options['workers']
+        if workers > 0:
+            # Worker processes never touch the database, drop the parent's
+            # connections so none is shared with a forked child
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            executor = None
+
+        scored = 0
+        try:
+            # Pipelined: extract features for the next chunk while the
+            # workers score the previous one
+            in_flight = None
+            for ids in self._chunks(pending, options['chunk_size']):
+                features = extract_features(ids)
+                batches = [features[i:i + options['batch_size']] for i in range(0, len(features), options['batch_size'])]
+                if executor is None:
+                    submitted = [score_batch(batch) for batch in batches]
+                else:
+                    submitted = [executor.submit(score_batch, batch) for batch in batches]
+
+                if in_flight is not None:
+                    scored += self._write(in_flight)
+                in_flight = submitted
+
+            if in_flight is not None:
+                scored += self._write(in_flight)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        rate = scored / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} applications in {elapsed:.2f}s ({rate:,.0f}/s, {workers or 'no'} workers)"
+        ))
+
+    def _chunks(self, queryset, chunk_size):
+        """Keyset-paginated id lists, so rows written by earlier chunks do not shift later ones"""
+        last_id = 0
+        while True:
+            ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+
+    def _write(self, submitted):
+        now = timezone.now()
+        applications = [
+            LoanApplication(id=application_id, risk_score=Decimal(str(risk_score)), scored_at=now)
+            for result in submitted
+            for application_id, risk_score in (result if isinstance(result, list) else result.result())
+        ]
+        bulk_update_values(applications, ['risk_score', 'scored_at'])
+        return len(applications)
@@ -0,0 +1,106 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from edufundz.stats_cache import LOANS, invalidate_stats
+from loans.models import Loan, Repayment
+from loans.repayments import virtual_loan_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        'Move overdue repayments to late/missed and loans with long-missed repayments to defaulted. '
+        'Runs as chunked, set-based UPDATEs over primary key ranges; safe to re-run or resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                            help='Date to measure overdue days from (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--late-after-days', type=int,
+                            default=getattr(settings, 'REPAYMENT_LATE_AFTER_DAYS', 1))
+        parser.add_argument('--missed-after-days', type=int,
+                            default=getattr(settings, 'REPAYMENT_MISSED_AFTER_DAYS', 30))
+        parser.add_argument('--default-after-days', type=int,
+                            default=getattr(settings, 'LOAN_DEFAULT_AFTER_DAYS', 90))
+        parser.add_argument('--chunk-size', type=int, default=50000,
+                            help='Primary key range covered by each UPDATE')
+        parser.add_argument('--start-id', type=int, default=0,
+                            help='Resume repayment updates from this id')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many rows would change')
+
+    def handle(self, *args, **options):
+        as_of = options['as_of'] or date.today()
+        late_after = options['late_after_days']
+        missed_after = options['missed_after_days']
+        default_after = options['default_after_days']
+        if not 0 <= late_after <= missed_after <= default_after:
+            raise CommandError('Expected late-after <= missed-after <= default-after days')
+
+        late_cutoff = as_of - timedelta(days=late_after)
+        missed_cutoff = as_of - timedelta(days=missed_after)
+        default_cutoff = as_of - timedelta(days=default_after)
+
+        to_missed = Q(status__in=['pending', 'late'], due_date__lte=missed_cutoff)
+        to_late = Q(status='pending', due_date__lte=late_cutoff)
+        long_missed = Repayment.objects.filter(loan=OuterRef('pk'), status='missed', due_date__lte=default_cutoff)
+
+        if options['dry_run']:
+            to_materialize = sum(
+                len(Repayment.derive_installments(loans, through=late_cutoff))
+                for loans in virtual_loan_chunks(options['chunk_size'])
+            )
+            counts = Repayment.objects.aggregate(
+                missed=Count('id', filter=to_missed),
+                late=Count('id', filter=to_late & ~to_missed),
+            )
+            # Rows about to become missed count towards defaults as well
+            long_overdue = Repayment.objects.filter(
+                loan=OuterRef('pk'), status__in=['pending', 'late', 'missed'], due_date__lte=default_cutoff
+            )
+            counts['defaulted'] = Loan.objects.filter(status='active').filter(Exists(long_overdue)).count()
+            self.stdout.write(
+                f"[dry run] as of {as_of}: {to_materialize} virtual installment(s) to materialize, "
+                f"{counts['late']} stored repayment(s) -> late, "
+                f"{counts['missed']} stored repayment(s) -> missed, {counts['defaulted']} loan(s) -> defaulted"
+            )
+            return
+
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+
+        # Virtual schedules: store the installments that are about to be flagged
+        materialized = 0
+        for loans in virtual_loan_chunks(chunk_size):
+            materialized += Repayment.materialize_installments(loans, through=late_cutoff)
+
+        # Repayments: each chunk is its own short autocommit UPDATE
+        max_id = Repayment.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        late = missed = 0
+        for start in range(options['start_id'], max_id + 1, chunk_size):
+            chunk = Repayment.objects.filter(id__gte=start, id__lt=start + chunk_size)
+            now = timezone.now()
+            missed += chunk.filter(to_missed).update(status='missed', updated_at=now)
+            late += chunk.filter(to_late).update(status='late', updated_at=now)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"repayments up to id {start + chunk_size - 1}: {late} late, {missed} missed")
+
+        # Loans: default the active ones carrying a long-missed repayment
+        max_id = Loan.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        defaulted = 0
+        for start in range(0, max_id + 1, chunk_size):
+            defaulted += Loan.objects.filter(
+                id__gte=start, id__lt=start + chunk_size, status='active'
+            ).filter(Exists(long_missed)).update(status='defaulted', updated_at=timezone.now())
+        if defaulted:
+            invalidate_stats(LOANS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"As of {as_of}: {materialized} virtual installment(s) materialized, "
+            f"{late} repayment(s) -> late, {missed} -> missed, "
+            f"{defaulted} loan(s) -> defaulted in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:40
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_amount_paid(apps, schema_editor):
+    Loan = apps.get_model('loans', 'Loan')
+    Repayment = apps.get_model('loans', 'Repayment')
+    paid = Repayment.objects.filter(loan=OuterRef('pk'), status='paid').values('loan').annotate(
+        total=Sum('amount')
+    ).values('total')
+    Loan.objects.update(amount_paid=Coalesce(
+        Subquery(paid), Value(Decimal('0.00')), output_field=DecimalField(max_digits=10, decimal_places=2)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(backfill_amount_paid, migrations.RunPython.noop),
+    ]
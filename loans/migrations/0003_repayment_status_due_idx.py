@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_loan_amount_paid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['status', 'due_date'], name='repayment_status_due_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_repayment_status_due_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='schedule_mode',
+            field=models.CharField(choices=[('materialized', 'Materialized'), ('virtual', 'Virtual')], default='materialized', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='repayment',
+            constraint=models.UniqueConstraint(fields=('loan', 'due_date'), name='repayment_loan_due_date_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0004_loan_schedule_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='risk_score',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='scored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0005_loanapplication_risk_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prepayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_date', models.DateField()),
+                ('transaction_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prepayments', to='loans.loan')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prepayments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
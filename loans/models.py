@@ -1,6 +1,11 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.core.exceptions import ValidationError
+from edufundz.stats_cache import LOANS, invalidate_stats
 from users.models import User
+from . import amortization
 from datetime import date, timedelta
 import decimal
 
@@ -23,6 +28,9 @@ class LoanApplication(models.Model):
     reason = models.CharField(max_length=20, choices=REASON_CHOICES)
     reason_details = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # 0 (lowest risk) to 100 (highest), set by the score_applications command
+    risk_score = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, db_index=True)
+    scored_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -41,13 +49,25 @@ class Loan(models.Model):
         ('defaulted', 'Defaulted'),
     )
     
+    SCHEDULE_MODE_CHOICES = (
+        # Every installment is stored as a Repayment row at approval
+        ('materialized', 'Materialized'),
+        # Installments are derived from the loan terms on read and only stored
+        # once a payment, status change or adjustment touches them
+        ('virtual', 'Virtual'),
+    )
+    
     application = models.OneToOneField(LoanApplication, on_delete=models.CASCADE, related_name='loan')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='loans')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)  # Annual interest rate in percentage
     term_months = models.PositiveIntegerField()  # Loan term in months
     monthly_payment = models.DecimalField(max_digits=10, decimal_places=2)
+    # Running total of settled repayments and prepayments, maintained by
+    # Repayment.settle() and loans.reamortization
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=decimal.Decimal('0.00'))
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    schedule_mode = models.CharField(max_length=20, choices=SCHEDULE_MODE_CHOICES, default='materialized')
     disbursed_date = models.DateField()
     due_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -68,7 +88,7 @@ class Loan(models.Model):
             raise ValidationError("Due date must be after disbursement date")
     
     @classmethod
-    def create_from_application(cls, application, interest_rate, term_months, disbursed_date=None):
+    def create_from_application(cls, application, interest_rate, term_months, disbursed_date=None, schedule_mode=None):
         """
         Create a loan from an approved application with calculated terms
         """
@@ -78,21 +98,11 @@ class Loan(models.Model):
         if disbursed_date is None:
             disbursed_date = date.today()
         
-        # Calculate monthly payment using amortization formula
-        # M = P * (r * (1 + r)^n) / ((1 + r)^n - 1)
-        # where M = monthly payment, P = principal, r = monthly interest rate, n = number of payments
+        if schedule_mode is None:
+            schedule_mode = getattr(settings, 'LOAN_SCHEDULE_MODE', 'materialized')
         
         principal = application.amount
-        annual_rate = decimal.Decimal(interest_rate) / 100
-        monthly_rate = annual_rate / 12
-        num_payments = term_months
-        
-        # Avoid division by zero for 0% interest loans
-        if monthly_rate == 0:
-            monthly_payment = principal / num_payments
-        else:
-            monthly_payment = principal * (monthly_rate * (1 + monthly_rate) ** num_payments) / ((1 + monthly_rate) ** num_payments - 1)
-            monthly_payment = round(monthly_payment, 2)
+        monthly_payment = amortization.monthly_payment(principal, interest_rate, term_months)
         
         # Calculate due date
         due_date = disbursed_date + timedelta(days=30 * term_months)
@@ -105,6 +115,7 @@ class Loan(models.Model):
             interest_rate=interest_rate,
             term_months=term_months,
             monthly_payment=monthly_payment,
+            schedule_mode=schedule_mode,
             disbursed_date=disbursed_date,
             due_date=due_date
         )
@@ -115,29 +126,87 @@ class Loan(models.Model):
         """
         Calculate the remaining balance on the loan
         """
-        # Get total paid amount from repayments
-        total_paid = sum(
-            repayment.amount for repayment in self.repayments.filter(status='paid')
-        )
-        
-        # Calculate remaining balance
-        remaining = self.amount - total_paid
+        remaining = self.amount - self.amount_paid
         
         # Ensure we don't return negative amounts if overpaid
         return max(decimal.Decimal('0.00'), remaining)
     
+    @classmethod
+    def record_payment(cls, loan_id, amount):
+        """
+        Atomically add a settled amount to a loan's running total
+        
+        The increment is a single UPDATE with an F() expression, so concurrent
+        payments on the same loan never lose each other's writes. A loan whose
+        total reaches its amount is marked as paid, and a negative amount
+        (a reversed repayment) reopens it.
+        """
+        now = timezone.now()
+        cls.objects.filter(pk=loan_id).update(amount_paid=F('amount_paid') + amount, updated_at=now)
+        if amount > 0:
+            changed = cls.objects.filter(pk=loan_id, status='active', amount_paid__gte=F('amount')).update(status='paid', updated_at=now)
+        else:
+            changed = cls.objects.filter(pk=loan_id, status='paid', amount_paid__lt=F('amount')).update(status='active', updated_at=now)
+        if changed:
+            invalidate_stats(LOANS)
+    
     def is_due_for_repayment(self):
         """
-        Check if loan is due for repayment (has pending repayments)
+        Check if loan is due for repayment (has outstanding repayments)
         """
-        return self.repayments.filter(status='pending').exists()
+        return self.repayments.filter(status__in=Repayment.OUTSTANDING_STATUSES).exists()
     
     def get_next_repayment(self):
         """
-        Get the next pending repayment
+        Get the next outstanding repayment
+        
+        For virtual schedules with no stored installment outstanding, this is
+        the next derived installment, unsaved (without an id).
         """
-        pending_repayments = self.repayments.filter(status='pending').order_by('due_date')
-        return pending_repayments.first()
+        repayment = self.repayments.filter(status__in=Repayment.OUTSTANDING_STATUSES).order_by('due_date').first()
+        if repayment is None and self.schedule_mode == 'virtual':
+            stored = set(self.repayments.values_list('due_date', flat=True))
+            repayment = next(
+                (r for r in Repayment.build_repayment_schedule(self) if r.due_date not in stored), None
+            )
+        return repayment
+    
+    def get_schedule(self):
+        """
+        Get the full repayment schedule ordered by due date
+        
+        Stored installments are returned as they are; for virtual schedules
+        the installments not stored yet are derived from the loan terms and
+        returned unsaved (without an id).
+        """
+        stored = list(self.repayments.order_by('due_date'))
+        if self.schedule_mode != 'virtual':
+            return stored
+        
+        by_date = {repayment.due_date: repayment for repayment in stored}
+        schedule = [by_date.pop(derived.due_date, derived) for derived in Repayment.build_repayment_schedule(self)]
+        return sorted(schedule + list(by_date.values()), key=lambda repayment: repayment.due_date)
+    
+    def materialize_schedule(self, through=None):
+        """
+        Store the derived installments due on or before `through` (all of them if None)
+        
+        Installments are always materialized in due date order, so the stored
+        rows of a virtual schedule are a prefix of it.
+        """
+        if self.schedule_mode != 'virtual':
+            return
+        Repayment.materialize_installments([self], through=through)
+    
+    def get_installment(self, due_date):
+        """
+        The stored installment due on `due_date`, or None if the schedule has none
+        
+        A virtual schedule's installment is materialized first (with those
+        before it), since the caller is about to act on it.
+        """
+        self.materialize_schedule(through=due_date)
+        return self.repayments.filter(due_date=due_date).first()
 
 class Repayment(models.Model):
     STATUS_CHOICES = (
@@ -147,6 +216,9 @@ class Repayment(models.Model):
         ('missed', 'Missed'),
     )
     
+    # Statuses that still have money owed on them
+    OUTSTANDING_STATUSES = ('pending', 'late', 'missed')
+    
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='repayments')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='repayments')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -157,6 +229,16 @@ class Repayment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Outstanding-by-due-date scans (aging report, status sweeps)
+            models.Index(fields=['status', 'due_date'], name='repayment_status_due_idx'),
+        ]
+        constraints = [
+            # One installment per due date, lets virtual schedules materialize idempotently
+            models.UniqueConstraint(fields=['loan', 'due_date'], name='repayment_loan_due_date_unique'),
+        ]
+    
     def __str__(self):
         return f"Repayment #{self.id} for Loan #{self.loan.id}"
     
@@ -164,47 +246,127 @@ class Repayment(models.Model):
         if self.amount <= 0:
             raise ValidationError("Repayment amount must be greater than zero")
     
-    @classmethod
-    def generate_repayment_schedule(cls, loan):
-        """
-        Generate a repayment schedule for a loan
+    def settle(self, transaction_id=None, payment_date=None):
         """
-        # Clear any existing repayments that are still pending
-        loan.repayments.filter(status='pending').delete()
+        Mark the repayment as paid and add its amount to the loan's total
         
-        # Generate new repayment schedule
-        current_date = loan.disbursed_date
-        monthly_payment = loan.monthly_payment
+        The status change is a conditional UPDATE, so when two requests try to
+        settle the same repayment only one of them updates the loan.
         
-        repayments = []
-        for i in range(loan.term_months):
-            # Calculate next due date (approximately one month later)
-            next_date = date(
-                year=current_date.year + ((current_date.month + 1) // 12),
-                month=((current_date.month + 1) % 12) or 12,  # handle December
-                day=min(current_date.day, 28)  # avoid issues with month lengths
+        Returns:
+            bool: True if this call settled the repayment
+        """
+        if payment_date is None:
+            payment_date = date.today()
+        
+        with transaction.atomic():
+            # Lock the loan before its repayment, the order re-amortization uses too
+            list(Loan.objects.select_for_update().filter(pk=self.loan_id).values_list('pk', flat=True))
+            settled = Repayment.objects.filter(pk=self.pk).exclude(status='paid').update(
+                status='paid',
+                payment_date=payment_date,
+                transaction_id=transaction_id,
+                updated_at=timezone.now()
             )
-            
-            # Create repayment object
-            repayment = cls(
+            if settled:
+                Loan.record_payment(self.loan_id, self.amount)
+        
+        if settled:
+            self.status = 'paid'
+            self.payment_date = payment_date
+            self.transaction_id = transaction_id
+        return bool(settled)
+    
+    @classmethod
+    def build_repayment_schedule(cls, loan):
+        """
+        Build the (unsaved) repayment objects that make up a loan's schedule
+        """
+        dates = amortization.due_dates(loan.disbursed_date, loan.term_months)
+        amounts = amortization.installment_amounts(loan.amount, loan.monthly_payment, loan.term_months)
+        
+        repayments = [
+            cls(
                 loan=loan,
-                user=loan.user,
-                amount=monthly_payment,
-                due_date=next_date,
+                user_id=loan.user_id,
+                amount=amount,
+                due_date=due_date,
                 status='pending'
             )
-            repayments.append(repayment)
-            
-            # Update current date for next iteration
-            current_date = next_date
+            for due_date, amount in zip(dates, amounts)
+        ]
+        
+        return repayments
+    
+    @classmethod
+    def derive_installments(cls, loans, through=None):
+        """
+        Build the unsaved installments of virtual loans due on or before `through`
+        
+        Loans annotated with `stored_through` (their latest stored due date)
+        skip the installments up to that date, since stored rows are a prefix
+        of the schedule.
+        """
+        repayments = []
+        for loan in loans:
+            stored_through = getattr(loan, 'stored_through', None)
+            repayments.extend(
+                repayment for repayment in cls.build_repayment_schedule(loan)
+                if (through is None or repayment.due_date <= through)
+                and (stored_through is None or repayment.due_date > stored_through)
+            )
+        return repayments
+    
+    @classmethod
+    def materialize_installments(cls, loans, through=None):
+        """
+        Store the derived installments of virtual loans due on or before `through`
         
-        # Adjust final payment to account for rounding errors
-        remaining_balance = loan.amount - (monthly_payment * (loan.term_months - 1))
-        if repayments:
-            repayments[-1].amount = max(decimal.Decimal('0.01'), remaining_balance)
+        One bulk INSERT for all the given loans; installments that are
+        already stored are skipped by the (loan, due_date) constraint.
         
-        # Save all repayments
-        for repayment in repayments:
-            repayment.save()
+        Returns:
+            int: Number of installments considered for insertion
+        """
+        repayments = cls.derive_installments(loans, through=through)
+        cls.objects.bulk_create(repayments, batch_size=1000, ignore_conflicts=True)
+        return len(repayments)
+    
+    @classmethod
+    def generate_repayment_schedule(cls, loan):
+        """
+        Generate a repayment schedule for a loan
+        
+        The pending rows are replaced with a single DELETE and a single bulk
+        INSERT inside one transaction, so callers can run it atomically with
+        the loan itself.
+        """
+        repayments = cls.build_repayment_schedule(loan)
+        
+        with transaction.atomic():
+            # Clear any existing repayments that are still pending
+            loan.repayments.filter(status='pending').delete()
+            
+            # Save the whole schedule in one round trip
+            repayments = cls.objects.bulk_create(repayments)
         
-        return repayments 
\ No newline at end of file
+        return repayments
+
+
+class Prepayment(models.Model):
+    """
+    The part of a payment left over once it settled whole installments
+    
+    loans.reamortization spreads it over the remaining installments, so it
+    settles none of them; the row keeps it in the loan's paid total (see
+    rebuild_loan_balances) and in statements.
+    """
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='prepayments')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prepayments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_date = models.DateField()
+    transaction_id = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Prepayment #{self.id} for Loan #{self.loan_id}"
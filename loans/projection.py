@@ -0,0 +1,204 @@
+from django.conf import settings
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast, ExtractMonth, ExtractYear
+from .models import Loan, Repayment
+from datetime import date
+import numpy as np
+
+# Row layout of the single pull the projection is computed from
+ROW_DTYPE = np.dtype([
+    ('loan', np.int64),
+    ('due_month', np.int32),
+    ('disbursed_month', np.int32),
+    ('amount', np.float64),
+])
+
+
+def parse_curve(value):
+    """Parse a comma-separated list of monthly rates, e.g. '0.01,0.008,0.005'"""
+    curve = [float(rate) for rate in str(value).split(',') if rate.strip()]
+    if not curve or any(rate < 0 or rate >= 1 for rate in curve):
+        raise ValueError("Curve rates must be in [0, 1)")
+    return curve
+
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+
+def _extend_curve(curve, length):
+    """Pad a curve indexed by loan age (months) with its last rate"""
+    curve = np.asarray(curve, dtype=np.float64)
+    if len(curve) >= length:
+        return curve[:length]
+    return np.concatenate([curve, np.full(length - len(curve), curve[-1])])
+
+
+def fetch_schedule_rows():
+    """
+    Pull every outstanding installment of the active loans
+
+    One query for the stored installments and one for the terms of virtual
+    schedules, whose unstored installments are expanded with array
+    arithmetic. Dates come back as month indexes and amounts as floats so
+    the rows can be streamed straight into a structured NumPy array.
+    """
+    rows = Repayment.objects.filter(
+        loan__status='active', status__in=Repayment.OUTSTANDING_STATUSES
+    ).annotate(
+        due_month=ExtractYear('due_date') * 12 + ExtractMonth('due_date') - 1,
+        disbursed_month=ExtractYear('loan__disbursed_date') * 12 + ExtractMonth('loan__disbursed_date') - 1,
+        amount_float=Cast(F('amount'), FloatField()),
+    ).values_list('loan_id', 'due_month', 'disbursed_month', 'amount_float')
+
+    stored = np.fromiter(rows.iterator(chunk_size=20000), dtype=ROW_DTYPE)
+    return np.concatenate([stored, derive_virtual_rows()])
+
+
+def derive_virtual_rows():
+    """
+    Unstored installments of active virtual-schedule loans as schedule rows
+
+    Stored installments are a prefix of a virtual schedule, so a loan with
+    k stored rows still has installments k+1..term_months to derive. Each
+    installment is due one month after the previous one and equals the
+    monthly payment, except the last which absorbs the rounding.
+    """
+    terms = Loan.objects.filter(status='active', schedule_mode='virtual').annotate(
+        stored=Count('repayments'),
+        disbursed_month=ExtractYear('disbursed_date') * 12 + ExtractMonth('disbursed_date') - 1,
+        payment_float=Cast(F('monthly_payment'), FloatField()),
+        amount_float=Cast(F('amount'), FloatField()),
+    ).values_list('id', 'disbursed_month', 'term_months', 'stored', 'payment_float', 'amount_float')
+
+    terms = np.array(list(terms.iterator(chunk_size=20000)), dtype=np.float64).reshape(-1, 6)
+    loan_ids, disbursed, term, stored, payment, amount = terms.T
+    remaining = np.maximum(term - stored, 0).astype(np.int64)
+
+    # Installment numbers stored+1..term for every loan, flattened
+    total = int(remaining.sum())
+    group_start = np.repeat(np.cumsum(remaining) - remaining, remaining)
+    number = np.repeat(stored, remaining) + 1 + (np.arange(total) - group_start)
+
+    term = np.repeat(term, remaining)
+    payment = np.repeat(payment, remaining)
+    final = np.maximum(0.01, np.repeat(amount, remaining) - payment * (term - 1))
+
+    rows = np.empty(total, dtype=ROW_DTYPE)
+    rows['loan'] = np.repeat(loan_ids, remaining)
+    rows['disbursed_month'] = np.repeat(disbursed, remaining)
+    rows['due_month'] = rows['disbursed_month'] + number
+    rows['amount'] = np.where(number == term, final, payment)
+    return rows
+
+
+def project(rows, months, default_curve, prepayment_curve, as_of):
+    """
+    Expected monthly inflows for the next `months` months
+
+    Each loan survives a month of age a with probability
+    (1 - default_curve[a]) * (1 - prepayment_curve[a]). An installment due in
+    projection month m is expected with the probability that its loan
+    survives to m and does not default in m. A loan that prepays in month m
+    pays its whole remaining balance after that month's installment.
+    Overdue installments are expected in the first month.
+
+    Args:
+        rows (ndarray): Schedule rows with ROW_DTYPE
+        months (int): Projection horizon in months
+        default_curve (list): Monthly default rate by loan age
+        prepayment_curve (list): Monthly prepayment rate by loan age
+        as_of (date): First projected month
+
+    Returns:
+        list: One dict per month
+    """
+    start = _month_index(as_of.year, as_of.month)
+    labels = [f"{(start + m) // 12}-{(start + m) % 12 + 1:02d}" for m in range(months)]
+
+    if len(rows) == 0:
+        return [
+            {'month': label, 'scheduled': 0.0, 'expected_installments': 0.0,
+             'expected_prepayments': 0.0, 'expected_total': 0.0}
+            for label in labels
+        ]
+
+    # Collapse rows to one amount per (loan, projection month)
+    offset = np.maximum(rows['due_month'] - start, 0).astype(np.int64)
+    span = int(offset.max()) + 1
+    keys, inverse = np.unique(rows['loan'] * span + offset, return_inverse=True)
+    amounts = np.bincount(inverse, weights=rows['amount'])
+    loans = keys // span
+    offset = keys % span
+    disbursed = np.empty(len(keys), dtype=np.int64)
+    disbursed[inverse] = rows['disbursed_month']
+
+    # Remaining balance after each month: loan total minus the inclusive running sum
+    # (np.unique sorted the keys by loan, then month)
+    _, first, counts = np.unique(loans, return_index=True, return_counts=True)
+    running = np.cumsum(amounts)
+    loan_totals = np.add.reduceat(amounts, first)
+    before_loan = np.repeat(running[first] - amounts[first], counts)
+    remaining_after = np.repeat(loan_totals, counts) - (running - before_loan)
+
+    # Loan age in months at the projection start and in each projected month
+    age_start = np.maximum(start - disbursed, 0)
+    age = age_start + offset
+
+    length = int(age.max()) + 2
+    defaults = _extend_curve(default_curve, length)
+    prepayments = _extend_curve(prepayment_curve, length)
+
+    # Log survival through the start of each age, so survival between two ages is one subtraction
+    log_survival = np.concatenate([[0.0], np.cumsum(np.log1p(-defaults) + np.log1p(-prepayments))])
+    alive = np.exp(log_survival[age] - log_survival[age_start]) * (1 - defaults[age])
+
+    expected_installments = amounts * alive
+    expected_prepayments = alive * prepayments[age] * remaining_after
+
+    in_horizon = offset < months
+
+    def by_month(values):
+        return np.bincount(offset[in_horizon], weights=values[in_horizon], minlength=months)
+
+    scheduled = by_month(amounts)
+    installments = by_month(expected_installments)
+    prepaid = by_month(expected_prepayments)
+
+    return [
+        {
+            'month': labels[m],
+            'scheduled': round(float(scheduled[m]), 2),
+            'expected_installments': round(float(installments[m]), 2),
+            'expected_prepayments': round(float(prepaid[m]), 2),
+            'expected_total': round(float(installments[m] + prepaid[m]), 2),
+        }
+        for m in range(months)
+    ]
+
+
+def project_cash_flows(months=12, default_curve=None, prepayment_curve=None, as_of=None):
+    """
+    Project expected monthly inflows across all active loans
+
+    Curves default to LOAN_PROJECTION_DEFAULT_CURVE and
+    LOAN_PROJECTION_PREPAYMENT_CURVE.
+    """
+    if default_curve is None:
+        default_curve = getattr(settings, 'LOAN_PROJECTION_DEFAULT_CURVE', [0.0])
+    if prepayment_curve is None:
+        prepayment_curve = getattr(settings, 'LOAN_PROJECTION_PREPAYMENT_CURVE', [0.0])
+    if as_of is None:
+        as_of = date.today()
+
+    return project(fetch_schedule_rows(), months, default_curve, prepayment_curve, as_of)
+
+
+PROJECTION_COLUMNS = ['month', 'scheduled', 'expected_installments', 'expected_prepayments', 'expected_total']
+
+
+def iter_csv(projection):
+    """Yield a projection as CSV lines, header first"""
+    yield ','.join(PROJECTION_COLUMNS) + '\n'
+    for row in projection:
+        yield ','.join(str(row[column]) for column in PROJECTION_COLUMNS) + '\n'
@@ -0,0 +1,206 @@
+from django.db import transaction
+from django.utils import timezone
+from edufundz.db import bulk_update_values
+from edufundz.stats_cache import LOANS, invalidate_stats
+from .models import Loan, Prepayment, Repayment
+from . import amortization
+from datetime import date
+import decimal
+import math
+
+# How the unpaid tail is recomputed after a payment that does not exactly
+# cover whole installments
+STRATEGY_CHOICES = (
+    # Keep the number of installments, lower each one
+    ('reduce_installment', 'Reduce installment'),
+    # Keep the installment, drop installments from the end
+    ('reduce_term', 'Reduce term'),
+)
+STRATEGIES = [choice for choice, _ in STRATEGY_CHOICES]
+
+
+def apply_payment(loan_id, amount, strategy='reduce_installment', payment_date=None, transaction_id=None):
+    """
+    Apply one payment to a loan, see apply_payments
+
+    Returns:
+        dict: The result for this payment
+    """
+    payment = {'loan_id': loan_id, 'amount': amount, 'transaction_id': transaction_id}
+    return apply_payments([payment], strategy=strategy, payment_date=payment_date)[0]
+
+
+def apply_payments(payments, strategy='reduce_installment', payment_date=None, chunk_size=1000):
+    """
+    Apply payments to loans and re-amortize the unpaid tail of each schedule
+
+    A payment settles outstanding installments in due date order for as
+    long as it covers them whole. What is left over is a prepayment: the
+    remaining installments are recomputed over the lower balance with the
+    chosen strategy, and a Prepayment row records it. Only the unpaid tail
+    is rewritten, with a bulk UPDATE joined against the new values;
+    installments a reduced term no longer needs are deleted. Virtual
+    schedules are materialized first, since the adjustment touches every
+    remaining installment.
+
+    Payments are processed in chunks of loans, each chunk in one
+    transaction holding row locks on its loans and their outstanding
+    repayments (always loan first, then repayments).
+
+    Args:
+        payments (list): Dicts with 'loan_id', 'amount' and optional 'transaction_id'
+        strategy (str): One of STRATEGIES
+        payment_date (date, optional): Defaults to today
+        chunk_size (int): Loans per transaction
+
+    Returns:
+        list: One result dict per payment, in input order
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unsupported strategy: {strategy}")
+
+    if payment_date is None:
+        payment_date = date.today()
+
+    by_loan = {}
+    for index, payment in enumerate(payments):
+        by_loan.setdefault(payment['loan_id'], []).append(index)
+
+    results = [None] * len(payments)
+    loan_ids = list(by_loan)
+    for start in range(0, len(loan_ids), chunk_size):
+        chunk = {loan_id: by_loan[loan_id] for loan_id in loan_ids[start:start + chunk_size]}
+        try:
+            for index, result in _apply_chunk(chunk, payments, strategy, payment_date).items():
+                results[index] = result
+        except Exception as e:
+            for indexes in chunk.values():
+                for index in indexes:
+                    results[index] = {'loan_id': payments[index]['loan_id'], 'status': 'error', 'detail': str(e)}
+
+    return results
+
+
+def _apply_chunk(chunk, payments, strategy, payment_date):
+    results = {}
+    now = timezone.now()
+
+    with transaction.atomic():
+        loans = Loan.objects.select_for_update().in_bulk(list(chunk))
+        active = {loan.id for loan in loans.values() if loan.status == 'active'}
+
+        virtual = [loan for loan in loans.values() if loan.schedule_mode == 'virtual']
+        if virtual:
+            Repayment.materialize_installments(virtual)
+            for loan in virtual:
+                loan.schedule_mode = 'materialized'
+
+        tails = {}
+        for repayment in Repayment.objects.select_for_update().filter(
+            loan_id__in=list(loans), status__in=Repayment.OUTSTANDING_STATUSES
+        ).order_by('loan_id', 'due_date'):
+            tails.setdefault(repayment.loan_id, []).append(repayment)
+
+        changed = {}
+        deleted = []
+        prepayments = []
+        for loan_id, indexes in chunk.items():
+            loan = loans.get(loan_id)
+            for index in indexes:
+                payment = payments[index]
+                if loan is None:
+                    results[index] = {'loan_id': loan_id, 'status': 'error', 'detail': 'Loan not found'}
+                    continue
+                try:
+                    results[index] = _apply(loan, tails.setdefault(loan_id, []), payment, strategy,
+                                            payment_date, changed, deleted, prepayments)
+                except ValueError as e:
+                    results[index] = {'loan_id': loan_id, 'status': 'error', 'detail': str(e)}
+
+        for repayment in changed.values():
+            repayment.updated_at = now
+        bulk_update_values(changed.values(), ['amount', 'status', 'payment_date', 'transaction_id', 'updated_at'])
+        if deleted:
+            Repayment.objects.filter(id__in=deleted).delete()
+        Prepayment.objects.bulk_create(prepayments, batch_size=1000)
+
+        for loan in loans.values():
+            loan.updated_at = now
+        bulk_update_values(
+            loans.values(), ['amount_paid', 'status', 'monthly_payment', 'due_date', 'schedule_mode', 'updated_at']
+        )
+        # bulk_update_values sends no signals
+        if any(loan.status != 'active' for loan_id, loan in loans.items() if loan_id in active):
+            invalidate_stats(LOANS)
+
+    return results
+
+
+def _apply(loan, tail, payment, strategy, payment_date, changed, deleted, prepayments):
+    """Apply one payment to a locked loan and its outstanding installments, in memory"""
+    amount = decimal.Decimal(payment['amount'])
+    outstanding = sum((repayment.amount for repayment in tail), decimal.Decimal('0.00'))
+
+    if amount <= 0:
+        raise ValueError("Payment amount must be greater than zero")
+    if loan.status != 'active':
+        raise ValueError(f"Loan is {loan.status}")
+    if amount > outstanding:
+        raise ValueError(f"Payment exceeds the outstanding balance of {outstanding}")
+
+    # Settle whole installments in due date order
+    remaining = amount
+    settled = 0
+    while tail and tail[0].amount <= remaining:
+        repayment = tail.pop(0)
+        repayment.status = 'paid'
+        repayment.payment_date = payment_date
+        repayment.transaction_id = payment.get('transaction_id')
+        changed[repayment.id] = repayment
+        remaining -= repayment.amount
+        settled += 1
+
+    # Re-amortize the tail over what is still owed. The tail's amounts already
+    # carry their interest, so the balance is spread as it is, not amortized again
+    if remaining > 0:
+        balance = outstanding - amount
+        if strategy == 'reduce_installment':
+            count = min(len(tail), int(balance / amortization.CENT))
+            installment = (balance / count).quantize(amortization.CENT, rounding=decimal.ROUND_DOWN)
+        else:
+            installment = loan.monthly_payment
+            count = min(len(tail), math.ceil(balance / installment))
+
+        for repayment, new_amount in zip(tail, _spread(balance, installment, count)):
+            repayment.amount = new_amount
+            changed[repayment.id] = repayment
+        for repayment in tail[count:]:
+            deleted.append(repayment.id)
+            changed.pop(repayment.id, None)
+        del tail[count:]
+
+        loan.monthly_payment = installment
+        if tail:
+            loan.due_date = tail[-1].due_date
+        prepayments.append(Prepayment(
+            loan_id=loan.id, user_id=loan.user_id, amount=remaining,
+            payment_date=payment_date, transaction_id=payment.get('transaction_id')
+        ))
+
+    loan.amount_paid += amount
+    if not tail:
+        loan.status = 'paid'
+
+    return {
+        'loan_id': loan.id,
+        'status': 'applied',
+        'settled_installments': settled,
+        'remaining_installments': len(tail),
+        'monthly_payment': loan.monthly_payment,
+        'remaining_balance': loan.calculate_remaining_balance(),
+    }
+
+
+def _spread(balance, installment, count):
+    """`count` installments of `installment` summing exactly to `balance`, the remainder in the last"""
+    return [installment] * (count - 1) + [balance - installment * (count - 1)]
@@ -0,0 +1,221 @@
+"""
+Repayments paid from the borrower's wallet
+
+A repayment paid from the wallet is a completed 'loan_repayment'
+Transaction, referenced loan-repayment-<repayment id>, whose journal
+debits the wallet to the loan repayment account, written in the same
+database transaction as the settled Repayment and the loan's running
+total. Manual payments and the auto-debit sweep lock in the same order,
+wallet -> loan -> repayment, and only settle a repayment still
+outstanding once it is locked; the unique reference backs that up, so an
+installment is never settled (or debited) twice.
+"""
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+from edufundz.db import bulk_update_values
+from edufundz.stats_cache import LOANS, TRANSACTIONS, WALLETS, invalidate_stats
+from wallet.ledger import InsufficientFunds, debit_wallet
+from wallet.models import LedgerEntry, Transaction, Wallet
+from .models import Loan, Repayment
+from datetime import date
+import uuid
+
+REFERENCE_PREFIX = 'loan-repayment-'
+
+
+class RepaymentAlreadyPaid(Exception):
+    """The repayment was settled before this payment could"""
+
+
+def repayment_reference(repayment_id):
+    return f"{REFERENCE_PREFIX}{repayment_id}"
+
+
+def _description(loan_id, due_date):
+    return f"Repayment of loan #{loan_id}, installment due {due_date.isoformat()}"
+
+
+def pay_from_wallet(repayment, payment_date=None):
+    """
+    Pay an installment from its borrower's wallet
+
+    Args:
+        repayment (Repayment): The installment, settled in place on success
+        payment_date (date, optional): Defaults to today
+
+    Returns:
+        Decimal: The new wallet balance
+
+    Raises:
+        RepaymentAlreadyPaid: If the installment is paid already (nothing is debited)
+        InsufficientFunds: If the wallet balance does not cover the installment
+        Wallet.DoesNotExist: If the borrower has no wallet
+    """
+    reference = repayment_reference(repayment.pk)
+    try:
+        with db_transaction.atomic():
+            # The wallet lock comes first and is the only one on the wallet, the debit below reuses it
+            wallet = Wallet.objects.select_for_update().filter(user_id=repayment.user_id).values_list(
+                'id', 'balance'
+            ).first()
+            if wallet is None:
+                raise Wallet.DoesNotExist(f"User #{repayment.user_id} has no wallet")
+            wallet_id, balance = wallet
+            if balance < repayment.amount:
+                raise InsufficientFunds(f"Wallet #{wallet_id} balance does not cover {repayment.amount}")
+
+            # Locks the loan, then settles the repayment only if it is still outstanding
+            if not repayment.settle(transaction_id=reference, payment_date=payment_date):
+                raise RepaymentAlreadyPaid(f"Repayment #{repayment.pk} is already paid")
+
+            transaction = Transaction.objects.create(
+                wallet_id=wallet_id,
+                amount=repayment.amount,
+                transaction_type='loan_repayment',
+                reference=reference,
+                status='completed',
+                description=_description(repayment.loan_id, repayment.due_date)
+            )
+            return debit_wallet(wallet_id, repayment.amount, 'loan_repayment', transaction=transaction)
+    except IntegrityError:
+        # The reference exists: another payment of this repayment committed first
+        raise RepaymentAlreadyPaid(f"Repayment #{repayment.pk} is already paid")
+
+
+def virtual_loan_chunks(chunk_size):
+    """Active virtual-schedule loans, one primary key range at a time"""
+    max_id = Loan.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    for start in range(0, max_id + 1, chunk_size):
+        loans = list(
+            Loan.objects.filter(id__gte=start, id__lt=start + chunk_size, status='active', schedule_mode='virtual')
+            .annotate(stored_through=Max('repayments__due_date'))
+            .only('id', 'user_id', 'amount', 'monthly_payment', 'term_months', 'disbursed_date')
+        )
+        if loans:
+            yield loans
+
+
+def auto_debit(as_of=None, chunk_size=5000, payment_date=None):
+    """
+    Settle every due installment its borrower's wallet balance covers
+
+    Virtual-schedule loans first get their installments due by `as_of`
+    stored, one bulk insert per chunk of loans, so they are debited like
+    any other. Then walks the outstanding installments due on or before
+    `as_of` by (due_date, id), a chunk at a time. Each chunk is one database
+    transaction with a fixed number of statements however many rows it
+    settles: lock the wallets holding a balance (id order), pick the
+    installments they cover (oldest first per wallet), lock their loans and
+    the installments themselves (dropping any settled meanwhile), then one
+    bulk insert of the transactions and of the ledger entries and one
+    VALUES-join UPDATE each for the repayments, the wallet balances and
+    the loans' running totals.
+
+    Args:
+        as_of (date, optional): Installments due on or before this date, defaults to today
+        chunk_size (int): Installments considered per transaction
+        payment_date (date, optional): Payment date recorded, defaults to today
+
+    Yields:
+        dict: Per chunk, installments 'considered', 'paid', 'amount' paid and
+            'last' (due_date, id) key reached
+    """
+    as_of = as_of or date.today()
+    payment_date = payment_date or date.today()
+    for loans in virtual_loan_chunks(chunk_size):
+        Repayment.materialize_installments(loans, through=as_of)
+    due = Repayment.objects.filter(status__in=Repayment.OUTSTANDING_STATUSES, due_date__lte=as_of)
+
+    after = None
+    while True:
+        chunk = due
+        if after is not None:
+            chunk = chunk.filter(Q(due_date__gt=after[0]) | Q(due_date=after[0], id__gt=after[1]))
+        rows = list(chunk.order_by('due_date', 'id').values_list('id', 'loan_id', 'user_id', 'amount', 'due_date')[:chunk_size])
+        if not rows:
+            return
+        after = (rows[-1][4], rows[-1][0])
+        paid, amount = _auto_debit_chunk(rows, payment_date)
+        yield {'considered': len(rows), 'paid': paid, 'amount': amount, 'last': after}
+
+
+def _auto_debit_chunk(rows, payment_date):
+    with db_transaction.atomic():
+        wallets = {
+            user_id: [wallet_id, balance]
+            for wallet_id, user_id, balance in Wallet.objects.select_for_update()
+            .filter(user_id__in={user_id for _, _, user_id, _, _ in rows}, balance__gt=0)
+            .order_by('id').values_list('id', 'user_id', 'balance')
+        }
+
+        # Rows are in due date order, so each wallet covers its oldest installments first
+        covered = []
+        for repayment_id, loan_id, user_id, amount, due_date in rows:
+            wallet = wallets.get(user_id)
+            if wallet is not None and wallet[1] >= amount:
+                wallet[1] -= amount
+                covered.append((repayment_id, loan_id, wallet[0], amount, due_date))
+        if not covered:
+            return 0, 0
+
+        list(Loan.objects.select_for_update().filter(
+            id__in={loan_id for _, loan_id, _, _, _ in covered}
+        ).order_by('id').values_list('id'))
+        # A manual payment may have settled some since they were read
+        outstanding = set(Repayment.objects.select_for_update().filter(
+            id__in=[repayment_id for repayment_id, _, _, _, _ in covered],
+            status__in=Repayment.OUTSTANDING_STATUSES
+        ).values_list('id', flat=True))
+        covered = [row for row in covered if row[0] in outstanding]
+        if not covered:
+            return 0, 0
+
+        now = timezone.now()
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                wallet_id=wallet_id,
+                amount=amount,
+                transaction_type='loan_repayment',
+                reference=repayment_reference(repayment_id),
+                status='completed',
+                description=_description(loan_id, due_date)
+            )
+            for repayment_id, loan_id, wallet_id, amount, due_date in covered
+        ], batch_size=1000)
+
+        entries = []
+        wallet_deltas, loan_totals = {}, {}
+        for (repayment_id, loan_id, wallet_id, amount, _), transaction in zip(covered, transactions):
+            journal = uuid.uuid4()
+            entries.append(LedgerEntry(journal=journal, account='wallet', wallet_id=wallet_id,
+                                       transaction_id=transaction.id, amount=-amount))
+            entries.append(LedgerEntry(journal=journal, account='loan_repayment', transaction_id=transaction.id,
+                                       amount=amount))
+            wallet_deltas[wallet_id] = wallet_deltas.get(wallet_id, 0) - amount
+            loan_totals[loan_id] = loan_totals.get(loan_id, 0) + amount
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+        bulk_update_values(
+            [
+                Repayment(id=repayment_id, status='paid', payment_date=payment_date,
+                          transaction_id=repayment_reference(repayment_id), updated_at=now)
+                for repayment_id, _, _, _, _ in covered
+            ],
+            ['status', 'payment_date', 'transaction_id', 'updated_at']
+        )
+        bulk_update_values(
+            [Wallet(id=wallet_id, balance=delta, updated_at=now) for wallet_id, delta in sorted(wallet_deltas.items())],
+            ['balance', 'updated_at'], increment=['balance']
+        )
+        bulk_update_values(
+            [Loan(id=loan_id, amount_paid=total, updated_at=now) for loan_id, total in sorted(loan_totals.items())],
+            ['amount_paid', 'updated_at'], increment=['amount_paid']
+        )
+        # As Loan.record_payment: a loan whose total reaches its amount is paid
+        if Loan.objects.filter(id__in=list(loan_totals), status='active', amount_paid__gte=F('amount')).update(
+            status='paid', updated_at=now
+        ):
+            invalidate_stats(LOANS)
+        invalidate_stats(TRANSACTIONS, WALLETS)
+        return len(covered), sum(amount for _, _, _, amount, _ in covered)
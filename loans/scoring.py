@@ -0,0 +1,89 @@
+"""
+Risk scoring for loan applications
+
+Kept free of Django imports so ProcessPoolExecutor workers can import it
+under any start method (fork, spawn or forkserver) without setting up
+Django. Features are extracted in the parent, see loans.features.
+"""
+import math
+
+# Logistic weights over the features of one application. Hand-set, to be
+# recalibrated once enough loans have run to term.
+INTERCEPT = -2.0
+WEIGHTS = {
+    # Smoothed default rate of loans taken by students of the same school
+    'school_default_rate': 3.0,
+    # Share of the applicant's previous loans that defaulted
+    'prior_default_rate': 2.5,
+    # Share of the applicant's due installments that were missed / paid late
+    'missed_rate': 1.5,
+    'late_rate': 0.75,
+    # log(1 + (requested + outstanding) / deposited), deposits below the
+    # requested amount count as the requested amount
+    'leverage': 1.0,
+    # Share of wallet transactions that failed
+    'failed_rate': 0.5,
+    # Fully repaid previous loans, capped at 4
+    'repaid_loans': -0.25,
+    # 1 if the wallet has ever received a completed deposit
+    'has_deposits': -0.5,
+}
+
+# Beta prior for the school default rate, so small schools score near the base rate
+SCHOOL_PRIOR_RATE = 0.1
+SCHOOL_PRIOR_WEIGHT = 5
+
+
+def _share(part, total):
+    return part / total if total else 0.0
+
+
+def derive(raw):
+    """
+    Turn raw per-application counts into the model inputs of WEIGHTS
+
+    Args:
+        raw (dict): Counts and sums from loans.features.extract_features
+
+    Returns:
+        dict: One value per WEIGHTS key
+    """
+    installments = raw['repayments_paid'] + raw['repayments_late'] + raw['repayments_missed']
+    exposure = raw['amount'] + raw['outstanding']
+
+    return {
+        'school_default_rate': (raw['school_defaulted'] + SCHOOL_PRIOR_RATE * SCHOOL_PRIOR_WEIGHT)
+                               / (raw['school_loans'] + SCHOOL_PRIOR_WEIGHT),
+        'prior_default_rate': _share(raw['loans_defaulted'], raw['loans']),
+        'missed_rate': _share(raw['repayments_missed'], installments),
+        'late_rate': _share(raw['repayments_late'], installments),
+        'leverage': math.log1p(exposure / max(raw['deposited'], raw['amount'], 1.0)),
+        'failed_rate': _share(raw['transactions_failed'], raw['transactions']),
+        'repaid_loans': min(raw['loans_paid'], 4),
+        'has_deposits': 1.0 if raw['deposited'] > 0 else 0.0,
+    }
+
+
+def score(raw):
+    """
+    Risk score of one application, 0 (lowest risk) to 100 (highest)
+
+    Returns:
+        float: Score rounded to 2 decimal places
+    """
+    inputs = derive(raw)
+    z = INTERCEPT + sum(weight * inputs[name] for name, weight in WEIGHTS.items())
+    return round(100 / (1 + math.exp(-z)), 2)
+
+
+def score_batch(batch):
+    """
+    Score a batch of applications, the unit of work sent to a worker process
+
+    Args:
+        batch (list): (application_id, raw features) pairs
+
+    Returns:
+        list: (application_id, score) pairs
+    """
+    return [(application_id, score(raw)) for application_id, raw in batch]
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import LoanApplication, Loan, Repayment
+from .reamortization import STRATEGY_CHOICES
+import decimal
 
 class LoanApplicationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,15 +15,21 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
         validated_data['user'] = user
         return super().create(validated_data)
 
+class LoanApplicationAdminSerializer(LoanApplicationSerializer):
+    """Loan application with its risk score, for admin triage"""
+    class Meta(LoanApplicationSerializer.Meta):
+        fields = LoanApplicationSerializer.Meta.fields + ['risk_score', 'scored_at']
+        read_only_fields = LoanApplicationSerializer.Meta.read_only_fields + ['risk_score', 'scored_at']
+
 class LoanSerializer(serializers.ModelSerializer):
     class Meta:
         model = Loan
         fields = [
             'id', 'application', 'user', 'amount', 'interest_rate', 'term_months', 
-            'monthly_payment', 'status', 'disbursed_date', 'due_date', 
+            'monthly_payment', 'amount_paid', 'status', 'schedule_mode', 'disbursed_date', 'due_date', 
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'amount_paid', 'schedule_mode', 'created_at', 'updated_at']
 
 class RepaymentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,4 +38,42 @@ class RepaymentSerializer(serializers.ModelSerializer):
             'id', 'loan', 'user', 'amount', 'due_date', 'payment_date', 
             'status', 'transaction_id', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['user', 'created_at', 'updated_at'] 
\ No newline at end of file
+        read_only_fields = ['user', 'created_at', 'updated_at'] 
+
+class BulkApprovalItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, required=False)
+    term_months = serializers.IntegerField(min_value=1, max_value=600, required=False)
+
+class BulkApprovalSerializer(serializers.Serializer):
+    applications = BulkApprovalItemSerializer(many=True, allow_empty=False, max_length=10000)
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, default=5.0)
+    term_months = serializers.IntegerField(min_value=1, max_value=600, default=12)
+    
+    def validate_applications(self, value):
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Application ids must be unique")
+        return value
+    
+    def validate(self, attrs):
+        # Fill per-application terms from the batch defaults
+        for item in attrs['applications']:
+            item.setdefault('interest_rate', attrs['interest_rate'])
+            item.setdefault('term_months', attrs['term_months'])
+        return attrs
+
+class LoanQuoteSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=decimal.Decimal('0.01'))
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100, default=5.0)
+    term_months = serializers.IntegerField(min_value=1, max_value=600, default=12)
+    disbursed_date = serializers.DateField(required=False)
+
+class InstallmentPaymentSerializer(serializers.Serializer):
+    due_date = serializers.DateField()
+
+class LoanPaymentSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=decimal.Decimal('0.01'))
+    strategy = serializers.ChoiceField(choices=STRATEGY_CHOICES, default='reduce_installment')
+    transaction_id = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    payment_date = serializers.DateField(required=False)
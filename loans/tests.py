@@ -0,0 +1,467 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+import io
+import json
+
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from loans.amortization import build_schedule
+from loans.approvals import approve_application
+from loans.features import extract_features
+from loans.reamortization import apply_payment
+from loans.models import Loan, LoanApplication, Repayment
+from loans.projection import derive_virtual_rows
+from loans.reports import portfolio_aging
+from loans.repayments import auto_debit
+from loans.scoring import score
+from users.models import User
+from wallet.ledger import credit_wallet
+from wallet.models import Wallet
+
+
+def create_loan(user, amount='1200.00', interest_rate='0', term_months=12):
+    application = LoanApplication.objects.create(user=user, amount=Decimal(amount), reason='tuition')
+    return approve_application(application, Decimal(interest_rate), term_months)
+
+
+class BorrowerTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='borrower@example.com', username='borrower')
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fund(self, amount):
+        credit_wallet(self.wallet.id, Decimal(amount), 'paystack')
+
+
+class AmortizationTests(SimpleTestCase):
+    def amounts(self, quote):
+        return [installment['amount'] for installment in quote['schedule']]
+
+    def test_schedule_sums_to_the_principal(self):
+        quote = build_schedule(Decimal('1000.00'), Decimal('12'), 12, date(2030, 1, 15))
+
+        amounts = self.amounts(quote)
+        self.assertEqual(quote['monthly_payment'], Decimal('88.85'))
+        self.assertEqual(amounts[:-1], [Decimal('88.85')] * 11)
+        self.assertEqual(amounts[-1], Decimal('1000.00') - Decimal('88.85') * 11)
+        self.assertEqual(sum(amounts), quote['total_repayable'])
+        self.assertEqual(quote['total_repayable'], Decimal('1000.00'))
+
+    def test_final_installment_is_clamped_to_a_cent(self):
+        quote = build_schedule(Decimal('100.00'), Decimal('300'), 12, date(2030, 1, 15))
+
+        amounts = self.amounts(quote)
+        self.assertGreater(quote['monthly_payment'] * 11, Decimal('100.00'))
+        self.assertEqual(amounts[-1], Decimal('0.01'))
+        self.assertEqual(quote['total_repayable'], quote['monthly_payment'] * 11 + Decimal('0.01'))
+
+    def test_zero_rate_splits_the_principal_evenly(self):
+        quote = build_schedule(Decimal('1000.00'), Decimal('0'), 3, date(2030, 1, 31))
+
+        self.assertEqual(self.amounts(quote), [Decimal('333.33'), Decimal('333.33'), Decimal('333.34')])
+        self.assertEqual(quote['total_repayable'], Decimal('1000.00'))
+        # Due days are capped at the 28th
+        self.assertEqual(
+            [installment['due_date'] for installment in quote['schedule']],
+            [date(2030, 2, 28), date(2030, 3, 28), date(2030, 4, 28)]
+        )
+
+
+class LoanQuoteTests(SimpleTestCase):
+    def setUp(self):
+        # The endpoint is throttled per client
+        cache.clear()
+        self.client = APIClient()
+
+    def test_quotes_a_schedule(self):
+        response = self.client.get('/api/loans/quote/', {
+            'amount': '1000.00', 'interest_rate': '12', 'term_months': 12, 'disbursed_date': '2030-01-15'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['monthly_payment']), Decimal('88.85'))
+        self.assertEqual(len(response.data['schedule']), 12)
+        self.assertEqual(response.data['schedule'][0]['due_date'], date(2030, 2, 15))
+
+    def test_rejects_invalid_parameters(self):
+        for params, field in [
+            ({}, 'amount'),
+            ({'amount': '0'}, 'amount'),
+            ({'amount': 'abc'}, 'amount'),
+            ({'amount': '100', 'interest_rate': '-1'}, 'interest_rate'),
+            ({'amount': '100', 'interest_rate': '101'}, 'interest_rate'),
+            ({'amount': '100', 'term_months': '0'}, 'term_months'),
+            ({'amount': '100', 'term_months': '601'}, 'term_months'),
+            ({'amount': '100', 'disbursed_date': 'tomorrow'}, 'disbursed_date'),
+        ]:
+            response = self.client.get('/api/loans/quote/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(field, response.data)
+
+
+class RepaymentScheduleTests(BorrowerTestCase):
+    def test_approval_stores_a_schedule_summing_to_the_loan(self):
+        loan = create_loan(self.user, amount='1000.00')
+
+        amounts = list(loan.repayments.order_by('due_date').values_list('amount', flat=True))
+        self.assertEqual(len(amounts), 12)
+        self.assertEqual(sum(amounts), Decimal('1000.00'))
+        self.assertEqual(amounts[0], loan.monthly_payment)
+
+    def test_regeneration_replaces_the_pending_schedule(self):
+        loan = create_loan(self.user, amount='300.00', term_months=3)
+        before = set(loan.repayments.values_list('id', flat=True))
+
+        Repayment.generate_repayment_schedule(loan)
+
+        self.assertEqual(loan.repayments.count(), 3)
+        self.assertFalse(before & set(loan.repayments.values_list('id', flat=True)))
+
+    def test_failed_schedule_leaves_the_application_pending(self):
+        application = LoanApplication.objects.create(user=self.user, amount=Decimal('300.00'), reason='tuition')
+
+        with mock.patch.object(Repayment, 'generate_repayment_schedule', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                approve_application(application, Decimal('0'), 3)
+
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'pending')
+        self.assertFalse(Loan.objects.exists())
+
+
+class SweepRepaymentStatusesTests(BorrowerTestCase):
+    def sweep(self, as_of):
+        call_command('sweep_repayment_statuses', as_of=as_of, stdout=io.StringIO())
+
+    def assert_statuses(self, loan, as_of):
+        for due_date, status in loan.repayments.values_list('due_date', 'status'):
+            overdue = (as_of - due_date).days
+            expected = 'missed' if overdue >= 30 else 'late' if overdue >= 1 else 'pending'
+            self.assertEqual(status, expected, due_date)
+
+    def test_flags_overdue_installments_and_defaults_the_loan(self):
+        loan = create_loan(self.user)
+        # The first installment is more than 90 days overdue
+        as_of = loan.disbursed_date + timedelta(days=125)
+
+        self.sweep(as_of)
+
+        self.assert_statuses(loan, as_of)
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'defaulted')
+
+    def test_recent_arrears_do_not_default(self):
+        loan = create_loan(self.user)
+        # Missed, but not 90 days overdue
+        as_of = loan.disbursed_date + timedelta(days=70)
+
+        self.sweep(as_of)
+
+        self.assert_statuses(loan, as_of)
+        self.assertTrue(loan.repayments.filter(status='missed').exists())
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'active')
+
+    @override_settings(LOAN_SCHEDULE_MODE='virtual')
+    def test_stores_and_flags_virtual_installments(self):
+        loan = create_loan(self.user)
+        as_of = loan.disbursed_date + timedelta(days=45)
+
+        self.sweep(as_of)
+
+        self.assertEqual(loan.repayments.count(), 1)
+        self.assert_statuses(loan, as_of)
+
+
+@override_settings(LOAN_SCHEDULE_MODE='virtual')
+class VirtualSchedulePaymentTests(BorrowerTestCase):
+    def test_reads_store_nothing(self):
+        loan = create_loan(self.user)
+
+        self.assertEqual(self.client.get('/api/loans/repayments/').status_code, 200)
+        response = self.client.get(f"/api/loans/loans/{loan.id}/schedule/")
+
+        self.assertEqual(len(response.data), 12)
+        self.assertTrue(all(row['id'] is None for row in response.data))
+        self.assertFalse(Repayment.objects.filter(loan=loan).exists())
+        self.assertEqual(str(loan.get_next_repayment().due_date), str(response.data[0]['due_date']))
+
+    def test_installment_is_stored_when_paid_by_due_date(self):
+        loan = create_loan(self.user)
+        schedule = self.client.get(f"/api/loans/loans/{loan.id}/schedule/").data
+        url = f"/api/loans/loans/{loan.id}/pay_installment/"
+
+        self.fund('100.00')
+        response = self.client.post(url, {'due_date': schedule[0]['due_date']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['wallet_balance'], Decimal('0.00'))
+        loan.refresh_from_db()
+        self.assertEqual(loan.amount_paid, Decimal('100.00'))
+        self.assertEqual(loan.repayments.count(), 1)
+
+        schedule = self.client.get(f"/api/loans/loans/{loan.id}/schedule/").data
+        self.assertEqual([row['status'] for row in schedule[:2]], ['paid', 'pending'])
+        self.assertIsNotNone(schedule[0]['id'])
+        self.assertIsNone(schedule[1]['id'])
+
+        self.assertEqual(self.client.post(url, {'due_date': schedule[0]['due_date']}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'due_date': '1999-01-01'}, format='json').status_code, 404)
+
+
+class AgingReportTests(BorrowerTestCase):
+    as_of = date(2030, 4, 1)
+
+    def create_loan(self, schedule_mode, interest_rate='12'):
+        application = LoanApplication.objects.create(user=self.user, amount=Decimal('1000.00'), reason='tuition')
+        with override_settings(LOAN_SCHEDULE_MODE=schedule_mode):
+            # Installments due on the 15th from February 2030
+            return approve_application(application, Decimal(interest_rate), 12, disbursed_date=date(2030, 1, 15))
+
+    def test_buckets_stored_installments_by_days_past_due(self):
+        loan = self.create_loan('materialized')
+        amounts = list(loan.repayments.order_by('due_date').values_list('amount', flat=True))
+
+        row, = portfolio_aging(as_of=self.as_of)
+
+        self.assertEqual(row['days_31_60'], amounts[0])
+        self.assertEqual(row['days_1_30'], amounts[1])
+        self.assertEqual(row['current'], sum(amounts[2:]))
+        self.assertEqual(row['outstanding'], sum(amounts))
+        self.assertEqual(row['repayments'], 12)
+
+    def test_virtual_schedules_age_like_stored_ones(self):
+        # At this rate the final installment is clamped to a cent
+        stored = self.create_loan('materialized', interest_rate='300')
+        expected, = portfolio_aging(as_of=self.as_of)
+        stored.delete()
+
+        loan = self.create_loan('virtual', interest_rate='300')
+        self.assertEqual(portfolio_aging(as_of=self.as_of), [expected])
+        self.assertGreater(expected['outstanding'], loan.amount)
+
+        # With its overdue installments stored and flagged, the totals hold
+        loan.materialize_schedule(through=self.as_of)
+        Repayment.objects.filter(loan=loan).update(status='late')
+        self.assertEqual(portfolio_aging(as_of=self.as_of), [expected])
+
+    def test_groups_virtual_installments(self):
+        self.create_loan('virtual')
+
+        row, = portfolio_aging(group_by='loan_status', as_of=self.as_of)
+
+        self.assertEqual(row['loan_status'], 'active')
+        self.assertGreater(row['days_31_60'], 0)
+        self.assertEqual(row['repayments'], 12)
+
+
+@override_settings(LOAN_SCHEDULE_MODE='virtual')
+class ProjectionTests(BorrowerTestCase):
+    def test_derived_rows_match_the_scalar_schedule(self):
+        loans = []
+        for amount, interest_rate, term_months, disbursed_date in [
+            ('1000.00', '12', 12, date(2030, 1, 31)),
+            ('100.00', '300', 12, date(2030, 3, 15)),
+            ('1000.00', '0', 7, date(2030, 11, 5)),
+            ('2500.00', '19.5', 36, date(2031, 6, 28)),
+        ]:
+            application = LoanApplication.objects.create(user=self.user, amount=Decimal(amount), reason='tuition')
+            loans.append(approve_application(application, Decimal(interest_rate), term_months, disbursed_date))
+        loans[3].materialize_schedule(through=date(2032, 1, 1))
+        self.assertEqual(loans[3].repayments.count(), 6)
+
+        expected = sorted(
+            (loan.id, repayment.due_date.year * 12 + repayment.due_date.month - 1, repayment.amount)
+            for loan in loans
+            for repayment in Repayment.build_repayment_schedule(loan)
+            if not loan.repayments.filter(due_date=repayment.due_date).exists()
+        )
+        rows = sorted(derive_virtual_rows().tolist(), key=lambda row: (row[0], row[1]))
+
+        self.assertEqual(len(rows), len(expected))
+        for (loan_id, due_month, _, amount), (expected_loan, expected_month, expected_amount) in zip(rows, expected):
+            self.assertEqual((loan_id, due_month), (expected_loan, expected_month))
+            self.assertAlmostEqual(amount, float(expected_amount), places=6)
+
+
+NO_HISTORY = {
+    'amount': 1000.0, 'school_loans': 0, 'school_defaulted': 0, 'loans': 0, 'loans_defaulted': 0,
+    'loans_paid': 0, 'outstanding': 0.0, 'repayments_paid': 0, 'repayments_late': 0, 'repayments_missed': 0,
+    'transactions': 0, 'transactions_failed': 0, 'deposited': 0.0,
+}
+
+
+class ScoreTests(SimpleTestCase):
+    def test_applicant_without_history_scores_from_the_priors(self):
+        # School default rate at the prior (0.1) and a leverage of log(2)
+        self.assertEqual(score(NO_HISTORY), 26.76)
+        # Nothing requested, deposited or owed: no leverage rather than a division by zero
+        self.assertEqual(score({**NO_HISTORY, 'amount': 0.0}), 15.45)
+
+    def test_scores_stay_within_bounds(self):
+        worst = score({
+            **NO_HISTORY, 'amount': 1e12, 'outstanding': 1e12, 'school_loans': 10 ** 6, 'school_defaulted': 10 ** 6,
+            'loans': 5, 'loans_defaulted': 5, 'repayments_missed': 60, 'transactions': 10, 'transactions_failed': 10,
+        })
+        best = score({
+            **NO_HISTORY, 'amount': 1.0, 'school_loans': 10 ** 6, 'loans': 10, 'loans_paid': 10,
+            'repayments_paid': 120, 'transactions': 50, 'deposited': 1e9,
+        })
+        self.assertLessEqual(worst, 100)
+        self.assertGreater(worst, 99)
+        self.assertGreater(best, 0)
+        self.assertLess(best, 5)
+
+    def test_risk_grows_with_missed_installments_and_repaid_loans_are_capped(self):
+        history = {**NO_HISTORY, 'loans': 2, 'loans_paid': 1, 'repayments_paid': 10}
+        self.assertLess(score(history), score({**history, 'repayments_late': 2}))
+        self.assertLess(score({**history, 'repayments_late': 2}), score({**history, 'repayments_missed': 2}))
+        self.assertEqual(score({**history, 'loans_paid': 4}), score({**history, 'loans_paid': 9}))
+
+
+class ScoreApplicationsTests(BorrowerTestCase):
+    def test_applicant_without_school_loans_or_wallet_activity(self):
+        application = LoanApplication.objects.create(user=self.user, amount=Decimal('1000.00'), reason='tuition')
+
+        (application_id, raw), = extract_features([application.id])
+
+        self.assertEqual(application_id, application.id)
+        self.assertEqual(raw, NO_HISTORY)
+
+    def test_scores_pending_applications_once(self):
+        application = LoanApplication.objects.create(user=self.user, amount=Decimal('1000.00'), reason='tuition')
+        create_loan(self.user)
+
+        call_command('score_applications', workers=0, stdout=io.StringIO())
+
+        application.refresh_from_db()
+        self.assertEqual(application.risk_score, Decimal(str(score(extract_features([application.id])[0][1]))))
+        scored_at = application.scored_at
+        self.assertEqual(LoanApplication.objects.filter(risk_score__isnull=False).count(), 1)
+
+        call_command('score_applications', workers=0, stdout=io.StringIO())
+        application.refresh_from_db()
+        self.assertEqual(application.scored_at, scored_at)
+
+
+class ReamortizationTests(BorrowerTestCase):
+    def outstanding(self, loan):
+        return list(loan.repayments.filter(status__in=Repayment.OUTSTANDING_STATUSES).order_by('due_date'))
+
+    def test_reduce_installment_spreads_the_balance_exactly(self):
+        loan = create_loan(self.user, amount='1000.00', interest_rate='12', term_months=12)
+        owed = sum(repayment.amount for repayment in self.outstanding(loan))
+        payment = loan.monthly_payment + Decimal('55.55')
+
+        result = apply_payment(loan.id, payment, strategy='reduce_installment')
+
+        self.assertEqual(result['status'], 'applied')
+        self.assertEqual(result['settled_installments'], 1)
+        tail = self.outstanding(loan)
+        self.assertEqual(len(tail), 11)
+        self.assertEqual(sum(repayment.amount for repayment in tail), owed - payment)
+        # Equal installments, any remainder cent in the last
+        self.assertEqual(len({repayment.amount for repayment in tail[:-1]}), 1)
+        self.assertGreaterEqual(tail[-1].amount, tail[0].amount)
+        loan.refresh_from_db()
+        self.assertEqual(loan.amount_paid, payment)
+
+    def test_reduce_term_keeps_the_installment(self):
+        loan = create_loan(self.user, amount='1000.00', interest_rate='12', term_months=12)
+        owed = sum(repayment.amount for repayment in self.outstanding(loan))
+        payment = loan.monthly_payment * 3 + Decimal('10.00')
+
+        apply_payment(loan.id, payment, strategy='reduce_term')
+
+        tail = self.outstanding(loan)
+        self.assertEqual(len(tail), 9)
+        self.assertEqual(sum(repayment.amount for repayment in tail), owed - payment)
+        self.assertTrue(all(repayment.amount == loan.monthly_payment for repayment in tail[:-1]))
+        self.assertGreater(tail[-1].amount, 0)
+
+    def test_paying_the_rest_closes_the_loan(self):
+        loan = create_loan(self.user, amount='300.00', term_months=3)
+
+        apply_payment(loan.id, Decimal('300.00'))
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'paid')
+        self.assertEqual(self.outstanding(loan), [])
+
+    def test_prepayments_stay_in_the_rebuilt_balance(self):
+        loan = create_loan(self.user, amount='1000.00', interest_rate='10', term_months=12)
+        apply_payment(loan.id, Decimal('50'))
+        # Whole installments are the re-amortized ones now
+        installment = self.outstanding(loan)[0].amount
+        apply_payment(loan.id, installment + Decimal('20.00'), strategy='reduce_term')
+
+        loan.refresh_from_db()
+        self.assertEqual(list(loan.prepayments.values_list('amount', flat=True)), [Decimal('50.00'), Decimal('20.00')])
+        paid = loan.amount_paid
+        call_command('rebuild_loan_balances', verify=True, stdout=io.StringIO())
+
+        call_command('rebuild_loan_balances', stdout=io.StringIO())
+        loan.refresh_from_db()
+        self.assertEqual(loan.amount_paid, paid)
+
+
+class AutoDebitTests(BorrowerTestCase):
+    def run_auto_debit(self, loan, months):
+        as_of = loan.disbursed_date + timedelta(days=31 * months)
+        return list(auto_debit(as_of=as_of, payment_date=as_of))
+
+    def test_debits_due_installments_the_balance_covers(self):
+        loan = create_loan(self.user)
+        self.fund('250.00')
+
+        chunks = self.run_auto_debit(loan, 3)
+
+        self.assertEqual(sum(chunk['paid'] for chunk in chunks), 2)
+        self.assertEqual(sum(chunk['amount'] for chunk in chunks), Decimal('200.00'))
+        loan.refresh_from_db()
+        self.wallet.refresh_from_db()
+        self.assertEqual(loan.amount_paid, Decimal('200.00'))
+        self.assertEqual(self.wallet.balance, Decimal('50.00'))
+        self.assertEqual(loan.repayments.filter(status='paid').count(), 2)
+
+        # Settled installments are not debited again
+        self.run_auto_debit(loan, 3)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('50.00'))
+
+    @override_settings(LOAN_SCHEDULE_MODE='virtual')
+    def test_stores_and_debits_due_virtual_installments(self):
+        loan = create_loan(self.user)
+        self.fund('1000.00')
+        self.assertFalse(Repayment.objects.filter(loan=loan).exists())
+
+        chunks = self.run_auto_debit(loan, 3)
+
+        self.assertEqual(sum(chunk['paid'] for chunk in chunks), 3)
+        self.assertEqual(list(loan.repayments.values_list('status', flat=True)), ['paid'] * 3)
+        loan.refresh_from_db()
+        self.wallet.refresh_from_db()
+        self.assertEqual(loan.amount_paid, Decimal('300.00'))
+        self.assertEqual(self.wallet.balance, Decimal('700.00'))
+
+
+class IdempotentRepaymentTests(BorrowerTestCase):
+    def test_retried_payment_debits_once(self):
+        loan = create_loan(self.user)
+        repayment = loan.repayments.order_by('due_date').first()
+        self.fund('250.00')
+        url = f"/api/loans/repayments/{repayment.id}/pay/"
+
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='pay-1')
+        retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='pay-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(retry.content), json.loads(first.content))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('150.00'))
@@ -9,4 +9,5 @@ router.register(r'repayments', views.RepaymentViewSet, basename='repayment')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('quote/', views.loan_quote, name='loan-quote'),
 ] 
\ No newline at end of file
@@ -1,9 +1,17 @@
 from rest_framework import viewsets, status, generics, permissions
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, action
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from .models import LoanApplication, Loan, Repayment
-from .serializers import LoanApplicationSerializer, LoanSerializer, RepaymentSerializer
+from .serializers import (
+    InstallmentPaymentSerializer, LoanApplicationSerializer, LoanSerializer, RepaymentSerializer, LoanQuoteSerializer
+)
+from . import amortization
+from .approvals import approve_application
+from .repayments import RepaymentAlreadyPaid, pay_from_wallet
+from wallet.ledger import InsufficientFunds
+from wallet.models import Wallet
+from wallet.idempotency import idempotent
 from datetime import date
 
 class LoanApplicationViewSet(viewsets.ModelViewSet):
@@ -39,30 +47,18 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         term_months = request.data.get('term_months', 12)
         
         try:
-            # Update application status
-            application.status = 'approved'
-            application.save()
-            
-            # Create a loan from the application
-            loan = Loan.create_from_application(
+            approve_application(
                 application=application,
                 interest_rate=interest_rate,
                 term_months=term_months,
                 disbursed_date=date.today()
             )
-            loan.save()
-            
-            # Generate repayment schedule
-            Repayment.generate_repayment_schedule(loan)
-            
-            # Return updated application with loan details
-            serializer = self.get_serializer(application)
-            return Response(serializer.data)
         except Exception as e:
-            # Revert application status if loan creation fails
-            application.status = 'pending'
-            application.save()
             return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Return updated application with loan details
+        serializer = self.get_serializer(application)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
@@ -96,12 +92,29 @@ class LoanViewSet(viewsets.ReadOnlyModelViewSet):
     def schedule(self, request, pk=None):
         """
         Get the repayment schedule for a loan
+        
+        Installments of a virtual schedule that are not stored yet have no
+        id, they are paid by due date with pay_installment.
         """
         loan = self.get_object()
-        repayments = loan.repayments.all().order_by('due_date')
-        serializer = RepaymentSerializer(repayments, many=True)
+        serializer = RepaymentSerializer(loan.get_schedule(), many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'])
+    @idempotent('installment')
+    def pay_installment(self, request, pk=None):
+        """
+        Pay the installment due on a date from the wallet balance, stored or not
+        """
+        loan = self.get_object()
+        serializer = InstallmentPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        repayment = loan.get_installment(serializer.validated_data['due_date'])
+        if repayment is None:
+            return Response({'detail': 'No installment is due on that date'}, status=status.HTTP_404_NOT_FOUND)
+        return _pay(repayment)
+    
     @action(detail=True, methods=['get'])
     def remaining_balance(self, request, pk=None):
         """
@@ -119,23 +132,61 @@ class RepaymentViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
+        # Stored installments only, see LoanViewSet.schedule for the derived ones
         return Repayment.objects.filter(user=self.request.user)
     
     @action(detail=True, methods=['post'])
+    @idempotent('repayment')
     def pay(self, request, pk=None):
         """
-        Mark a repayment as paid (linked with wallet transaction)
+        Pay a repayment from the wallet balance
         """
-        repayment = self.get_object()
-        
-        if repayment.status == 'paid':
-            return Response({'detail': 'Repayment already paid'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Logic to handle the payment will be added here
-        # This would typically involve:
-        # 1. Checking wallet balance
-        # 2. Creating a transaction
-        # 3. Updating the repayment status
-        
-        return Response({'detail': 'Payment endpoint needs to be linked with wallet transactions'}, 
-                        status=status.HTTP_501_NOT_IMPLEMENTED) 
\ No newline at end of file
+        return _pay(self.get_object())
+
+def _pay(repayment):
+    """Pay a stored installment from its borrower's wallet, as a response"""
+    if repayment.status == 'paid':
+        return Response({'detail': 'Repayment already paid'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        balance = pay_from_wallet(repayment)
+    except RepaymentAlreadyPaid:
+        return Response({'detail': 'Repayment already paid'}, status=status.HTTP_400_BAD_REQUEST)
+    except InsufficientFunds:
+        return Response({'detail': 'Insufficient wallet balance'}, status=status.HTTP_400_BAD_REQUEST)
+    except Wallet.DoesNotExist:
+        return Response({'detail': 'Wallet not found'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'detail': 'Repayment paid from wallet',
+        'repayment': RepaymentSerializer(repayment).data,
+        'wallet_balance': balance,
+    })
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def loan_quote(request):
+    """
+    Quote the monthly payment and full schedule for a prospective loan
+    
+    Pure computation over memoized amortization factors, no database access,
+    so it is cheap enough to call on every slider change.
+    """
+    serializer = LoanQuoteSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    
+    quote = amortization.build_schedule(
+        principal=data['amount'],
+        interest_rate=data['interest_rate'],
+        term_months=data['term_months'],
+        start_date=data.get('disbursed_date') or date.today()
+    )
+    
+    return Response({
+        'amount': data['amount'],
+        'interest_rate': data['interest_rate'],
+        'term_months': data['term_months'],
+        **quote,
+    })
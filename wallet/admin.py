@@ -1,9 +1,9 @@
 from django.contrib import admin
-from .models import Wallet, Transaction, VirtualAccount
+from .models import Wallet, Transaction, VirtualAccount, LedgerEntry, WalletBalanceSnapshot, PaystackEvent, IdempotencyKey
 
 class WalletAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'balance', 'created_at', 'updated_at')
-    search_fields = ('user__email', 'user__username')
+    search_fields = ('user__email', 'user__username', 'paystack_customer_code', 'paystack_recipient_code')
     readonly_fields = ('created_at', 'updated_at')
     list_per_page = 20
 
@@ -21,7 +21,47 @@ class VirtualAccountAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     list_per_page = 20
 
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'journal', 'account', 'wallet', 'amount', 'transaction', 'created_at')
+    list_filter = ('account', 'created_at')
+    search_fields = ('journal', 'wallet__user__email', 'transaction__reference')
+    list_per_page = 20
+    
+    # Append-only: corrections are posted as reversing journals
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class WalletBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'wallet', 'balance', 'last_entry_id', 'as_of', 'created_at')
+    search_fields = ('wallet__user__email',)
+    readonly_fields = ('created_at',)
+    list_per_page = 20
+
+class PaystackEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event', 'event_id', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('event', 'status', 'received_at')
+    search_fields = ('event_id',)
+    readonly_fields = ('received_at', 'processed_at')
+    list_per_page = 20
+
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('id', 'key_hash', 'status_code', 'created_at', 'expires_at')
+    list_filter = ('status_code', 'created_at')
+    search_fields = ('key_hash',)
+    readonly_fields = ('created_at',)
+    list_per_page = 20
+
 # Register the models
 admin.site.register(Wallet, WalletAdmin)
 admin.site.register(Transaction, TransactionAdmin)
 admin.site.register(VirtualAccount, VirtualAccountAdmin)
+admin.site.register(LedgerEntry, LedgerEntryAdmin)
+admin.site.register(WalletBalanceSnapshot, WalletBalanceSnapshotAdmin)
+admin.site.register(PaystackEvent, PaystackEventAdmin)
+admin.site.register(IdempotencyKey, IdempotencyKeyAdmin)
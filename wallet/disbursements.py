@@ -0,0 +1,206 @@
+"""
+Loan disbursements, paid out in bulk through Paystack transfers
+
+A loan is disbursed by a 'loan_disbursement' Transaction on its borrower's
+wallet, with the reference loan-disbursement-<loan id>: a loan gets one
+however many times the pipeline runs, and the reference is also the
+transfer reference Paystack deduplicates on. A failed transfer cannot be
+sent again under its reference, so a loan whose disbursement failed gets
+a new attempt, loan-disbursement-<loan id>-<attempt>, on the next run;
+one whose transfer was reversed after it went through does not, since
+the reversal credited its borrower's wallet. While pending, the
+transaction's paystack_reference tells how far it got:
+
+- empty: created, not sent to Paystack yet
+- its own reference: in a bulk transfer call that has not answered. If
+  the call fails without an answer the transfer may or may not exist, so
+  it stays there until reconciliation verifies it (and only releases it
+  for resending when Paystack does not know it)
+- a transfer code: queued by Paystack, waiting for the outcome
+
+Outcomes come from the transfer webhooks (wallet.webhooks) and from the
+reconcile_disbursements command; a success posts the journal (see
+wallet.ledger.complete_disbursements), a failure only marks it failed.
+"""
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+from edufundz.db import bulk_update_values
+from edufundz.stats_cache import TRANSACTIONS, invalidate_stats
+from .ledger import complete_disbursements
+from .models import LedgerEntry, Transaction, Wallet
+from .paystack import to_kobo
+
+REFERENCE_PREFIX = 'loan-disbursement-'
+
+# Paystack transfer statuses after which a transfer can no longer succeed
+FINAL_FAILURES = ('failed', 'reversed', 'abandoned', 'rejected')
+
+
+def disbursement_reference(loan_id, attempt=1):
+    return f"{REFERENCE_PREFIX}{loan_id}" if attempt == 1 else f"{REFERENCE_PREFIX}{loan_id}-{attempt}"
+
+
+def parse_reference(reference):
+    """(loan id, attempt) of a disbursement reference"""
+    loan_id, _, attempt = reference[len(REFERENCE_PREFIX):].partition('-')
+    return int(loan_id), int(attempt or 1)
+
+
+def next_attempts(loan_ids, wallet_ids):
+    """
+    The attempt each loan is due a new disbursement for
+
+    Loans without a disbursement get their first; loans whose latest one
+    failed without being paid out get the next. Loans with one pending or
+    completed, or whose payout was reversed, are left out.
+
+    Args:
+        loan_ids (set): Loans to look at
+        wallet_ids (list): Their borrowers' wallets, which the disbursements are on
+
+    Returns:
+        dict: Loan id -> attempt number
+    """
+    latest = {}
+    for transaction_id, reference, status in Transaction.objects.filter(
+        wallet_id__in=wallet_ids, transaction_type='loan_disbursement', reference__startswith=REFERENCE_PREFIX
+    ).values_list('id', 'reference', 'status'):
+        loan_id, attempt = parse_reference(reference)
+        if loan_id in loan_ids and attempt > latest.get(loan_id, (0,))[0]:
+            latest[loan_id] = (attempt, status, transaction_id)
+
+    # A reversal posts a journal on the failed disbursement, a plain failure does not
+    failed = [transaction_id for _, status, transaction_id in latest.values() if status == 'failed']
+    paid_out = set(LedgerEntry.objects.filter(transaction_id__in=failed).values_list('transaction_id', flat=True))
+
+    attempts = {}
+    for loan_id in loan_ids:
+        if loan_id not in latest:
+            attempts[loan_id] = 1
+        else:
+            attempt, status, transaction_id = latest[loan_id]
+            if status == 'failed' and transaction_id not in paid_out:
+                attempts[loan_id] = attempt + 1
+    return attempts
+
+
+def create_disbursements(loans, chunk_size=1000):
+    """
+    Create the pending disbursement transactions of a batch of loans
+
+    Per chunk of loans, in one transaction: one read and one insert of
+    their wallets (borrowers without one get it created), one read of the
+    disbursements that already exist and one bulk insert of the new
+    attempts (see next_attempts).
+
+    Args:
+        loans (QuerySet): Loans to disburse, those disbursed or being disbursed are skipped
+        chunk_size (int): Loans per transaction
+
+    Returns:
+        int: Number of disbursements created
+    """
+    rows = list(loans.order_by('id').values_list('id', 'user_id', 'amount'))
+    created = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        user_ids = {user_id for _, user_id, _ in chunk}
+        with db_transaction.atomic():
+            wallets = dict(Wallet.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+            missing = user_ids - wallets.keys()
+            if missing:
+                Wallet.objects.bulk_create([Wallet(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+                wallets = dict(Wallet.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+
+            attempts = next_attempts({loan_id for loan_id, _, _ in chunk}, list(wallets.values()))
+            disbursements = [
+                Transaction(
+                    wallet_id=wallets[user_id],
+                    amount=amount,
+                    transaction_type='loan_disbursement',
+                    reference=disbursement_reference(loan_id, attempts[loan_id]),
+                    status='pending',
+                    description=f"Disbursement of loan #{loan_id}"
+                    + (f", attempt {attempts[loan_id]}" if attempts[loan_id] > 1 else '')
+                )
+                for loan_id, user_id, amount in chunk
+                if loan_id in attempts
+            ]
+            # A concurrent run may have created some since the read, the unique reference skips them
+            Transaction.objects.bulk_create(disbursements, batch_size=1000, ignore_conflicts=True)
+            created += len(disbursements)
+    if created:
+        invalidate_stats(TRANSACTIONS)
+    return created
+
+
+def claim_for_submission(transaction_ids):
+    """
+    Mark disbursements as being sent, skipping those another run has taken
+
+    Returns:
+        list: (id, reference, amount, recipient code) of the claimed disbursements
+    """
+    with db_transaction.atomic():
+        claimed = list(
+            Transaction.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(id__in=transaction_ids, transaction_type='loan_disbursement', status='pending',
+                    paystack_reference__isnull=True, wallet__paystack_recipient_code__isnull=False)
+            .order_by('id').values_list('id', 'reference', 'amount', 'wallet__paystack_recipient_code')
+        )
+        Transaction.objects.filter(id__in=[row[0] for row in claimed]).update(
+            paystack_reference=F('reference'), updated_at=timezone.now()
+        )
+    return claimed
+
+
+def apply_outcomes(queued=(), succeeded=(), failed=(), unsent=()):
+    """
+    Record what Paystack said about a batch of disbursements
+
+    Args:
+        queued (list): (id, transfer code) of transfers Paystack accepted
+        succeeded (list): Ids of disbursements whose transfer went through
+        failed (list): Ids of disbursements whose transfer failed
+        unsent (list): Ids of disbursements Paystack never received, to send again
+
+    Returns:
+        dict: Number of disbursements per result
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        recorded = bulk_update_values(
+            [Transaction(id=transaction_id, paystack_reference=code, updated_at=now) for transaction_id, code in queued],
+            ['paystack_reference', 'updated_at']
+        )
+        completed = complete_disbursements(list(succeeded))
+        declined = Transaction.objects.filter(
+            id__in=list(failed), transaction_type='loan_disbursement', status='pending'
+        ).update(status='failed', updated_at=now)
+        # Only those still marked as in flight, an outcome may have come in meanwhile
+        released = Transaction.objects.filter(
+            id__in=list(unsent), status='pending', paystack_reference=F('reference')
+        ).update(paystack_reference=None, updated_at=now)
+    return {'queued': recorded, 'completed': len(completed), 'failed': declined, 'released': released}
+
+
+def transfer_outcome(result, amount):
+    """
+    What a transfer verification says about a disbursement
+
+    Returns:
+        str: 'paid' or 'declined' when final, 'not received' when Paystack has
+            no such transfer, otherwise 'still pending', 'amount mismatch' or 'unverified'
+    """
+    if not result['status']:
+        return 'not received' if result.get('not_found') else 'unverified'
+    data = result['data']
+    if data.get('status') == 'success':
+        # Paystack amounts are in kobo
+        if int(data.get('amount') or 0) != to_kobo(amount):
+            return 'amount mismatch'
+        return 'paid'
+    if data.get('status') in FINAL_FAILURES:
+        return 'declined'
+    return 'still pending'
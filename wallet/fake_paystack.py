@@ -0,0 +1,345 @@
+"""
+A local stand-in for the Paystack API, for benchmarks and load tests
+
+Implements the calls in wallet.paystack (transaction initialize/verify,
+customer lookup/creation, dedicated accounts, bulk transfers and transfer
+verification) with in-memory state, plus the webhooks Paystack sends back,
+signed like the real ones. Latency,
+errors and dropped connections can be injected. Not for production.
+
+Payments are simulated through the checkout URL initialize returns:
+GET it to pay (`?status=failed` to decline). POST /_fake/transfer with an
+email and an amount simulates a bank transfer into that customer's
+dedicated account.
+
+Bulk transfers are queued as 'received' and settle right away, as a
+success or (at transfer_failure_rate) a failure reported by the
+transfer.success / transfer.failed webhooks and by transfer verification.
+
+Run it with `python manage.py run_fake_paystack` and point the app at it
+with the PAYSTACK_BASE_URL setting.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import hashlib
+import hmac
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+
+import requests
+
+
+class FakePaystackHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled clients can reuse connections
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes, without TCP_NODELAY a
+    # reused connection stalls on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if server.latency or server.jitter:
+            time.sleep(server.latency + server.random.uniform(0, server.jitter))
+
+        # Injected failures leave the fake's own endpoints alone
+        if not path.startswith(('/checkout/', '/_fake/')):
+            if server.random.random() < server.drop_rate:
+                # Close without answering, as a crashed or overloaded upstream would
+                self.close_connection = True
+                return
+            if server.random.random() < server.error_rate:
+                self._respond(500, {'status': False, 'message': 'Injected error'})
+                return
+
+        for route_method, pattern, name in server.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                status, payload = getattr(server, name)(*match.groups(), body=body, query=query)
+                break
+        else:
+            status, payload = 404, {'status': False, 'message': 'Not found'}
+        self._respond(status, payload)
+
+    def _respond(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakePaystackServer(ThreadingHTTPServer):
+    """
+    Threaded fake Paystack server
+
+    Args:
+        address (tuple): (host, port), port 0 picks a free port
+        latency (float): Seconds added to every response
+        jitter (float): Up to this many more seconds, uniformly distributed
+        error_rate (float): Fraction of API calls answered with a 500
+        drop_rate (float): Fraction of API calls whose connection is closed without an answer
+        verify_status (str): Status verifications report for transactions not paid
+            through the checkout URL, e.g. 'failed' to decline every payment
+        webhook_url (str, optional): Where to send the events, none are sent without it
+        secret_key (str): Key the events are signed with, the app's PAYSTACK_SECRET_KEY
+        seed (int, optional): Seed of the injected latency and failures
+        transfer_failure_rate (float): Fraction of transfers that fail once queued
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    # (method, path pattern, method of the server answering it)
+    routes = [
+        ('POST', r'/transaction/initialize', 'initialize'),
+        ('GET', r'/transaction/verify/([^/]+)', 'verify'),
+        ('GET', r'/customer', 'list_customers'),
+        ('POST', r'/customer', 'create_customer'),
+        ('POST', r'/dedicated_account', 'create_dedicated_account'),
+        ('POST', r'/transfer/bulk', 'bulk_transfer'),
+        ('GET', r'/transfer/verify/([^/]+)', 'verify_transfer'),
+        ('GET', r'/checkout/([^/]+)', 'checkout'),
+        ('POST', r'/_fake/transfer', 'transfer'),
+    ]
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, jitter=0.0, error_rate=0.0, drop_rate=0.0,
+                 verify_status='success', webhook_url=None, secret_key='', seed=None, transfer_failure_rate=0.0):
+        super().__init__(address, FakePaystackHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.verify_status = verify_status
+        self.webhook_url = webhook_url
+        self.secret_key = secret_key
+        self.random = random.Random(seed)
+        self.transfer_failure_rate = transfer_failure_rate
+        self.ids = itertools.count(1)
+        self.transactions = {}
+        self.customers = {}
+        self.dedicated_accounts = {}
+        self.transfers = {}
+        self.lock = threading.Lock()
+        self.webhooks = queue.Queue()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_in_thread(self):
+        """Serve from a daemon thread, returns the server"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self, *args, **kwargs):
+        if self.webhook_url:
+            for _ in range(4):
+                threading.Thread(target=self._deliver_webhooks, daemon=True).start()
+        super().serve_forever(*args, **kwargs)
+
+    # Paystack API
+
+    def initialize(self, body, query):
+        reference = body.get('reference') or f"fake-{self.random.getrandbits(64):x}"
+        with self.lock:
+            self.transactions[reference] = {
+                'id': next(self.ids), 'amount': body.get('amount'), 'email': body.get('email'), 'status': None
+            }
+        return 200, {
+            'status': True,
+            'message': 'Authorization URL created',
+            'data': {
+                'authorization_url': f"{self.url}/checkout/{reference}",
+                'access_code': f"access-{reference}",
+                'reference': reference,
+            },
+        }
+
+    def verify(self, reference, body, query):
+        with self.lock:
+            transaction = self.transactions.get(reference)
+        if transaction is None:
+            # Benchmarks verify references they never initialized
+            transaction = {'id': next(self.ids), 'amount': 0, 'email': None, 'status': None}
+        status = transaction['status'] or self.verify_status
+        return 200, {
+            'status': True,
+            'message': 'Verification successful',
+            'data': self._charge(reference, transaction, status),
+        }
+
+    def list_customers(self, body, query):
+        with self.lock:
+            customer = self.customers.get(query.get('email'))
+        return 200, {'status': True, 'message': 'Customers retrieved', 'data': [customer] if customer else []}
+
+    def create_customer(self, body, query):
+        if not body.get('email'):
+            return 400, {'status': False, 'message': 'Email is required'}
+        with self.lock:
+            customer = self.customers.get(body['email'])
+            if customer is None:
+                customer_id = next(self.ids)
+                customer = self.customers[body['email']] = {
+                    'id': customer_id,
+                    'customer_code': f"CUS_fake{customer_id:08d}",
+                    'email': body['email'],
+                    'first_name': body.get('first_name'),
+                    'last_name': body.get('last_name'),
+                    'phone': body.get('phone'),
+                }
+        return 200, {'status': True, 'message': 'Customer created', 'data': customer}
+
+    def create_dedicated_account(self, body, query):
+        with self.lock:
+            customer = next(
+                (customer for customer in self.customers.values() if customer['customer_code'] == body.get('customer')),
+                None
+            )
+            if customer is None:
+                return 400, {'status': False, 'message': 'Customer not found'}
+            account = self.dedicated_accounts.get(customer['email'])
+            if account is None:
+                account_id = next(self.ids)
+                account = self.dedicated_accounts[customer['email']] = {
+                    'id': account_id,
+                    'account_name': f"EDUFUNDZ/{customer['first_name'] or ''} {customer['last_name'] or ''}".strip(),
+                    'account_number': f"{9000000000 + account_id}",
+                    'assigned': True,
+                    'currency': 'NGN',
+                    'active': True,
+                    'bank': {'id': 1, 'name': 'Fake Bank', 'slug': body.get('preferred_bank') or 'fake-bank'},
+                    'customer': customer,
+                }
+        self._send_webhook('dedicatedaccount.assign.success', {'customer': customer, 'dedicated_account': account})
+        return 200, {'status': True, 'message': 'NUBAN successfully created', 'data': account}
+
+    def bulk_transfer(self, body, query):
+        transfers = body.get('transfers') or []
+        if not transfers or len(transfers) > 100:
+            return 400, {'status': False, 'message': 'Between 1 and 100 transfers are allowed per request'}
+        if any(not transfer.get(field) for transfer in transfers for field in ('amount', 'recipient', 'reference')):
+            return 400, {'status': False, 'message': 'Every transfer needs an amount, a recipient and a reference'}
+
+        queued, settled = [], []
+        with self.lock:
+            for transfer in transfers:
+                existing = self.transfers.get(transfer['reference'])
+                if existing is None:
+                    # Paystack deduplicates on the reference, resending a transfer returns the first one
+                    transfer_id = next(self.ids)
+                    existing = self.transfers[transfer['reference']] = {
+                        'id': transfer_id,
+                        'transfer_code': f"TRF_fake{transfer_id:08d}",
+                        'reference': transfer['reference'],
+                        'recipient': transfer['recipient'],
+                        'amount': transfer['amount'],
+                        'currency': body.get('currency', 'NGN'),
+                        'reason': transfer.get('reason', ''),
+                        'status': 'failed' if self.random.random() < self.transfer_failure_rate else 'success',
+                    }
+                    settled.append(existing)
+                queued.append({
+                    'reference': existing['reference'],
+                    'recipient': existing['recipient'],
+                    'amount': existing['amount'],
+                    'transfer_code': existing['transfer_code'],
+                    'currency': existing['currency'],
+                    'status': 'received',
+                })
+        for transfer in settled:
+            self._send_webhook(f"transfer.{transfer['status']}", dict(transfer))
+        return 200, {'status': True, 'message': f"{len(queued)} transfers queued.", 'data': queued}
+
+    def verify_transfer(self, reference, body, query):
+        with self.lock:
+            transfer = self.transfers.get(reference)
+        if transfer is None:
+            return 404, {'status': False, 'message': 'Transfer not found'}
+        return 200, {'status': True, 'message': 'Transfer retrieved', 'data': dict(transfer)}
+
+    # Simulated payments
+
+    def checkout(self, reference, body, query):
+        """The customer completes (or fails) the payment of an initialized transaction"""
+        status = query.get('status', 'success')
+        with self.lock:
+            transaction = self.transactions.get(reference)
+            if transaction is None:
+                return 404, {'status': False, 'message': 'Transaction reference not found'}
+            if transaction['status'] is None:
+                transaction['status'] = status
+        if transaction['status'] == 'success' and status == 'success':
+            self._send_webhook('charge.success', self._charge(reference, transaction, 'success'))
+        return 200, {'status': True, 'message': f"Payment {transaction['status']}"}
+
+    def transfer(self, body, query):
+        """A bank transfer of `amount` kobo into the dedicated account of `email`"""
+        with self.lock:
+            if body.get('email') not in self.dedicated_accounts:
+                return 400, {'status': False, 'message': 'No dedicated account for this customer'}
+            reference = f"fake-transfer-{self.random.getrandbits(64):x}"
+            transaction = self.transactions[reference] = {
+                'id': next(self.ids), 'amount': body.get('amount'), 'email': body['email'], 'status': 'success'
+            }
+        charge = self._charge(reference, transaction, 'success', channel='dedicated_nuban')
+        self._send_webhook('charge.success', charge)
+        return 200, {'status': True, 'message': 'Transfer received', 'data': charge}
+
+    def _charge(self, reference, transaction, status, channel='card'):
+        customer = self.customers.get(transaction['email']) or {'email': transaction['email']}
+        return {
+            'id': transaction['id'],
+            'status': status,
+            'reference': reference,
+            'amount': transaction['amount'],
+            'currency': 'NGN',
+            'channel': channel,
+            'gateway_response': 'Successful' if status == 'success' else 'Declined',
+            'customer': customer,
+        }
+
+    # Webhooks
+
+    def _send_webhook(self, event, data):
+        if self.webhook_url:
+            self.webhooks.put(json.dumps({'event': event, 'data': data}).encode())
+
+    def _deliver_webhooks(self):
+        """Post queued events, retrying unacknowledged ones like Paystack does (here: 3 times)"""
+        session = requests.Session()
+        while True:
+            body = self.webhooks.get()
+            signature = hmac.new(self.secret_key.encode(), body, hashlib.sha512).hexdigest()
+            for attempt in range(4):
+                try:
+                    response = session.post(
+                        self.webhook_url, data=body, timeout=10,
+                        headers={'Content-Type': 'application/json', 'X-Paystack-Signature': signature}
+                    )
+                    if response.status_code == 200:
+                        break
+                except requests.RequestException:
+                    pass
+                time.sleep(0.5 * 2 ** attempt)
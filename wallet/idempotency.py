@@ -0,0 +1,203 @@
+"""
+Idempotency-Key support for endpoints that move money or call Paystack
+
+A client sends an `Idempotency-Key` header with a POST and may retry it,
+with the same key, as often as its network makes it. The first request
+claims the key by inserting its row (the unique key_hash makes concurrent
+duplicates race on the insert, and only one wins), runs, and stores its
+response. Retries of a completed request get the stored response back
+without running the view, so without touching the database or Paystack
+again. Retries arriving while the first request is still running get a
+409 and should retry later.
+
+Only 2xx responses are stored: an error leaves nothing to deduplicate, so
+the key is released and the client may retry it. Keys expire after
+IDEMPOTENCY_KEY_TTL_HOURS; purge_idempotency_keys deletes expired rows and
+an expired key is free to be claimed again meanwhile.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+from datetime import timedelta
+from functools import wraps
+from inspect import iscoroutinefunction
+import hashlib
+import json
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class Replay:
+    """A response to send instead of running the view"""
+
+    def __init__(self, status_code, data, replayed=False):
+        self.status_code = status_code
+        self.data = data
+        self.replayed = replayed
+
+
+def _hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def claim(user_id, scope, key, request_hash):
+    """
+    Claim an idempotency key for a request
+
+    Args:
+        user_id (int): The requesting user, keys are per user
+        scope (str): The endpoint, keys are per endpoint
+        key (str): The client's Idempotency-Key
+        request_hash (str): Hash of the request, a key only replays the request it was first sent with
+
+    Returns:
+        IdempotencyKey | Replay: The claimed row, to pass to complete() or release(),
+            or the response to send instead of running the view
+    """
+    key_hash = _hash(user_id, scope, key)
+    ttl = timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    lock_timeout = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_LOCK_TIMEOUT', 120))
+
+    # Two attempts: the second follows the removal of an expired or abandoned row
+    for _ in range(2):
+        now = timezone.now()
+        try:
+            with db_transaction.atomic():
+                return IdempotencyKey.objects.create(key_hash=key_hash, request_hash=request_hash, expires_at=now + ttl)
+        except IntegrityError:
+            pass
+
+        existing = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+        if existing is None:
+            # Purged between the insert and the read
+            continue
+        expired = existing.expires_at <= now
+        # A request in flight for longer than any Paystack call can take died without releasing its key
+        abandoned = existing.status_code is None and existing.created_at <= now - lock_timeout
+        if expired or abandoned:
+            # Only one of several concurrent claimers deletes it, all of them race on the insert again
+            IdempotencyKey.objects.filter(pk=existing.pk, status_code=existing.status_code).delete()
+            continue
+
+        if existing.request_hash != request_hash:
+            return Replay(422, {'detail': f'This {HEADER} was already used with a different request.'})
+        if existing.status_code is None:
+            return Replay(409, {'detail': f'A request with this {HEADER} is still in progress, retry later.'})
+        return Replay(existing.status_code, existing.response, replayed=True)
+
+    return Replay(409, {'detail': f'A request with this {HEADER} is still in progress, retry later.'})
+
+
+def complete(record, status_code, data):
+    """Store the response of a claimed key, or release the key if there is nothing to replay"""
+    if not 200 <= status_code < 300:
+        release(record)
+        return
+    IdempotencyKey.objects.filter(pk=record.pk).update(status_code=status_code, response=data)
+
+
+def release(record):
+    """Free a claimed key, a retry with it runs the view again"""
+    IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).delete()
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in batches, returns how many"""
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+
+
+def _key(headers):
+    """The request's Idempotency-Key, or a Replay with a 400 if it is unusable"""
+    key = headers.get(HEADER)
+    if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+        return Replay(400, {'detail': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters.'})
+    return key
+
+
+def idempotent(scope):
+    """
+    Decorator making a POST endpoint honour the Idempotency-Key header
+
+    Wraps async views taking a Django request (inside @async_api_view, so
+    request.user is set) and REST framework viewset actions. Requests
+    without the header, and other methods, run as before.
+
+    Args:
+        scope (str): Name of the endpoint, the same key may be used on different endpoints
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                key = _key(request.headers)
+                if key is None or request.method != 'POST':
+                    return await view(request, *args, **kwargs)
+                if isinstance(key, Replay):
+                    return _json_response(key)
+
+                request_hash = _hash(request.method, request.path, request.body)
+                claimed = await sync_to_async(claim)(request.user.pk, scope, key, request_hash)
+                if isinstance(claimed, Replay):
+                    return _json_response(claimed)
+                try:
+                    response = await view(request, *args, **kwargs)
+                except BaseException:
+                    await sync_to_async(release)(claimed)
+                    raise
+                await sync_to_async(complete)(claimed, response.status_code, json.loads(response.content))
+                return response
+        else:
+            @wraps(view)
+            def wrapped(self, request, *args, **kwargs):
+                key = _key(request.headers)
+                if key is None or request.method != 'POST':
+                    return view(self, request, *args, **kwargs)
+                if isinstance(key, Replay):
+                    return _drf_response(key)
+
+                # The body may have been parsed already (CSRF checks read it), hash the parsed data
+                body = json.dumps(request.data, sort_keys=True, default=str)
+                claimed = claim(request.user.pk, scope, key, _hash(request.method, request.path, body))
+                if isinstance(claimed, Replay):
+                    return _drf_response(claimed)
+                try:
+                    response = view(self, request, *args, **kwargs)
+                except BaseException:
+                    release(claimed)
+                    raise
+                # Stored as rendered, so a replay carries the same JSON types (Decimals as numbers)
+                complete(claimed, response.status_code, json.loads(json.dumps(response.data, cls=JSONEncoder)))
+                return response
+        return wrapped
+    return decorator
+
+
+def _json_response(replay):
+    response = JsonResponse(replay.data, status=replay.status_code, safe=False)
+    if replay.replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _drf_response(replay):
+    response = Response(replay.data, status=replay.status_code)
+    if replay.replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
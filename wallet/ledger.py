@@ -0,0 +1,293 @@
+from django.db import transaction as db_transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from edufundz.db import bulk_update_values
+from edufundz.stats_cache import WALLETS, invalidate_stats
+from .models import LedgerEntry, Transaction, Wallet, WalletBalanceSnapshot
+import decimal
+import uuid
+
+
+class InsufficientFunds(Exception):
+    """A journal would take a wallet balance below zero"""
+
+
+def post_journal(legs, transaction=None):
+    """
+    Post one balanced journal and apply it to the wallet balances it touches
+
+    Each wallet balance moves with a single UPDATE ... SET balance = balance + delta
+    (debits only match while the balance covers them), issued in wallet id
+    order so concurrent journals over the same wallets cannot deadlock. The
+    UPDATE holds the wallet row lock until commit, which also serializes the
+    wallet's entries: per wallet, committed entry ids are always a prefix.
+    Only the balance and updated_at columns are written.
+
+    Args:
+        legs (list): (account, wallet_id, amount) triples, wallet_id is None
+            for system accounts; amounts are signed and must sum to zero
+        transaction (Transaction, optional): The transaction the journal records
+
+    Returns:
+        dict: New balance of every wallet touched, by wallet id
+
+    Raises:
+        InsufficientFunds: If a debit exceeds a wallet balance (nothing is posted)
+    """
+    legs = [(account, wallet_id, decimal.Decimal(amount)) for account, wallet_id, amount in legs]
+    if sum(amount for _, _, amount in legs) != 0:
+        raise ValueError("Journal legs must sum to zero")
+    if any((account == 'wallet') != (wallet_id is not None) for account, wallet_id, _ in legs):
+        raise ValueError("Exactly the 'wallet' legs must name a wallet")
+
+    deltas = {}
+    for _, wallet_id, amount in legs:
+        if wallet_id is not None:
+            deltas[wallet_id] = deltas.get(wallet_id, 0) + amount
+
+    journal = uuid.uuid4()
+    now = timezone.now()
+    with db_transaction.atomic():
+        for wallet_id in sorted(deltas):
+            delta = deltas[wallet_id]
+            wallets = Wallet.objects.filter(id=wallet_id)
+            if delta < 0:
+                wallets = wallets.filter(balance__gte=-delta)
+            if not wallets.update(balance=F('balance') + delta, updated_at=now):
+                if not Wallet.objects.filter(id=wallet_id).exists():
+                    raise Wallet.DoesNotExist(f"Wallet #{wallet_id} does not exist")
+                raise InsufficientFunds(f"Wallet #{wallet_id} balance does not cover {-delta}")
+        invalidate_stats(WALLETS)
+
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(journal=journal, account=account, wallet_id=wallet_id, transaction=transaction, amount=amount)
+            for account, wallet_id, amount in legs
+        ])
+
+        return dict(Wallet.objects.filter(id__in=list(deltas)).values_list('id', 'balance'))
+
+
+def credit_wallet(wallet_id, amount, counter_account, transaction=None):
+    """
+    Move money into a wallet from a system account
+
+    Returns:
+        Decimal: The new wallet balance
+    """
+    amount = decimal.Decimal(amount)
+    return post_journal([('wallet', wallet_id, amount), (counter_account, None, -amount)], transaction)[wallet_id]
+
+
+def debit_wallet(wallet_id, amount, counter_account, transaction=None):
+    """
+    Move money out of a wallet to a system account
+
+    Returns:
+        Decimal: The new wallet balance
+
+    Raises:
+        InsufficientFunds: If the balance does not cover the amount
+    """
+    amount = decimal.Decimal(amount)
+    return post_journal([('wallet', wallet_id, -amount), (counter_account, None, amount)], transaction)[wallet_id]
+
+
+def complete_deposit(transaction):
+    """
+    Mark a pending deposit completed and credit its wallet, exactly once
+
+    The pending -> completed transition is a conditional UPDATE in the same
+    database transaction as the credit, so concurrent verifications of the
+    same deposit credit it once.
+
+    Returns:
+        Decimal: The new wallet balance, or None if the deposit was no longer pending
+    """
+    with db_transaction.atomic():
+        completed = Transaction.objects.filter(pk=transaction.pk, status='pending').update(
+            status='completed', updated_at=timezone.now()
+        )
+        if not completed:
+            return None
+        transaction.status = 'completed'
+        return credit_wallet(transaction.wallet_id, transaction.amount, 'paystack', transaction=transaction)
+
+
+def complete_deposits(transaction_ids):
+    """
+    complete_deposit for many deposits at once
+
+    Locks the deposits that are still pending, then their wallets in id
+    order, and applies them with one status UPDATE, one balance UPDATE per
+    1000 wallets and one insert of the ledger entries (a journal per
+    deposit). Deposits completed or failed in the meantime are skipped.
+
+    Args:
+        transaction_ids (list): Ids of deposit transactions
+
+    Returns:
+        list: Ids of the deposits completed by this call
+    """
+    with db_transaction.atomic():
+        pending = list(
+            Transaction.objects.select_for_update()
+            .filter(id__in=transaction_ids, transaction_type='deposit', status='pending')
+            .order_by('id').values_list('id', 'wallet_id', 'amount')
+        )
+        if not pending:
+            return []
+
+        deltas = {}
+        for _, wallet_id, amount in pending:
+            deltas[wallet_id] = deltas.get(wallet_id, 0) + amount
+        # Same lock order as post_journal
+        list(Wallet.objects.select_for_update().filter(id__in=list(deltas)).order_by('id').values_list('id'))
+
+        now = timezone.now()
+        completed = [transaction_id for transaction_id, _, _ in pending]
+        Transaction.objects.filter(id__in=completed).update(status='completed', updated_at=now)
+        bulk_update_values(
+            [Wallet(id=wallet_id, balance=delta, updated_at=now) for wallet_id, delta in sorted(deltas.items())],
+            ['balance', 'updated_at'], increment=['balance']
+        )
+        invalidate_stats(WALLETS)
+
+        entries = []
+        for transaction_id, wallet_id, amount in pending:
+            journal = uuid.uuid4()
+            entries.append(LedgerEntry(journal=journal, account='wallet', wallet_id=wallet_id,
+                                       transaction_id=transaction_id, amount=amount))
+            entries.append(LedgerEntry(journal=journal, account='paystack', transaction_id=transaction_id,
+                                       amount=-amount))
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+        return completed
+
+
+def complete_disbursements(transaction_ids):
+    """
+    Mark pending loan disbursements completed and post their journals, exactly once
+
+    A paid out loan passes through its borrower's wallet: its journal
+    credits the wallet from loan funding and debits the same amount to the
+    payout account, so statements show the loan arriving and leaving while
+    the balance stays put. Locks as complete_deposits does (the pending
+    transactions, then their wallets in id order, which keeps each wallet's
+    committed entry ids a prefix) and inserts all the entries at once.
+
+    Args:
+        transaction_ids (list): Ids of loan disbursement transactions
+
+    Returns:
+        list: Ids of the disbursements completed by this call
+    """
+    with db_transaction.atomic():
+        pending = list(
+            Transaction.objects.select_for_update()
+            .filter(id__in=transaction_ids, transaction_type='loan_disbursement', status='pending')
+            .order_by('id').values_list('id', 'wallet_id', 'amount')
+        )
+        if not pending:
+            return []
+
+        wallet_ids = sorted({wallet_id for _, wallet_id, _ in pending})
+        list(Wallet.objects.select_for_update().filter(id__in=wallet_ids).order_by('id').values_list('id'))
+
+        completed = [transaction_id for transaction_id, _, _ in pending]
+        Transaction.objects.filter(id__in=completed).update(status='completed', updated_at=timezone.now())
+
+        entries = []
+        for transaction_id, wallet_id, amount in pending:
+            journal = uuid.uuid4()
+            entries.extend([
+                LedgerEntry(journal=journal, account='loan_funding', transaction_id=transaction_id, amount=-amount),
+                LedgerEntry(journal=journal, account='wallet', wallet_id=wallet_id, transaction_id=transaction_id,
+                            amount=amount),
+                LedgerEntry(journal=journal, account='wallet', wallet_id=wallet_id, transaction_id=transaction_id,
+                            amount=-amount),
+                LedgerEntry(journal=journal, account='payout', transaction_id=transaction_id, amount=amount),
+            ])
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+        return completed
+
+
+def reverse_disbursement(transaction):
+    """
+    Undo the payout of a completed disbursement whose transfer Paystack reversed
+
+    The money came back to the Paystack balance, it is credited to the
+    borrower's wallet and the disbursement marked failed; the conditional
+    status UPDATE makes a repeated reversal a no-op.
+
+    Returns:
+        Decimal: The new wallet balance, or None if the disbursement was not completed
+    """
+    with db_transaction.atomic():
+        reversed_ = Transaction.objects.filter(
+            pk=transaction.pk, transaction_type='loan_disbursement', status='completed'
+        ).update(status='failed', updated_at=timezone.now())
+        if not reversed_:
+            return None
+        transaction.status = 'failed'
+        return credit_wallet(transaction.wallet_id, transaction.amount, 'payout', transaction=transaction)
+
+
+def balance_at(wallet_id, when):
+    """
+    A wallet's balance at a point in time
+
+    Starts from the latest snapshot taken at or before `when` and adds the
+    wallet's entries after it, so the cost is one index lookup plus a scan
+    of the entries since that snapshot.
+    """
+    snapshot = WalletBalanceSnapshot.objects.filter(
+        wallet_id=wallet_id, as_of__lte=when
+    ).order_by('-as_of').values_list('balance', 'last_entry_id').first()
+    balance, last_entry_id = snapshot or (decimal.Decimal('0.00'), 0)
+
+    tail = LedgerEntry.objects.filter(
+        wallet_id=wallet_id, id__gt=last_entry_id, created_at__lte=when
+    ).aggregate(total=Sum('amount'))['total']
+    return balance + (tail or 0)
+
+
+def take_snapshots(wallet_ids=None):
+    """
+    Snapshot the balance of every wallet with entries since its last snapshot
+
+    One aggregate over the entries after each wallet's latest snapshot, one
+    read of those snapshots and one bulk insert. Reads only committed
+    entries; since a wallet's committed entry ids are always a prefix, an
+    entry committed after the snapshot always has a higher id than its
+    last_entry_id.
+
+    Args:
+        wallet_ids (list, optional): Restrict to these wallets
+
+    Returns:
+        int: Number of snapshots written
+    """
+    latest = WalletBalanceSnapshot.objects.filter(wallet_id=OuterRef('wallet_id')).order_by('-last_entry_id')
+    entries = LedgerEntry.objects.filter(account='wallet')
+    if wallet_ids is not None:
+        entries = entries.filter(wallet_id__in=wallet_ids)
+
+    tails = list(entries.filter(
+        id__gt=Coalesce(Subquery(latest.values('last_entry_id')[:1]), 0)
+    ).values('wallet_id').annotate(
+        total=Sum('amount'), last_entry_id=Max('id'), as_of=Max('created_at')
+    ).values_list('wallet_id', 'total', 'last_entry_id', 'as_of'))
+
+    previous = dict(WalletBalanceSnapshot.objects.filter(
+        wallet_id__in=[wallet_id for wallet_id, _, _, _ in tails],
+        last_entry_id=Subquery(latest.values('last_entry_id')[:1]),
+    ).values_list('wallet_id', 'balance'))
+
+    WalletBalanceSnapshot.objects.bulk_create([
+        WalletBalanceSnapshot(
+            wallet_id=wallet_id, balance=previous.get(wallet_id, 0) + total,
+            last_entry_id=last_entry_id, as_of=as_of
+        )
+        for wallet_id, total, last_entry_id, as_of in tails
+    ], batch_size=1000)
+    return len(tails)
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from edufundz.db import bulk_update_values
+from users.models import User
+from wallet.models import Wallet
+from wallet.paystack import AsyncRateLimiter, aget_or_create_customer
+
+
+class Command(BaseCommand):
+    help = 'Fetch or create the Paystack customer of every wallet without one and store its customer code'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help='Paystack customers resolved in parallel')
+        parser.add_argument('--rate', type=float, default=50,
+                            help='Customers per second at most (each takes one or two Paystack calls)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Customer codes saved per UPDATE')
+        parser.add_argument('--limit', type=int, help='Backfill at most this many wallets')
+
+    def handle(self, *args, **options):
+        # Users who never opened their wallet get one, as the wallet endpoints would
+        created = Wallet.objects.bulk_create(
+            [Wallet(user_id=user_id) for user_id in User.objects.filter(wallet__isnull=True).values_list('id', flat=True)],
+            batch_size=1000, ignore_conflicts=True
+        )
+        if created:
+            self.stdout.write(f"Created {len(created)} missing wallet(s)")
+
+        wallets = Wallet.objects.filter(paystack_customer_code__isnull=True).order_by('id').values_list(
+            'id', 'user__email', 'user__first_name', 'user__last_name', 'user__phone_number'
+        )
+        if options['limit']:
+            wallets = wallets[:options['limit']]
+        wallets = list(wallets)
+
+        self.stdout.write(f"{len(wallets)} wallet(s) without a Paystack customer")
+        if not wallets:
+            return
+
+        start = time.perf_counter()
+        saved, errors = asyncio.run(self._backfill(wallets, options))
+        elapsed = time.perf_counter() - start
+
+        for wallet_id, message in errors[:10]:
+            self.stdout.write(self.style.WARNING(f"  wallet #{wallet_id}: {message}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {saved} customer code(s) in {elapsed:.1f}s ({len(wallets) / elapsed:,.0f} wallets/s), "
+            f"{len(errors)} error(s)"
+        ))
+
+    async def _backfill(self, wallets, options):
+        limiter = AsyncRateLimiter(options['rate'])
+        remaining = iter(wallets)
+        codes = []
+        errors = []
+        saved = 0
+
+        async def flush():
+            nonlocal codes, saved
+            batch, codes = codes, []
+            saved += await sync_to_async(self._save)(batch)
+
+        async def worker():
+            # The workers share one iterator, each takes the next wallet when free
+            for wallet_id, email, first_name, last_name, phone in remaining:
+                await limiter.acquire()
+                customer = await aget_or_create_customer(email, first_name, last_name, phone)
+                if not customer['status']:
+                    errors.append((wallet_id, customer['message']))
+                    continue
+                codes.append((wallet_id, customer['data']['customer_code']))
+                if len(codes) >= options['batch_size']:
+                    await flush()
+
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        await flush()
+        return saved, errors
+
+    def _save(self, codes):
+        now = timezone.now()
+        return bulk_update_values(
+            [Wallet(id=wallet_id, paystack_customer_code=code, updated_at=now) for wallet_id, code in codes],
+            ['paystack_customer_code', 'updated_at']
+        )
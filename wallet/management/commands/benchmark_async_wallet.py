@@ -0,0 +1,124 @@
+import asyncio
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.authtoken.models import Token
+
+from edufundz.asgi import application
+from users.models import User
+from wallet import paystack
+from wallet.fake_paystack import FakePaystackServer
+from wallet.ledger import complete_deposit
+from wallet.models import Transaction, Wallet
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_verify_payment(request, reference):
+    """The verify_payment flow as a sync view, blocking its thread on Paystack"""
+    transaction = Transaction.objects.get(reference=reference)
+    result = paystack.verify_transaction(transaction.paystack_reference)
+    if not result['status']:
+        return Response({'status': 'error', 'message': result['message']}, status=400)
+    if result['data']['status'] != 'success':
+        return Response({'status': 'error', 'message': 'Payment verification failed'})
+    return Response({'status': 'success', 'wallet_balance': complete_deposit(transaction)})
+
+
+# URLconf of the sync mode, served by the same ASGI application
+urlpatterns = [
+    path('api/wallet/verify-payment/<str:reference>/', sync_verify_payment),
+]
+
+
+class Command(BaseCommand):
+    help = ('Concurrent verify-payment capacity of one ASGI worker against a slow local Paystack stand-in, '
+            'sync view against async view')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Verifications per mode')
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight')
+        parser.add_argument('--latency-ms', type=float, default=200.0, help='Latency of the Paystack stand-in')
+        parser.add_argument('--declined', action='store_true',
+                            help='Have every verification declined, so no deposit is credited: measures the '
+                                 'Paystack wait without database writes (SQLite serializes those)')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and not options['declined']:
+            self.stdout.write(self.style.WARNING(
+                "SQLite serializes the deposit writes, run against PostgreSQL or with --declined"
+            ))
+
+        server = FakePaystackServer(
+            latency=options['latency_ms'] / 1000, verify_status='failed' if options['declined'] else 'success'
+        ).start_in_thread()
+        # Both clients are created lazily from the module base URL
+        paystack.PAYSTACK_BASE_URL = server.url
+        paystack._client = None
+
+        user = User.objects.create_user(
+            email='benchmark-async-wallet@edufundz.invalid', username='benchmark-async-wallet', password=None
+        )
+        try:
+            token = Token.objects.create(user=user).key
+            wallet = Wallet.objects.create(user=user)
+            # Async first, the sync mode leaves its idle worker threads behind
+            for mode in ('async', 'sync'):
+                references = self._seed(wallet, options['requests'])
+                # The sync mode serves the same requests from a sync view
+                urlconf = __name__ if mode == 'sync' else settings.ROOT_URLCONF
+                with override_settings(ROOT_URLCONF=urlconf):
+                    elapsed, latencies = asyncio.run(self._run(references, token, options))
+                self._report(mode, elapsed, latencies, options)
+        finally:
+            user.delete()
+            server.shutdown()
+
+    def _seed(self, wallet, count):
+        transactions = Transaction.objects.bulk_create([
+            Transaction(wallet=wallet, amount=Decimal('100.00'), transaction_type='deposit',
+                        reference=str(uuid.uuid4()), paystack_reference=str(uuid.uuid4()), status='pending')
+            for _ in range(count)
+        ])
+        return [transaction.reference for transaction in transactions]
+
+    async def _run(self, references, token, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies = []
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=application), base_url='http://testserver',
+            headers={'Authorization': f'Token {token}'}, timeout=None
+        )
+
+        async def call(reference):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f'/api/wallet/verify-payment/{reference}/')
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call(reference) for reference in references))
+        elapsed = time.perf_counter() - start
+
+        await client.aclose()
+        return elapsed, latencies
+
+    def _report(self, mode, elapsed, latencies, options):
+        latencies.sort()
+        self.stdout.write(
+            f"{mode:>5}: {len(latencies) / elapsed:,.0f} verifications/s with {options['concurrency']} in flight "
+            f"(Paystack latency {options['latency_ms']:.0f}ms), p50 {statistics.median(latencies) * 1000:.0f}ms, "
+            f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.0f}ms"
+        )
@@ -0,0 +1,96 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from users.models import User
+from wallet.ledger import credit_wallet
+from wallet.models import LedgerEntry, Wallet
+
+
+class Command(BaseCommand):
+    help = 'Credit the same wallets from many threads and check that no update was lost (cleans up after itself)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--credits', type=int, default=500, help='Credits per thread')
+        parser.add_argument('--wallets', type=int, default=1, help='Wallets the credits are spread over')
+        parser.add_argument('--naive', action='store_true',
+                            help='Use the old read-modify-write (wallet.balance += amount; wallet.save()) instead')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "SQLite serializes all writers on one database lock, run against PostgreSQL for meaningful numbers"
+            ))
+
+        # Threads use their own connections, so the data has to be committed
+        users = [
+            User.objects.create_user(
+                email=f'benchmark-ledger-{n}@edufundz.invalid', username=f'benchmark-ledger-{n}', password=None
+            )
+            for n in range(options['wallets'])
+        ]
+        wallets = [Wallet.objects.create(user=user) for user in users]
+        try:
+            self._run(wallets, options)
+        finally:
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def _run(self, wallets, options):
+        amount = Decimal('1.00')
+        errors = []
+
+        def work(thread_number):
+            try:
+                for n in range(options['credits']):
+                    wallet = wallets[(thread_number + n) % len(wallets)]
+                    self._credit(wallet.id, amount, options['naive'])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        if errors:
+            raise CommandError(f"{len(errors)} thread(s) failed, first error: {errors[0]!r}")
+
+        total = options['threads'] * options['credits']
+        expected = amount * total
+        actual = sum(Wallet.objects.filter(id__in=[wallet.id for wallet in wallets]).values_list('balance', flat=True))
+        entries = LedgerEntry.objects.filter(wallet__in=wallets).count()
+
+        self.stdout.write(
+            f"{total} credits over {len(wallets)} wallet(s) from {options['threads']} threads in {elapsed:.2f}s: "
+            f"{total / elapsed:,.0f} credits/s, {total / elapsed / len(wallets):,.0f} per wallet"
+        )
+        self.stdout.write(f"Expected balance {expected}, got {actual}, {entries} ledger entries")
+        if actual != expected:
+            self.stdout.write(self.style.ERROR(f"Lost {expected - actual} in updates"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No lost updates"))
+
+    def _credit(self, wallet_id, amount, naive):
+        # SQLite reports a busy database instead of waiting on a row lock
+        for attempt in range(50):
+            try:
+                if naive:
+                    wallet = Wallet.objects.get(id=wallet_id)
+                    wallet.balance += amount
+                    wallet.save()
+                else:
+                    credit_wallet(wallet_id, amount, 'paystack')
+                return
+            except OperationalError:
+                if attempt == 49:
+                    raise
+                time.sleep(0.01)
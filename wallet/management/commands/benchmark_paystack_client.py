@@ -0,0 +1,81 @@
+import statistics
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wallet.fake_paystack import FakePaystackServer
+from wallet.paystack import PaystackClient
+
+
+class Command(BaseCommand):
+    help = 'Compare p50/p99 latency of the pooled Paystack client against bare requests calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Calls per mode')
+        parser.add_argument('--concurrency', type=int, default=8, help='Calling threads')
+        parser.add_argument('--latency-ms', type=float, default=5.0, help='Latency of the local stand-in server')
+        parser.add_argument('--url', help='Benchmark against this server instead of a local stand-in '
+                                          '(e.g. an HTTPS one, where connection reuse also saves TLS handshakes)')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            url = options['url'].rstrip('/')
+        else:
+            server = FakePaystackServer(latency=options['latency_ms'] / 1000).start_in_thread()
+            url = server.url
+        path = '/transaction/verify/benchmark'
+
+        client = PaystackClient(base_url=url, max_retries=0)
+        headers = {'Authorization': f"Bearer {settings.PAYSTACK_SECRET_KEY}", 'Content-Type': 'application/json'}
+
+        modes = {
+            'pooled': lambda: client.get(path),
+            'unpooled': lambda: requests.get(f"{url}{path}", headers=headers, timeout=client.timeout),
+        }
+        for name, call in modes.items():
+            self._run(name, call, options['requests'], options['concurrency'])
+
+        if not options['url']:
+            server.shutdown()
+
+    def _run(self, name, call, count, concurrency):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def work(calls):
+            for _ in range(calls):
+                start = time.perf_counter()
+                try:
+                    call().raise_for_status()
+                except requests.RequestException as e:
+                    errors.append(e)
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+
+        threads = [
+            threading.Thread(target=work, args=(count // concurrency + (n < count % concurrency),))
+            for n in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f"{name}: every call failed, e.g. {errors[0]!r}"))
+            return
+        self.stdout.write(
+            f"{name:>9}: {len(latencies) / elapsed:,.0f} calls/s, "
+            f"p50 {statistics.median(latencies) * 1000:.2f}ms, "
+            f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.2f}ms"
+            + (f", {len(errors)} errors" if errors else '')
+        )
@@ -0,0 +1,138 @@
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from users.models import User
+from wallet.models import PaystackEvent, Transaction, Wallet
+from wallet.webhooks import sign
+
+EMAIL_PREFIX = 'loadtest-paystack-'
+
+
+class Command(BaseCommand):
+    help = ('Send signed fake charge.success webhooks for freshly created pending deposits, '
+            'to load test webhook ingestion and process_paystack_events')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Distinct events to send')
+        parser.add_argument('--wallets', type=int, default=10, help='Load test wallets the deposits are spread over')
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help='Fraction of events sent a second time, as Paystack retries do')
+        parser.add_argument('--concurrency', type=int, default=8, help='Sending threads')
+        parser.add_argument('--url', help='Webhook URL of a running server; events are posted in-process when omitted')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the load test users, wallets and transactions and exit')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            events, _ = PaystackEvent.objects.filter(payload__data__customer__email__startswith=EMAIL_PREFIX).delete()
+            deleted, _ = User.objects.filter(email__startswith=EMAIL_PREFIX).delete()
+            self.stdout.write(f"Deleted {events} event(s) and {deleted} other row(s)")
+            return
+
+        bodies = [self._event(transaction) for transaction in self._seed(options['count'], options['wallets'])]
+        bodies += random.sample(bodies, int(len(bodies) * options['duplicates']))
+        random.shuffle(bodies)
+
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+
+        def work(share):
+            send = self._sender(options['url'])
+            try:
+                for body in share:
+                    start = time.perf_counter()
+                    status_code = send(body)
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                        if status_code != 200:
+                            failures.append(status_code)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=work, args=(bodies[n::options['concurrency']],))
+            for n in range(options['concurrency'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        self.stdout.write(
+            f"Sent {len(bodies)} events ({options['count']} distinct) in {elapsed:.2f}s: "
+            f"{len(bodies) / elapsed:,.0f} events/s, ack p50 {statistics.median(latencies) * 1000:.1f}ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+        )
+        if failures:
+            self.stdout.write(self.style.ERROR(f"{len(failures)} event(s) not acknowledged, e.g. HTTP {failures[0]}"))
+        self.stdout.write("Apply them with: python manage.py process_paystack_events")
+
+    def _seed(self, count, wallet_count):
+        wallets = []
+        for n in range(wallet_count):
+            user, _ = User.objects.get_or_create(
+                email=f'{EMAIL_PREFIX}{n}@edufundz.invalid', defaults={'username': f'{EMAIL_PREFIX}{n}'}
+            )
+            wallet, _ = Wallet.objects.get_or_create(user=user)
+            wallets.append(wallet)
+
+        transactions = []
+        for n in range(count):
+            reference = str(uuid.uuid4())
+            transactions.append(Transaction(
+                wallet=wallets[n % len(wallets)],
+                amount=Decimal(random.randint(100, 50000)),
+                transaction_type='deposit',
+                reference=reference,
+                paystack_reference=reference,
+                status='pending',
+                description='Load test deposit',
+            ))
+        return Transaction.objects.bulk_create(transactions, batch_size=1000)
+
+    def _event(self, transaction):
+        payload = {
+            'event': 'charge.success',
+            'data': {
+                'id': random.randint(10 ** 9, 10 ** 10),
+                'status': 'success',
+                'reference': transaction.paystack_reference,
+                'amount': int(transaction.amount * 100),
+                'currency': 'NGN',
+                'channel': 'card',
+                'gateway_response': 'Successful',
+                'customer': {'email': transaction.wallet.user.email},
+            },
+        }
+        return json.dumps(payload).encode()
+
+    def _sender(self, url):
+        """A function posting one signed body and returning the HTTP status, one per thread"""
+        if url:
+            session = requests.Session()
+            return lambda body: session.post(
+                url, data=body, headers={'Content-Type': 'application/json', 'X-Paystack-Signature': sign(body)},
+                timeout=10
+            ).status_code
+
+        client = Client()
+        path = reverse('paystack-webhook')
+        return lambda body: client.post(
+            path, data=body, content_type='application/json', HTTP_X_PAYSTACK_SIGNATURE=sign(body)
+        ).status_code
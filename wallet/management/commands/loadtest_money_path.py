@@ -0,0 +1,151 @@
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from rest_framework.authtoken.models import Token
+
+from edufundz.asgi import application
+from users.models import User
+from wallet import paystack
+from wallet.fake_paystack import FakePaystackServer
+from wallet.models import LedgerEntry, Transaction, Wallet
+
+EMAIL_PREFIX = 'loadtest-money-'
+
+
+class Command(BaseCommand):
+    help = ('Drive the whole deposit path (initialize, pay at the checkout URL, verify) and virtual account '
+            'creation against a fake Paystack, and check the balances against the ledger')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Load test users, each creates a virtual account')
+        parser.add_argument('--deposits', type=int, default=500, help='Deposits spread over the users')
+        parser.add_argument('--concurrency', type=int, default=50, help='Deposits in flight')
+        parser.add_argument('--url', help='Base URL of a running app started with PAYSTACK_BASE_URL pointing at '
+                                          'run_fake_paystack; the ASGI app is driven in-process when omitted')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Latency of the in-process fake Paystack')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of calls the in-process fake Paystack fails')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the deposit amounts and injected failures')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the load test users and their data and exit')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__startswith=EMAIL_PREFIX).delete()
+            self.stdout.write(f"Deleted {deleted} row(s)")
+            return
+
+        server = None
+        if not options['url']:
+            server = FakePaystackServer(
+                latency=options['latency_ms'] / 1000, error_rate=options['error_rate'], seed=options['seed']
+            ).start_in_thread()
+            # Both clients are created lazily from the module base URL
+            paystack.PAYSTACK_BASE_URL = server.url
+            paystack._client = None
+
+        tokens = self._seed_users(options['users'])
+        try:
+            timings, errors, elapsed = asyncio.run(self._run(tokens, options))
+        finally:
+            if server:
+                server.shutdown()
+
+        self.stdout.write(
+            f"{options['deposits']} deposits in {elapsed:.1f}s ({options['deposits'] / elapsed:,.0f}/s) "
+            f"with {options['concurrency']} in flight"
+        )
+        for step, latencies in timings.items():
+            if not latencies:
+                continue
+            latencies.sort()
+            self.stdout.write(
+                f"  {step:>15}: {len(latencies)} ok, p50 {statistics.median(latencies) * 1000:.0f}ms, "
+                f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.0f}ms"
+                + (f", {errors[step]} failed" if errors.get(step) else '')
+            )
+        self._check_balances()
+
+    def _seed_users(self, count):
+        tokens = []
+        for n in range(count):
+            user, _ = User.objects.get_or_create(
+                email=f'{EMAIL_PREFIX}{n}@edufundz.invalid',
+                defaults={'username': f'{EMAIL_PREFIX}{n}', 'first_name': 'Load', 'last_name': f'Test{n}'}
+            )
+            Wallet.objects.get_or_create(user=user)
+            tokens.append(Token.objects.get_or_create(user=user)[0].key)
+        return tokens
+
+    async def _run(self, tokens, options):
+        rng = random.Random(options['seed'])
+        timings = {'virtual_account': [], 'deposit': [], 'checkout': [], 'verify': []}
+        errors = {}
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        if options['url']:
+            app = httpx.AsyncClient(base_url=options['url'].rstrip('/'), timeout=30)
+        else:
+            app = httpx.AsyncClient(transport=httpx.ASGITransport(app=application), base_url='http://testserver',
+                                    timeout=None)
+        fake = httpx.AsyncClient(timeout=30)
+
+        async def step(name, call):
+            start = time.perf_counter()
+            try:
+                response = await call
+            except httpx.HTTPError:
+                response = None
+            if response is None or response.status_code != 200 or response.json().get('status') == 'error':
+                errors[name] = errors.get(name, 0) + 1
+                return None
+            timings[name].append(time.perf_counter() - start)
+            return response.json()
+
+        async def virtual_account(token):
+            async with semaphore:
+                await step('virtual_account', app.post(
+                    '/api/wallet/wallet/virtual_account/', headers={'Authorization': f'Token {token}'}
+                ))
+
+        async def deposit(token, amount):
+            headers = {'Authorization': f'Token {token}'}
+            async with semaphore:
+                initialized = await step('deposit', app.post(
+                    '/api/wallet/wallet/deposit/', json={'amount': amount}, headers=headers
+                ))
+                if initialized is None:
+                    return
+                if await step('checkout', fake.get(initialized['payment_url'])) is None:
+                    return
+                await step('verify', app.get(
+                    f"/api/wallet/verify-payment/{initialized['reference']}/", headers=headers
+                ))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_account(token) for token in tokens))
+        await asyncio.gather(*(
+            deposit(tokens[n % len(tokens)], rng.randint(100, 50000)) for n in range(options['deposits'])
+        ))
+        elapsed = time.perf_counter() - start
+
+        await app.aclose()
+        await fake.aclose()
+        return timings, errors, elapsed
+
+    def _check_balances(self):
+        wallets = Wallet.objects.filter(user__email__startswith=EMAIL_PREFIX)
+        balances = wallets.aggregate(total=Sum('balance'))['total'] or 0
+        ledger = LedgerEntry.objects.filter(wallet__in=wallets).aggregate(total=Sum('amount'))['total'] or 0
+        deposits = Transaction.objects.filter(
+            wallet__in=wallets, transaction_type='deposit', status='completed'
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        summary = f"wallet balances {balances}, ledger {ledger}, completed deposits {deposits}"
+        if balances == ledger == deposits:
+            self.stdout.write(self.style.SUCCESS(f"Consistent: {summary}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"Mismatch: {summary}"))
+        self.stdout.write("Remove the load test data with --cleanup")
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wallet.models import PaystackEvent
+from wallet.webhooks import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Apply queued Paystack webhook events in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events read per pass, each applied in its own transaction')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new events instead of exiting once the queue is empty')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Requeue failed events before processing')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = PaystackEvent.objects.filter(status='failed').update(status='pending')
+            self.stdout.write(f"Requeued {requeued} failed event(s)")
+
+        totals = {}
+        start = time.perf_counter()
+        while True:
+            counts = process_batch(options['batch_size'])
+            for event_status, count in counts.items():
+                totals[event_status] = totals.get(event_status, 0) + count
+
+            if not counts:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+
+        elapsed = time.perf_counter() - start
+        summary = ', '.join(f"{count} {event_status}" for event_status, count in sorted(totals.items())) or 'nothing'
+        self.stdout.write(self.style.SUCCESS(f"Applied events in {elapsed:.2f}s: {summary}"))
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from wallet.disbursements import apply_outcomes, transfer_outcome
+from wallet.models import Transaction
+from wallet.paystack import AsyncRateLimiter, averify_transfer
+
+
+class Command(BaseCommand):
+    help = ('Verify sent loan disbursements still pending against Paystack: complete or fail them in bulk, and '
+            'release those Paystack never received so disburse_loans sends them again')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=10,
+                            help='Minutes since a disbursement was sent (or last updated)')
+        parser.add_argument('--concurrency', type=int, default=50, help='Verifications in flight')
+        parser.add_argument('--rate', type=float, default=100, help='Paystack calls per second at most')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Verified disbursements applied per transaction')
+        parser.add_argument('--limit', type=int, help='Reconcile at most this many disbursements, oldest first')
+        parser.add_argument('--dry-run', action='store_true', help='Verify and report without writing')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        candidates = Transaction.objects.filter(
+            status='pending', transaction_type='loan_disbursement', updated_at__lt=cutoff,
+            paystack_reference__isnull=False
+        ).order_by('updated_at', 'id').values_list('id', 'reference', 'amount', 'paystack_reference')
+        if options['limit']:
+            candidates = candidates[:options['limit']]
+        candidates = list(candidates)
+
+        self.stdout.write(f"{len(candidates)} disbursement(s) sent over {options['older_than']:g} minutes ago")
+        if not candidates:
+            return
+
+        start = time.perf_counter()
+        outcomes, applied = asyncio.run(self._reconcile(candidates, options, start))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Paystack: {self._summary(outcomes)}")
+        if not options['dry_run']:
+            self.stdout.write(f"Applied: {self._summary(applied)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(candidates)} disbursement(s) in {elapsed:.1f}s ({len(candidates) / elapsed:,.0f}/s)"
+        ))
+
+    async def _reconcile(self, candidates, options, start):
+        limiter = AsyncRateLimiter(options['rate'])
+        remaining = iter(candidates)
+        outcomes, applied = {}, {}
+        buffer = {'queued': [], 'succeeded': [], 'failed': [], 'unsent': []}
+        verified = 0
+
+        async def flush():
+            nonlocal buffer
+            batch, buffer = buffer, {name: [] for name in buffer}
+            if not options['dry_run']:
+                for result, count in (await sync_to_async(apply_outcomes)(**batch)).items():
+                    applied[result] = applied.get(result, 0) + count
+            self.stdout.write(
+                f"  {verified}/{len(candidates)} verified ({verified / (time.perf_counter() - start):,.0f}/s)"
+            )
+
+        async def worker():
+            nonlocal verified
+            for transaction_id, reference, amount, paystack_reference in remaining:
+                await limiter.acquire()
+                result = await averify_transfer(reference)
+                outcome = transfer_outcome(result, amount)
+                # Sent without an answer: the transfer code says Paystack has it after all
+                in_flight = paystack_reference == reference
+                if outcome == 'not received' and not in_flight:
+                    outcome = 'unverified'
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                verified += 1
+
+                if in_flight and result['status'] and result['data'].get('transfer_code'):
+                    buffer['queued'].append((transaction_id, result['data']['transfer_code']))
+                if outcome == 'paid':
+                    buffer['succeeded'].append(transaction_id)
+                elif outcome == 'declined':
+                    buffer['failed'].append(transaction_id)
+                elif outcome == 'not received':
+                    buffer['unsent'].append(transaction_id)
+                if sum(len(items) for items in buffer.values()) >= options['batch_size']:
+                    await flush()
+
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        await flush()
+        return outcomes, applied
+
+    def _summary(self, counts):
+        return ', '.join(f"{count} {name}" for name, count in sorted(counts.items()) if count) or 'nothing'
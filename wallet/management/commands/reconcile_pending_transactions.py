@@ -0,0 +1,128 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from wallet.ledger import complete_deposits
+from wallet.models import Transaction
+from wallet.paystack import AsyncRateLimiter, averify_transaction, to_kobo
+
+# Paystack statuses after which a payment can no longer succeed
+FINAL_FAILURES = ('failed', 'reversed')
+# A checkout the customer left can still be paid later, so it only counts as
+# declined once the deposit is older than --abandoned-after
+ABANDONED = 'abandoned'
+
+
+class Command(BaseCommand):
+    help = 'Verify stale pending deposits against Paystack and complete or fail them in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=30, help='Minutes a deposit must have been pending')
+        parser.add_argument(
+            '--abandoned-after', type=float, default=24, help='Hours after which an abandoned checkout is failed'
+        )
+        parser.add_argument('--concurrency', type=int, default=50, help='Verifications in flight')
+        parser.add_argument('--rate', type=float, default=100, help='Paystack calls per second at most')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Verified deposits applied per transaction')
+        parser.add_argument('--limit', type=int, help='Reconcile at most this many deposits, oldest first')
+        parser.add_argument('--dry-run', action='store_true', help='Verify and report without writing')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(minutes=options['older_than'])
+        options['abandoned_cutoff'] = now - timedelta(hours=options['abandoned_after'])
+        candidates = Transaction.objects.filter(
+            status='pending', transaction_type='deposit', created_at__lt=cutoff, paystack_reference__isnull=False
+        ).order_by('created_at', 'id').values_list('id', 'paystack_reference', 'amount', 'created_at')
+        if options['limit']:
+            candidates = candidates[:options['limit']]
+        candidates = list(candidates)
+
+        self.stdout.write(f"{len(candidates)} deposit(s) pending for over {options['older_than']:g} minutes")
+        if not candidates:
+            return
+
+        start = time.perf_counter()
+        outcomes, applied = asyncio.run(self._reconcile(candidates, options, start))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Paystack: {self._summary(outcomes)}")
+        if not options['dry_run']:
+            self.stdout.write(f"Applied: {self._summary(applied)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(candidates)} deposit(s) in {elapsed:.1f}s ({len(candidates) / elapsed:,.0f}/s)"
+        ))
+
+    async def _reconcile(self, candidates, options, start):
+        limiter = AsyncRateLimiter(options['rate'])
+        remaining = iter(candidates)
+        outcomes, applied = {}, {}
+        to_complete, to_fail = [], []
+        verified = 0
+
+        async def flush():
+            nonlocal to_complete, to_fail
+            batch = (to_complete, to_fail)
+            to_complete, to_fail = [], []
+            if not options['dry_run']:
+                for result, count in (await sync_to_async(self._apply)(*batch)).items():
+                    applied[result] = applied.get(result, 0) + count
+            self.stdout.write(
+                f"  {verified}/{len(candidates)} verified ({verified / (time.perf_counter() - start):,.0f}/s)"
+            )
+
+        async def worker():
+            nonlocal verified
+            # The workers share one iterator, each takes the next deposit when free
+            for transaction_id, reference, amount, created_at in remaining:
+                await limiter.acquire()
+                outcome = self._outcome(
+                    await averify_transaction(reference), amount, created_at < options['abandoned_cutoff']
+                )
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                verified += 1
+                if outcome == 'paid':
+                    to_complete.append(transaction_id)
+                elif outcome == 'declined':
+                    to_fail.append(transaction_id)
+                if len(to_complete) + len(to_fail) >= options['batch_size']:
+                    await flush()
+
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        await flush()
+        return outcomes, applied
+
+    def _summary(self, counts):
+        return ', '.join(f"{count} {name}" for name, count in sorted(counts.items()) if count) or 'nothing'
+
+    def _outcome(self, result, amount, expired):
+        """What a verification says about a deposit; only 'paid' and 'declined' are acted on"""
+        if not result['status']:
+            return 'unverified'
+        data = result['data']
+        if data.get('status') == 'success':
+            # Paystack amounts are in kobo
+            if int(data.get('amount') or 0) != to_kobo(amount):
+                return 'amount mismatch'
+            return 'paid'
+        if data.get('status') in FINAL_FAILURES:
+            return 'declined'
+        if data.get('status') == ABANDONED:
+            return 'declined' if expired else 'abandoned'
+        return 'still pending'
+
+    def _apply(self, to_complete, to_fail):
+        """Settle a batch of verified deposits, skipping those settled since they were read"""
+        completed = complete_deposits(to_complete)
+        failed = Transaction.objects.filter(id__in=to_fail, status='pending').update(
+            status='failed', updated_at=timezone.now()
+        )
+        return {
+            'completed': len(completed),
+            'failed': failed,
+            'already settled': len(to_complete) + len(to_fail) - len(completed) - failed,
+        }
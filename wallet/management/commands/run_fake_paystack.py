@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wallet.fake_paystack import FakePaystackServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a local stand-in for the Paystack API, for load and integration tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='Latency added to every response')
+        parser.add_argument('--jitter-ms', type=float, default=0.0, help='Up to this much more latency, at random')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of API calls answered with a 500')
+        parser.add_argument('--drop-rate', type=float, default=0.0,
+                            help='Fraction of API calls whose connection is closed without an answer')
+        parser.add_argument('--verify-status', default='success',
+                            help='Status verifications report for transactions not paid through their checkout URL')
+        parser.add_argument('--transfer-failure-rate', type=float, default=0.0,
+                            help='Fraction of queued transfers that fail')
+        parser.add_argument('--webhook-url',
+                            help='Send signed webhooks here, e.g. http://127.0.0.1:8000/api/wallet/webhooks/paystack/')
+        parser.add_argument('--seed', type=int, help='Seed of the injected latency and failures')
+
+    def handle(self, *args, **options):
+        server = FakePaystackServer(
+            (options['host'], options['port']),
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter_ms'] / 1000,
+            error_rate=options['error_rate'],
+            drop_rate=options['drop_rate'],
+            verify_status=options['verify_status'],
+            webhook_url=options['webhook_url'],
+            secret_key=settings.PAYSTACK_SECRET_KEY,
+            seed=options['seed'],
+            transfer_failure_rate=options['transfer_failure_rate'],
+        )
+        self.stdout.write(f"Fake Paystack listening on {server.url}, run the app with PAYSTACK_BASE_URL={server.url}")
+        if options['webhook_url']:
+            self.stdout.write(f"Sending webhooks to {options['webhook_url']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from wallet.ledger import take_snapshots
+from wallet.models import LedgerEntry, Wallet
+
+
+class Command(BaseCommand):
+    help = 'Snapshot wallet balances from the ledger, so balance_at() only scans entries since the last snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report wallets whose balance does not match their ledger entries')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            ledger_total = Coalesce(
+                Subquery(
+                    LedgerEntry.objects.filter(wallet=OuterRef('pk'))
+                    .values('wallet')
+                    .annotate(total=Sum('amount'))
+                    .values('total')
+                ),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+            drift = Wallet.objects.annotate(expected=ledger_total).exclude(balance=F('expected'))
+            mismatched = 0
+            for wallet_id, balance, expected in drift.values_list('id', 'balance', 'expected').iterator():
+                self.stdout.write(f"Wallet #{wallet_id}: balance={balance}, ledger={expected}")
+                mismatched += 1
+            self.stdout.write(f"{mismatched} wallet(s) out of sync")
+            if mismatched:
+                raise SystemExit(1)
+            return
+
+        written = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted {written} wallet balance(s)"))
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:56
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    """Post an opening journal for every wallet holding a balance, so balances equal their ledger sums"""
+    Wallet = apps.get_model('wallet', 'Wallet')
+    LedgerEntry = apps.get_model('wallet', 'LedgerEntry')
+
+    entries = []
+    for wallet_id, balance in Wallet.objects.exclude(balance=0).values_list('id', 'balance').iterator():
+        journal = uuid.uuid4()
+        entries.append(LedgerEntry(journal=journal, account='wallet', wallet_id=wallet_id, amount=balance))
+        entries.append(LedgerEntry(journal=journal, account='opening_balance', amount=-balance))
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal', models.UUIDField(db_index=True)),
+                ('account', models.CharField(choices=[('wallet', 'Wallet'), ('paystack', 'Paystack clearing'), ('payout', 'Payout'), ('loan_funding', 'Loan funding'), ('loan_repayment', 'Loan repayment'), ('opening_balance', 'Opening balance')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='wallet.transaction')),
+                ('wallet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='wallet.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'id'], name='ledger_wallet_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_entry_id', models.BigIntegerField()),
+                ('as_of', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='wallet.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'as_of'], name='snapshot_wallet_as_of_idx')],
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'last_entry_id'), name='snapshot_wallet_entry_unique')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
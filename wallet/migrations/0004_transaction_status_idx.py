@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0003_paystack_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'created_at'], name='transaction_status_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0005_wallet_paystack_customer_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='transaction_wallet_created_idx'),
+        ),
+    ]
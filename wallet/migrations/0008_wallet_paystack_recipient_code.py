@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0007_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='paystack_recipient_code',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
@@ -1,9 +1,14 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from users.models import User
 
 class Wallet(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wallet')
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Paystack customer of the wallet's user, set once the customer exists
+    paystack_customer_code = models.CharField(max_length=50, unique=True, blank=True, null=True)
+    # Paystack transfer recipient (the user's bank account) loan disbursements are paid out to
+    paystack_recipient_code = models.CharField(max_length=50, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -28,12 +33,20 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     reference = models.CharField(max_length=255, unique=True)
-    paystack_reference = models.CharField(max_length=255, blank=True, null=True)
+    paystack_reference = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Reconciliation scans for stale pending transactions
+            models.Index(fields=['status', 'created_at'], name='transaction_status_idx'),
+            # Keyset pages of a wallet's history, newest first
+            models.Index(fields=['wallet', 'created_at', 'id'], name='transaction_wallet_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.transaction_type} - {self.reference}"
 
@@ -56,3 +69,119 @@ class VirtualAccount(models.Model):
     
     def __str__(self):
         return f"{self.user.email}'s Virtual Account"
+
+class LedgerEntry(models.Model):
+    """
+    One leg of a double-entry journal, append-only
+    
+    Every journal (entries sharing a `journal` id) sums to zero. Legs on the
+    'wallet' account carry the wallet they move money in or out of; the
+    other accounts are the system-side counterparties. Wallet.balance is
+    the running sum of a wallet's entries, see wallet.ledger.
+    """
+    ACCOUNT_CHOICES = (
+        ('wallet', 'Wallet'),
+        ('paystack', 'Paystack clearing'),
+        ('payout', 'Payout'),
+        ('loan_funding', 'Loan funding'),
+        ('loan_repayment', 'Loan repayment'),
+        ('opening_balance', 'Opening balance'),
+    )
+    
+    journal = models.UUIDField(db_index=True)
+    account = models.CharField(max_length=20, choices=ACCOUNT_CHOICES)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='ledger_entries', blank=True, null=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='ledger_entries', blank=True, null=True)
+    # Signed: positive credits the account, negative debits it
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            # Tail scans for balance_at: a wallet's entries after a snapshot
+            models.Index(fields=['wallet', 'id'], name='ledger_wallet_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.account} {self.amount} ({self.journal})"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Ledger entries are append-only, post a reversing journal instead")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger entries are append-only, post a reversing journal instead")
+
+class WalletBalanceSnapshot(models.Model):
+    """
+    A wallet's balance including every one of its ledger entries up to last_entry_id
+    
+    Written periodically by the snapshot_wallet_balances command.
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='balance_snapshots')
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+    last_entry_id = models.BigIntegerField()
+    # created_at of the entry at last_entry_id
+    as_of = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'as_of'], name='snapshot_wallet_as_of_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'last_entry_id'], name='snapshot_wallet_entry_unique'),
+        ]
+    
+    def __str__(self):
+        return f"Wallet #{self.wallet_id} balance {self.balance} as of {self.as_of}"
+
+class PaystackEvent(models.Model):
+    """
+    A webhook event as received from Paystack, applied later by process_paystack_events
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    )
+    
+    # Deduplication key, see wallet.webhooks.event_id
+    event_id = models.CharField(max_length=255, unique=True)
+    event = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [
+            # The worker's queue scan
+            models.Index(fields=['status', 'id'], name='paystack_event_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} ({self.event_id})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client's Idempotency-Key and the response it got, see wallet.idempotency
+    
+    Rows are fixed width: the key is stored as a hash of (user, endpoint, key)
+    and the request as a hash of its method, path and body. A row without a
+    status code is a request still in flight.
+    """
+    key_hash = models.CharField(max_length=64, unique=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Idempotency key {self.key_hash[:12]} ({self.status_code or 'in flight'})"
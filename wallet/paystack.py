@@ -1,68 +1,494 @@
+import asyncio
+import decimal
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 import uuid
 import json
+import os
+import random
+import threading
+import time
+import weakref
 from django.conf import settings
 
 # Get the Paystack keys from Django settings
 PAYSTACK_SECRET_KEY = getattr(settings, 'PAYSTACK_SECRET_KEY', 'sk_test_your_paystack_test_key')
-PAYSTACK_BASE_URL = "https://api.paystack.co"
+PAYSTACK_BASE_URL = getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
 
-def generate_reference():
-    """Generate a unique reference for transactions"""
-    return str(uuid.uuid4())
+# Most transfers Paystack takes in one bulk transfer call
+MAX_BULK_TRANSFERS = 100
 
-def initialize_transaction(email, amount, callback_url=None):
+class CircuitOpen(Exception):
+    """Paystack calls are short-circuited after repeated failures"""
+
+class CircuitBreaker:
     """
-    Initialize a payment transaction with Paystack
+    Fail fast while Paystack is down
     
-    Args:
-        email (str): Customer's email address
-        amount (int): Amount in kobo (multiply naira by 100)
-        callback_url (str, optional): URL to redirect to after payment
+    Opens after `failure_threshold` consecutive failures (timeouts,
+    connection errors, 5xx and 429 responses). While open every call fails
+    immediately; after `reset_timeout` seconds one trial call is let
+    through, and its outcome closes or re-opens the circuit. A trial that
+    ends without an outcome (cancelled) frees the slot for the next one.
+    """
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial_in_flight = True
+            return True
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+    
+    def abandon(self):
+        """A call ended without telling anything about Paystack"""
+        with self.lock:
+            self.trial_in_flight = False
+
+class AsyncRateLimiter:
+    """
+    Token bucket capping the rate of calls from one event loop
+    
+    Lets bursts of up to `burst` calls through, then `rate` calls per
+    second. Callers queue on the lock in arrival order.
+    """
+    
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class BasePaystackClient:
+    """
+    Configuration and retry policy shared by the sync and async clients
+    
+    Bounds every call with connect/read timeouts and retries failed
+    idempotent calls with jittered exponential backoff. Non-idempotent
+    calls are only retried when the connection could not be established,
+    i.e. the request was never sent. All calls go through a circuit breaker.
+    """
+    
+    def __init__(self, secret_key=None, base_url=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff=None, pool_size=None, breaker=None):
+        self.base_url = (base_url or PAYSTACK_BASE_URL).rstrip('/')
+        self.connect_timeout = connect_timeout or getattr(settings, 'PAYSTACK_CONNECT_TIMEOUT', 3.05)
+        self.read_timeout = read_timeout or getattr(settings, 'PAYSTACK_READ_TIMEOUT', 10.0)
+        self.max_retries = getattr(settings, 'PAYSTACK_MAX_RETRIES', 2) if max_retries is None else max_retries
+        self.backoff = getattr(settings, 'PAYSTACK_RETRY_BACKOFF', 0.25) if backoff is None else backoff
+        self.pool_size = pool_size or getattr(settings, 'PAYSTACK_POOL_SIZE', 20)
+        self.breaker = breaker or CircuitBreaker(
+            getattr(settings, 'PAYSTACK_BREAKER_THRESHOLD', 5),
+            getattr(settings, 'PAYSTACK_BREAKER_RESET_TIMEOUT', 30.0),
+        )
+        self.headers = {
+            "Authorization": f"Bearer {secret_key or PAYSTACK_SECRET_KEY}",
+            "Content-Type": "application/json"
+        }
+    
+    def retry_delay(self, attempt):
+        # Full jitter, so clients retrying together do not stampede
+        return random.uniform(0, self.backoff * 2 ** attempt)
+    
+    def check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpen("Paystack is unavailable, try again later")
+    
+    def record_response(self, response):
+        """Feed a response to the breaker, returns whether it is a retryable failure"""
+        if response.status_code < 500 and response.status_code != 429:
+            self.breaker.record_success()
+            return False
+        self.breaker.record_failure()
+        return True
+
+class PaystackClient(BasePaystackClient):
+    """
+    HTTP client for the Paystack API
+    
+    Keeps a pooled Session so connections (and their TLS handshakes) are
+    reused across calls. Safe to share between threads.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = (self.connect_timeout, self.read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(self.headers)
+    
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a request to a Paystack API path
         
-    Returns:
-        dict: Response from Paystack API
+        Args:
+            method (str): HTTP method
+            path (str): API path, e.g. '/transaction/initialize'
+            idempotent (bool, optional): Whether the call may be retried, defaults to GET only
+            
+        Returns:
+            Response: The final response, which may still be an error response
+            
+        Raises:
+            CircuitOpen: If the circuit breaker is open
+            requests.RequestException: If the last attempt failed without a response
+        """
+        if idempotent is None:
+            idempotent = method.upper() == 'GET'
+        url = f"{self.base_url}{path}"
+        
+        for attempt in range(self.max_retries + 1):
+            self.check_breaker()
+            
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.ConnectionError as e:
+                self.breaker.record_failure()
+                if last_attempt or not (idempotent or _never_sent(e)):
+                    raise
+            except requests.Timeout:
+                self.breaker.record_failure()
+                if last_attempt or not idempotent:
+                    raise
+            except requests.RequestException:
+                # e.g. a response cut short, the call may have gone through
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            else:
+                if not self.record_response(response) or last_attempt or not idempotent:
+                    return response
+            
+            time.sleep(self.retry_delay(attempt))
+    
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+    
+    def post(self, path, payload, **kwargs):
+        return self.request('POST', path, data=json.dumps(payload), **kwargs)
+
+def _never_sent(error):
+    """A refused or timed-out connect never reached Paystack, so any call is safe to retry"""
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+class AsyncPaystackClient(BasePaystackClient):
     """
-    url = f"{PAYSTACK_BASE_URL}/transaction/initialize"
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
+    asyncio HTTP client for the Paystack API, with the same policy as PaystackClient
+    
+    Its connection pool belongs to the event loop it is first used on, see
+    get_async_client. Close it with aclose.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        max_connections = getattr(settings, 'PAYSTACK_ASYNC_MAX_CONNECTIONS', 100)
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=self.pool_size),
+        )
+        # Calls beyond the connection limit wait here rather than in httpcore,
+        # whose pool rescans its whole queue on every state change
+        self.slots = asyncio.Semaphore(max_connections)
+    
+    async def request(self, method, path, idempotent=None, **kwargs):
+        """Async counterpart of PaystackClient.request, raises httpx.HTTPError instead"""
+        if idempotent is None:
+            idempotent = method.upper() == 'GET'
+        url = f"{self.base_url}{path}"
+        
+        for attempt in range(self.max_retries + 1):
+            self.check_breaker()
+            
+            last_attempt = attempt == self.max_retries
+            try:
+                async with self.slots:
+                    response = await self.client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                if last_attempt or not idempotent:
+                    raise
+            except BaseException:
+                # Cancelled (the client went away) or failed outside the transport
+                self.breaker.abandon()
+                raise
+            else:
+                if not self.record_response(response) or last_attempt or not idempotent:
+                    return response
+            
+            await asyncio.sleep(self.retry_delay(attempt))
+    
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
     
+    async def post(self, path, payload, **kwargs):
+        return await self.request('POST', path, content=json.dumps(payload), **kwargs)
+    
+    async def aclose(self):
+        await self.client.aclose()
+
+_client = None
+_client_pid = None
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_client():
+    """The process-wide PaystackClient, recreated after a fork so workers never share sockets"""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = PaystackClient()
+        _client_pid = os.getpid()
+    return _client
+
+def get_async_client():
+    """The AsyncPaystackClient of the running event loop, closed when the loop shuts down"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncPaystackClient()
+        client.closer = loop.create_task(_close_on_shutdown(client))
+    return client
+
+async def _close_on_shutdown(client):
+    # asyncio.run and asgiref cancel the tasks left on a loop before closing it
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+def generate_reference():
+    """Generate a unique reference for transactions"""
+    return str(uuid.uuid4())
+
+def to_kobo(amount):
+    """An amount in naira as whole kobo, the unit Paystack amounts are in"""
+    return int((decimal.Decimal(str(amount)) * 100).quantize(decimal.Decimal('1')))
+
+# Request payloads and response handling shared by the sync and async API
+
+def _initialize_payload(email, amount, callback_url=None):
     # Reference for tracking the transaction
     reference = generate_reference()
     
     payload = {
         "email": email,
-        "amount": int(amount * 100),  # Convert to kobo (smallest currency unit)
+        "amount": to_kobo(amount),
         "reference": reference,
     }
     
     if callback_url:
         payload["callback_url"] = callback_url
     
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response_data = response.json()
-        
-        if response.status_code == 200 and response_data.get('status'):
-            return {
-                'status': True,
-                'reference': reference,
-                'authorization_url': response_data['data']['authorization_url'],
-                'access_code': response_data['data']['access_code']
-            }
-        else:
-            return {
-                'status': False,
-                'message': response_data.get('message', 'Transaction initialization failed')
+    return reference, payload
+
+def _initialize_result(response, reference):
+    response_data = response.json()
+    
+    if response.status_code == 200 and response_data.get('status'):
+        return {
+            'status': True,
+            'reference': reference,
+            'authorization_url': response_data['data']['authorization_url'],
+            'access_code': response_data['data']['access_code']
+        }
+    else:
+        return {
+            'status': False,
+            'message': response_data.get('message', 'Transaction initialization failed')
+        }
+
+def _verify_result(response):
+    response_data = response.json()
+    
+    if response.status_code == 200 and response_data.get('status'):
+        return {
+            'status': True,
+            'data': response_data['data']
+        }
+    else:
+        return {
+            'status': False,
+            'message': response_data.get('message', 'Transaction verification failed')
+        }
+
+def _dedicated_account_payload(customer_code):
+    return {
+        "customer": customer_code,
+        "preferred_bank": "test-bank", # For test mode
+    }
+
+def _dedicated_account_result(response):
+    response_data = response.json()
+    
+    if response.status_code == 200 and response_data.get('status'):
+        return {
+            'status': True,
+            'data': response_data['data'],
+            'account_number': response_data['data']['account_number'],
+            'bank_name': response_data['data']['bank']['name'],
+            'account_name': response_data['data']['account_name']
+        }
+    else:
+        return {
+            'status': False,
+            'message': response_data.get('message', 'Virtual account creation failed')
+        }
+
+def _customer_found(response):
+    """The customer of a lookup by email, or None"""
+    response_data = response.json()
+    
+    if response.status_code == 200 and response_data.get('status') and response_data['data']:
+        return {
+            'status': True,
+            'data': response_data['data'][0],
+            'message': 'Customer found'
+        }
+    return None
+
+def _customer_payload(email, first_name, last_name, phone=None):
+    payload = {
+        "email": email,
+        "first_name": first_name,
+        "last_name": last_name,
+    }
+    
+    if phone:
+        payload["phone"] = phone
+    
+    return payload
+
+def _customer_created(response):
+    response_data = response.json()
+    
+    if response.status_code == 200 and response_data.get('status'):
+        return {
+            'status': True,
+            'data': response_data['data'],
+            'message': 'Customer created'
+        }
+    else:
+        return {
+            'status': False,
+            'message': response_data.get('message', 'Customer creation failed')
+        }
+
+def _bulk_transfer_payload(transfers, reason=None):
+    return {
+        "currency": "NGN",
+        "source": "balance",
+        "transfers": [
+            {
+                "amount": to_kobo(transfer['amount']),
+                "recipient": transfer['recipient'],
+                "reference": transfer['reference'],
+                "reason": reason or transfer.get('reason', ''),
             }
-    except Exception as e:
+            for transfer in transfers
+        ],
+    }
+
+def _bulk_transfer_result(response):
+    response_data = response.json()
+    
+    if response.status_code == 200 and response_data.get('status'):
+        return {
+            'status': True,
+            'data': response_data['data']
+        }
+    else:
         return {
             'status': False,
-            'message': str(e)
+            'message': response_data.get('message', 'Bulk transfer failed'),
+            # Refused outright, none of the transfers was queued; otherwise the outcome is unknown
+            'rejected': response.status_code < 500
         }
 
+def _transfer_result(response):
+    response_data = response.json()
+    
+    if response.status_code == 200 and response_data.get('status'):
+        return {
+            'status': True,
+            'data': response_data['data']
+        }
+    else:
+        return {
+            'status': False,
+            'message': response_data.get('message', 'Transfer verification failed'),
+            'not_found': response.status_code == 404
+        }
+
+def _error(e):
+    return {
+        'status': False,
+        'message': str(e)
+    }
+
+def initialize_transaction(email, amount, callback_url=None):
+    """
+    Initialize a payment transaction with Paystack
+    
+    Args:
+        email (str): Customer's email address
+        amount (Decimal): Amount in naira, sent to Paystack in kobo
+        callback_url (str, optional): URL to redirect to after payment
+        
+    Returns:
+        dict: Response from Paystack API
+    """
+    reference, payload = _initialize_payload(email, amount, callback_url)
+    
+    try:
+        return _initialize_result(get_client().post('/transaction/initialize', payload), reference)
+    except Exception as e:
+        return _error(e)
+
 def verify_transaction(reference):
     """
     Verify a transaction using its reference
@@ -73,33 +499,12 @@ def verify_transaction(reference):
     Returns:
         dict: Transaction verification details
     """
-    url = f"{PAYSTACK_BASE_URL}/transaction/verify/{reference}"
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     try:
-        response = requests.get(url, headers=headers)
-        response_data = response.json()
-        
-        if response.status_code == 200 and response_data.get('status'):
-            return {
-                'status': True,
-                'data': response_data['data']
-            }
-        else:
-            return {
-                'status': False,
-                'message': response_data.get('message', 'Transaction verification failed')
-            }
+        return _verify_result(get_client().get(f"/transaction/verify/{reference}"))
     except Exception as e:
-        return {
-            'status': False,
-            'message': str(e)
-        }
+        return _error(e)
 
-def create_dedicated_account(customer_email, first_name, last_name, phone=None):
+def create_dedicated_account(customer_email, first_name, last_name, phone=None, customer_code=None):
     """
     Create a dedicated virtual account for a customer
     
@@ -108,52 +513,27 @@ def create_dedicated_account(customer_email, first_name, last_name, phone=None):
         first_name (str): Customer's first name
         last_name (str): Customer's last name
         phone (str, optional): Customer's phone number
+        customer_code (str, optional): Paystack customer code when already known,
+            saves the customer lookup (and creation) round trips
         
     Returns:
         dict: Response from Paystack API
     """
     # First, check if we need to create a customer
-    customer = get_or_create_customer(customer_email, first_name, last_name, phone)
-    
-    if not customer['status']:
-        return customer
-    
-    customer_code = customer['data']['customer_code']
+    if not customer_code:
+        customer = get_or_create_customer(customer_email, first_name, last_name, phone)
+        
+        if not customer['status']:
+            return customer
+        customer_code = customer['data']['customer_code']
     
     # Now create dedicated account
-    url = f"{PAYSTACK_BASE_URL}/dedicated_account"
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "customer": customer_code,
-        "preferred_bank": "test-bank", # For test mode
-    }
+    payload = _dedicated_account_payload(customer_code)
     
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response_data = response.json()
-        
-        if response.status_code == 200 and response_data.get('status'):
-            return {
-                'status': True,
-                'data': response_data['data'],
-                'account_number': response_data['data']['account_number'],
-                'bank_name': response_data['data']['bank']['name'],
-                'account_name': response_data['data']['account_name']
-            }
-        else:
-            return {
-                'status': False,
-                'message': response_data.get('message', 'Virtual account creation failed')
-            }
+        return _dedicated_account_result(get_client().post('/dedicated_account', payload))
     except Exception as e:
-        return {
-            'status': False,
-            'message': str(e)
-        }
+        return _error(e)
 
 def get_or_create_customer(email, first_name, last_name, phone=None):
     """
@@ -168,54 +548,122 @@ def get_or_create_customer(email, first_name, last_name, phone=None):
     Returns:
         dict: Customer details
     """
-    url = f"{PAYSTACK_BASE_URL}/customer"
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     # First try to fetch the customer
     try:
-        response = requests.get(f"{url}?email={email}", headers=headers)
-        response_data = response.json()
-        
-        if response.status_code == 200 and response_data.get('status') and response_data['data']:
-            return {
-                'status': True,
-                'data': response_data['data'][0],
-                'message': 'Customer found'
-            }
+        found = _customer_found(get_client().get('/customer', params={'email': email}))
+        if found:
+            return found
     except Exception:
         # If fetch fails, proceed to create
         pass
     
     # Create the customer
-    payload = {
-        "email": email,
-        "first_name": first_name,
-        "last_name": last_name,
-    }
+    payload = _customer_payload(email, first_name, last_name, phone)
     
-    if phone:
-        payload["phone"] = phone
+    try:
+        return _customer_created(get_client().post('/customer', payload))
+    except Exception as e:
+        return _error(e)
+
+def bulk_transfer(transfers, reason=None):
+    """
+    Queue transfers from the Paystack balance in one call
+    
+    Paystack accepts up to MAX_BULK_TRANSFERS transfers per call and settles
+    them later; the final status of each comes as a transfer.success,
+    transfer.failed or transfer.reversed webhook, or from verify_transfer.
+    
+    Args:
+        transfers (list): Dicts with 'amount' (naira), 'recipient' (recipient code) and 'reference'
+        reason (str, optional): Narration of every transfer
+        
+    Returns:
+        dict: The queued transfers (reference, transfer_code, status) under 'data'
+    """
+    payload = _bulk_transfer_payload(transfers, reason)
     
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response_data = response.json()
+        return _bulk_transfer_result(get_client().post('/transfer/bulk', payload))
+    except Exception as e:
+        return _error(e)
+
+def verify_transfer(reference):
+    """
+    Fetch the status of a transfer by its reference
+    
+    Args:
+        reference (str): Transfer reference
         
-        if response.status_code == 200 and response_data.get('status'):
-            return {
-                'status': True,
-                'data': response_data['data'],
-                'message': 'Customer created'
-            }
-        else:
-            return {
-                'status': False,
-                'message': response_data.get('message', 'Customer creation failed')
-            }
+    Returns:
+        dict: Transfer details; 'not_found' is set when Paystack has no such transfer
+    """
+    try:
+        return _transfer_result(get_client().get(f"/transfer/verify/{reference}"))
     except Exception as e:
-        return {
-            'status': False,
-            'message': str(e)
-        } 
\ No newline at end of file
+        return _error(e)
+
+# asyncio variants, for async views and jobs; same arguments and results
+
+async def ainitialize_transaction(email, amount, callback_url=None):
+    """Async initialize_transaction"""
+    reference, payload = _initialize_payload(email, amount, callback_url)
+    
+    try:
+        return _initialize_result(await get_async_client().post('/transaction/initialize', payload), reference)
+    except Exception as e:
+        return _error(e)
+
+async def averify_transaction(reference):
+    """Async verify_transaction"""
+    try:
+        return _verify_result(await get_async_client().get(f"/transaction/verify/{reference}"))
+    except Exception as e:
+        return _error(e)
+
+async def acreate_dedicated_account(customer_email, first_name, last_name, phone=None, customer_code=None):
+    """Async create_dedicated_account"""
+    if not customer_code:
+        customer = await aget_or_create_customer(customer_email, first_name, last_name, phone)
+        
+        if not customer['status']:
+            return customer
+        customer_code = customer['data']['customer_code']
+    
+    payload = _dedicated_account_payload(customer_code)
+    
+    try:
+        return _dedicated_account_result(await get_async_client().post('/dedicated_account', payload))
+    except Exception as e:
+        return _error(e)
+
+async def aget_or_create_customer(email, first_name, last_name, phone=None):
+    """Async get_or_create_customer"""
+    try:
+        found = _customer_found(await get_async_client().get('/customer', params={'email': email}))
+        if found:
+            return found
+    except Exception:
+        pass
+    
+    payload = _customer_payload(email, first_name, last_name, phone)
+    
+    try:
+        return _customer_created(await get_async_client().post('/customer', payload))
+    except Exception as e:
+        return _error(e)
+
+async def abulk_transfer(transfers, reason=None):
+    """Async bulk_transfer"""
+    payload = _bulk_transfer_payload(transfers, reason)
+    
+    try:
+        return _bulk_transfer_result(await get_async_client().post('/transfer/bulk', payload))
+    except Exception as e:
+        return _error(e)
+
+async def averify_transfer(reference):
+    """Async verify_transfer"""
+    try:
+        return _transfer_result(await get_async_client().get(f"/transfer/verify/{reference}"))
+    except Exception as e:
+        return _error(e)
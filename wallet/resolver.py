@@ -0,0 +1,72 @@
+"""
+The requesting user's wallet, looked up at most once per request
+
+A user's wallet never changes after registration, so the user -> wallet
+id mapping is cached in the default cache (shared by every worker, see
+the CACHES setting) for WALLET_ID_CACHE_TTL seconds and kept current by
+the Wallet signals (see wallet.signals). Views that only need the id skip
+the wallets table on a cache hit, views that need the row get it with one
+primary key lookup. Both are memoized on the request.
+
+Users without a wallet (created before wallets were) get one on first use.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from .models import Wallet
+
+
+def cache_key(user_id):
+    return f"wallet:user:{user_id}:id"
+
+
+def cache_wallet_id(user_id, wallet_id):
+    cache.set(cache_key(user_id), wallet_id, settings.WALLET_ID_CACHE_TTL)
+
+
+def _memo(request):
+    # A REST framework Request wraps the Django one, memoize on the latter so both see it
+    return getattr(request, '_request', request)
+
+
+def wallet_id_for(request):
+    """The id of the requesting user's wallet"""
+    memo = _memo(request)
+    if getattr(memo, '_wallet_id', None) is None:
+        wallet_id = cache.get(cache_key(request.user.pk))
+        memo._wallet_id = wallet_id if wallet_id is not None else wallet_for(request).id
+    return memo._wallet_id
+
+
+def wallet_for(request):
+    """The requesting user's wallet"""
+    memo = _memo(request)
+    if getattr(memo, '_wallet', None) is None:
+        wallet_id = getattr(memo, '_wallet_id', None) or cache.get(cache_key(request.user.pk))
+        wallet = Wallet.objects.filter(pk=wallet_id).first() if wallet_id is not None else None
+        if wallet is None:
+            wallet, created = Wallet.objects.get_or_create(user=request.user)
+            cache_wallet_id(request.user.pk, wallet.id)
+        memo._wallet, memo._wallet_id = wallet, wallet.id
+    return memo._wallet
+
+
+async def awallet_id_for(request):
+    """Async wallet_id_for"""
+    memo = _memo(request)
+    if getattr(memo, '_wallet_id', None) is None:
+        wallet_id = await cache.aget(cache_key(request.user.pk))
+        memo._wallet_id = wallet_id if wallet_id is not None else (await awallet_for(request)).id
+    return memo._wallet_id
+
+
+async def awallet_for(request):
+    """Async wallet_for"""
+    memo = _memo(request)
+    if getattr(memo, '_wallet', None) is None:
+        wallet_id = getattr(memo, '_wallet_id', None) or await cache.aget(cache_key(request.user.pk))
+        wallet = await Wallet.objects.filter(pk=wallet_id).afirst() if wallet_id is not None else None
+        if wallet is None:
+            wallet, created = await Wallet.objects.aget_or_create(user=request.user)
+            await cache.aset(cache_key(request.user.pk), wallet.id, settings.WALLET_ID_CACHE_TTL)
+        memo._wallet, memo._wallet_id = wallet, wallet.id
+    return memo._wallet
@@ -33,4 +33,23 @@ class PaymentInitializeSerializer(serializers.Serializer):
     def validate_amount(self, value):
         if value <= 0:
             raise serializers.ValidationError("Amount must be greater than zero")
-        return value 
\ No newline at end of file
+        return value 
+
+class DateRangeSerializer(serializers.Serializer):
+    """Optional inclusive ?start_date= and ?end_date= query parameters"""
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("start_date must not be after end_date")
+        return data
+
+class TransactionFilterSerializer(DateRangeSerializer):
+    """Query parameters of the transaction history, all optional"""
+    type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPES, required=False)
+    status = serializers.ChoiceField(choices=Transaction.STATUS_CHOICES, required=False)
+
+class StatementSerializer(DateRangeSerializer):
+    """Query parameters of a statement export"""
+    output = serializers.ChoiceField(choices=['csv', 'jsonl'], default='csv')
@@ -0,0 +1,17 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Wallet
+from .resolver import cache_key, cache_wallet_id
+
+
+# Keep the user -> wallet id cache of wallet.resolver current. Bulk inserts
+# send no signals, which is fine: a missing entry is a cache miss.
+@receiver(post_save, sender=Wallet)
+def wallet_saved(sender, instance, **kwargs):
+    cache_wallet_id(instance.user_id, instance.id)
+
+
+@receiver(post_delete, sender=Wallet)
+def wallet_deleted(sender, instance, **kwargs):
+    cache.delete(cache_key(instance.user_id))
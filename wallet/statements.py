@@ -0,0 +1,199 @@
+"""
+Account statements, streamed row by row
+
+A statement merges, by date, the movements of a user's wallet (from the
+ledger, so only money that actually moved) and the loan repayments and
+prepayments they made. Wallet rows carry the running wallet balance, repayment rows the
+running balance of their loan. Rows come from server-side chunked reads
+and are encoded as they go, so memory stays flat however long the history.
+"""
+from datetime import timedelta
+from django.db.models import Sum
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from loans.models import Loan, Prepayment, Repayment
+from .ledger import balance_at
+from .models import LedgerEntry
+from itertools import islice
+import csv
+import decimal
+import heapq
+import json
+
+STATEMENT_COLUMNS = ['date', 'type', 'reference', 'description', 'amount', 'wallet_balance', 'loan', 'loan_balance']
+
+# Rows fetched per round trip
+CHUNK_SIZE = 2000
+
+
+async def statement_rows(wallet, start=None, end=None):
+    """
+    Yield the statement rows of a wallet's user between two datetimes
+
+    Args:
+        wallet (Wallet): The wallet, its user's repayments are included
+        start (datetime, optional): Start of the statement, the beginning of the history if None
+        end (datetime, optional): End of the statement (exclusive), now if None
+
+    Yields:
+        dict: One row per STATEMENT_COLUMNS, wallet and repayment rows merged by date
+    """
+    end = end or timezone.now()
+    wallet_rows = _wallet_rows(wallet.id, start, end)
+    repayment_rows = _repayment_rows(wallet.user_id, start, end)
+    # Both streams are sorted by date; on the same day wallet movements come first
+    async for row in _merge(wallet_rows, repayment_rows, key=lambda row: row.pop('_day')):
+        yield row
+
+
+async def _wallet_rows(wallet_id, start, end):
+    balance = decimal.Decimal('0.00')
+    entries = LedgerEntry.objects.filter(wallet_id=wallet_id, account='wallet', created_at__lt=end)
+    if start is not None:
+        # balance_at includes entries at `when`, the statement starts after them
+        balance = await sync_to_async(balance_at)(wallet_id, start - timedelta(microseconds=1))
+        entries = entries.filter(created_at__gte=start)
+
+    # Entry ids are in commit order per wallet, which is the order balances moved in
+    entries = entries.order_by('id').values_list(
+        'created_at', 'amount', 'transaction__transaction_type', 'transaction__reference',
+        'transaction__description'
+    )
+    async for created_at, amount, transaction_type, reference, description in _aiterate(entries):
+        balance += amount
+        created_at = timezone.localtime(created_at)
+        yield {
+            '_day': created_at.date(),
+            'date': created_at.isoformat(),
+            'type': transaction_type or 'adjustment',
+            'reference': reference or '',
+            'description': description or '',
+            'amount': amount,
+            'wallet_balance': balance,
+            'loan': '',
+            'loan_balance': '',
+        }
+
+
+async def _repayment_rows(user_id, start, end):
+    start_day = timezone.localtime(start).date() if start is not None else None
+    end_day = timezone.localtime(end).date()
+
+    # Loan balances as of the start: the amount less the repayments and prepayments made before it
+    balances = {
+        loan_id: amount async for loan_id, amount in Loan.objects.filter(user_id=user_id).values_list('id', 'amount')
+    }
+    repayments = Repayment.objects.filter(user_id=user_id, status='paid', payment_date__lte=end_day)
+    prepayments = Prepayment.objects.filter(user_id=user_id, payment_date__lte=end_day)
+    if start_day is not None:
+        for earlier in (repayments, prepayments):
+            async for loan_id, paid in earlier.filter(payment_date__lt=start_day).values('loan_id').annotate(
+                paid=Sum('amount')
+            ).values_list('loan_id', 'paid'):
+                balances[loan_id] -= paid
+        repayments = repayments.filter(payment_date__gte=start_day)
+        prepayments = prepayments.filter(payment_date__gte=start_day)
+
+    # Balances move in merged order, so they are applied here rather than in the streams
+    async for row in _merge(_installment_rows(repayments), _prepayment_rows(prepayments), key=lambda row: row['_day']):
+        balances[row['loan']] -= row['amount']
+        # As Loan.calculate_remaining_balance, never below zero
+        row['loan_balance'] = max(balances[row['loan']], decimal.Decimal('0.00'))
+        yield row
+
+
+async def _installment_rows(repayments):
+    repayments = repayments.order_by('payment_date', 'id').values_list(
+        'loan_id', 'amount', 'due_date', 'payment_date', 'transaction_id'
+    )
+    async for loan_id, amount, due_date, payment_date, transaction_id in _aiterate(repayments):
+        yield _loan_row(payment_date, 'loan_repayment', transaction_id, f"Installment due {due_date.isoformat()}",
+                        amount, loan_id)
+
+
+async def _prepayment_rows(prepayments):
+    prepayments = prepayments.order_by('payment_date', 'id').values_list(
+        'loan_id', 'amount', 'payment_date', 'transaction_id'
+    )
+    async for loan_id, amount, payment_date, transaction_id in _aiterate(prepayments):
+        yield _loan_row(payment_date, 'loan_prepayment', transaction_id, 'Prepayment, remaining installments reduced',
+                        amount, loan_id)
+
+
+def _loan_row(payment_date, row_type, transaction_id, description, amount, loan_id):
+    return {
+        '_day': payment_date,
+        'date': payment_date.isoformat(),
+        'type': row_type,
+        'reference': transaction_id or '',
+        'description': description,
+        'amount': amount,
+        'wallet_balance': '',
+        'loan': loan_id,
+        'loan_balance': '',
+    }
+
+
+async def _aiterate(queryset):
+    """
+    Iterate a queryset from async code, CHUNK_SIZE rows per round trip
+
+    QuerySet.aiterator() runs values_list() queries on the event loop in
+    this Django version, so this drives queryset.iterator() (a server-side
+    cursor where the database has them) from sync_to_async instead; its
+    calls all run on the request's one sync thread.
+    """
+    rows = None
+
+    def next_chunk():
+        nonlocal rows
+        if rows is None:
+            rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+        return list(islice(rows, CHUNK_SIZE))
+
+    while True:
+        chunk = await sync_to_async(next_chunk)()
+        for row in chunk:
+            yield row
+        if len(chunk) < CHUNK_SIZE:
+            break
+
+
+async def _merge(*streams, key):
+    """heapq.merge for async iterators: ties go to the earlier stream"""
+    heap = []
+    for index, stream in enumerate(streams):
+        async for row in stream:
+            heap.append((key(row), index, row, stream))
+            break
+    heapq.heapify(heap)
+
+    while heap:
+        _, index, row, stream = heap[0]
+        yield row
+        async for following in stream:
+            heapq.heapreplace(heap, (key(following), index, following, stream))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+class _Echo:
+    """File-like object whose write returns the line, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+async def iter_csv(rows):
+    """Yield statement rows as CSV lines, header first"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(STATEMENT_COLUMNS)
+    async for row in rows:
+        yield writer.writerow([row[column] for column in STATEMENT_COLUMNS])
+
+
+async def iter_jsonl(rows):
+    """Yield statement rows as JSON lines"""
+    async for row in rows:
+        yield json.dumps(row, default=str) + '\n'
@@ -1,3 +1,651 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+import asyncio
+import io
+import json
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+import httpx
+import requests
+from loans.approvals import approve_application
+from loans.models import Loan, LoanApplication
+from loans.reamortization import apply_payment
+from loans.repayments import pay_from_wallet
+from users.models import User
+from wallet.disbursements import apply_outcomes, create_disbursements, transfer_outcome
+from wallet.ledger import (
+    InsufficientFunds, balance_at, complete_deposit, complete_deposits, credit_wallet, debit_wallet, post_journal,
+    reverse_disbursement, take_snapshots
+)
+from wallet.models import IdempotencyKey, LedgerEntry, PaystackEvent, Transaction, VirtualAccount, Wallet
+from wallet.statements import STATEMENT_COLUMNS
+from wallet.paystack import (
+    AsyncPaystackClient, CircuitBreaker, CircuitOpen, PaystackClient, _bulk_transfer_payload, _initialize_payload,
+    get_async_client, to_kobo
+)
+from wallet.webhooks import _load_context as load_context, process_batch, sign, store_event
+
+
+class WalletMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(email='saver@example.com', username='saver')
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+
+    def fund(self, amount, wallet=None):
+        return credit_wallet((wallet or self.wallet).id, Decimal(amount), 'paystack')
+
+    def assert_ledger_balanced(self):
+        self.assertEqual(sum(LedgerEntry.objects.values_list('amount', flat=True)), 0)
+        for wallet in Wallet.objects.all():
+            entries = LedgerEntry.objects.filter(account='wallet', wallet=wallet).values_list('amount', flat=True)
+            self.assertEqual(sum(entries, Decimal('0.00')), wallet.balance)
+
+    def charge_success(self, transaction, kobo, event_id=1):
+        store_event(json.dumps({'event': 'charge.success', 'data': {
+            'id': event_id, 'status': 'success', 'reference': transaction.paystack_reference,
+            'amount': kobo, 'channel': 'card', 'customer': {'email': transaction.wallet.user.email},
+        }}).encode())
+        return process_batch()
+
+
+class WalletTestCase(WalletMixin, TestCase):
+    pass
+
+
+class LedgerTests(WalletTestCase):
+    def create_deposit(self, reference, amount):
+        return Transaction.objects.create(
+            wallet=self.wallet, amount=Decimal(amount), transaction_type='deposit',
+            reference=reference, paystack_reference=reference, status='pending'
+        )
+
+    def test_credits_and_debits_post_balanced_journals(self):
+        self.assertEqual(self.fund('100.00'), Decimal('100.00'))
+        self.assertEqual(debit_wallet(self.wallet.id, Decimal('40.00'), 'loan_repayment'), Decimal('60.00'))
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('60.00'))
+        self.assertEqual(LedgerEntry.objects.count(), 4)
+        self.assert_ledger_balanced()
+
+    def test_overdraft_posts_nothing(self):
+        self.fund('10.00')
+
+        with self.assertRaises(InsufficientFunds):
+            debit_wallet(self.wallet.id, Decimal('10.01'), 'loan_repayment')
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('10.00'))
+        self.assertEqual(LedgerEntry.objects.count(), 2)
+
+    def test_rejects_unbalanced_journals(self):
+        with self.assertRaises(ValueError):
+            post_journal([('wallet', self.wallet.id, Decimal('5.00')), ('paystack', None, Decimal('-4.99'))])
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_deposits_complete_once(self):
+        single = self.create_deposit('ref-single', '5.00')
+        batch = [self.create_deposit(f"ref-batch-{i}", '2.50') for i in range(2)]
+
+        self.assertEqual(complete_deposit(single), Decimal('5.00'))
+        self.assertIsNone(complete_deposit(single))
+        ids = [transaction.id for transaction in batch] + [single.id]
+        self.assertEqual(sorted(complete_deposits(ids)), sorted(t.id for t in batch))
+        self.assertEqual(complete_deposits(ids), [])
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('10.00'))
+        self.assert_ledger_balanced()
+
+    def test_balance_at_agrees_with_and_without_snapshots(self):
+        self.fund('30.00')
+        self.fund('12.00')
+        middle = timezone.now()
+        debit_wallet(self.wallet.id, Decimal('20.00'), 'loan_repayment')
+
+        self.assertEqual(balance_at(self.wallet.id, middle), Decimal('42.00'))
+        self.assertEqual(take_snapshots(), 1)
+        self.assertEqual(take_snapshots(), 0)
+        self.fund('1.00')
+        self.assertEqual(take_snapshots(), 1)
+
+        self.assertEqual(balance_at(self.wallet.id, timezone.now()), Decimal('23.00'))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('23.00'))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('wallet.paystack.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    def test_opens_half_opens_and_closes(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+        self.now += 10
+        self.assertTrue(self.breaker.allow())
+        # One trial at a time
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now += 10
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.now += 10
+        self.assertTrue(self.breaker.allow())
+
+    def test_cancelled_async_trial_frees_the_slot(self):
+        client = AsyncPaystackClient(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.1), max_retries=0)
+        client.breaker.record_failure()
+        self.now += 1
+        client.client.request = mock.AsyncMock(side_effect=asyncio.CancelledError)
+
+        with self.assertRaises(asyncio.CancelledError):
+            async_to_sync(client.request)('GET', '/bank')
+
+        self.assertTrue(client.breaker.allow())
+
+    def test_cut_short_sync_trial_counts_as_a_failure(self):
+        client = PaystackClient(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.1), max_retries=0)
+        client.breaker.record_failure()
+        self.now += 1
+        client.session.request = mock.Mock(side_effect=requests.exceptions.ChunkedEncodingError)
+
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            client.request('GET', '/bank')
+        with self.assertRaises(CircuitOpen):
+            client.request('GET', '/bank')
+
+        self.now += 1
+        self.assertTrue(client.breaker.allow())
+
+
+class AsyncClientTests(SimpleTestCase):
+    async def current_client(self):
+        client = get_async_client()
+        self.assertIs(get_async_client(), client)
+        return client
+
+    def test_one_client_per_loop_closed_with_it(self):
+        first = asyncio.run(self.current_client())
+        second = async_to_sync(self.current_client)()
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.client.is_closed)
+        self.assertTrue(second.client.is_closed)
+
+
+class AsyncViewTests(WalletTestCase):
+    def create_deposit(self, reference='ref-1', status='pending'):
+        return Transaction.objects.create(
+            wallet=self.wallet, amount=Decimal('5.00'), transaction_type='deposit',
+            reference=reference, paystack_reference=f"ps-{reference}", status=status
+        )
+
+    def verify(self, reference, result):
+        with mock.patch('wallet.views.averify_transaction', mock.AsyncMock(return_value=result)):
+            return self.client.get(f"/api/wallet/verify-payment/{reference}/")
+
+    def test_deposit_fails_its_transaction_on_a_paystack_client_error(self):
+        client = AsyncPaystackClient(max_retries=0)
+        client.client.request = mock.AsyncMock(side_effect=httpx.ConnectError('Connection refused'))
+        with mock.patch('wallet.paystack.get_async_client', return_value=client):
+            response = self.client.post('/api/wallet/wallet/deposit/', {'amount': '5.00'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'status': 'error', 'message': 'Connection refused'})
+        self.assertEqual(Transaction.objects.get().status, 'failed')
+
+    def test_deposit_rejects_an_invalid_amount(self):
+        response = self.client.post('/api/wallet/wallet/deposit/', {'amount': '-1'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', json.loads(response.content))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_verify_payment_completes_a_paid_deposit_once(self):
+        self.create_deposit()
+        paid = {'status': True, 'data': {'status': 'success', 'gateway_response': 'Successful'}}
+
+        response = self.verify('ref-1', paid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(str(json.loads(response.content)['wallet_balance'])), Decimal('5.00'))
+
+        response = self.verify('ref-1', paid)
+        self.assertEqual(json.loads(response.content)['message'], 'Transaction is already completed')
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('5.00'))
+        self.assert_ledger_balanced()
+
+    def test_verify_payment_reports_unpaid_and_unknown_payments(self):
+        self.create_deposit()
+
+        response = self.verify('ref-1', {'status': True, 'data': {'status': 'abandoned', 'gateway_response': 'Abandoned'}})
+        self.assertEqual(json.loads(response.content)['message'], 'Payment verification failed: Abandoned')
+        response = self.verify('ref-1', {'status': False, 'message': 'Read timed out'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.verify('ref-2', None).status_code, 404)
+        self.assertEqual(Transaction.objects.get().status, 'pending')
+
+    def test_virtual_account_not_created_yet(self):
+        response = self.client.get('/api/wallet/wallet/virtual_account/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_statement_rejects_invalid_parameters(self):
+        for query in ('output=pdf', 'start_date=yesterday'):
+            response = self.client.get(f"/api/wallet/statement/?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
+
+class KoboTests(WalletTestCase):
+    def test_every_cent_value_converts_exactly(self):
+        for cents in range(1000):
+            self.assertEqual(to_kobo(Decimal(cents) / 100), cents)
+            self.assertEqual(to_kobo(cents / 100), cents)
+
+    def test_transfers_convert_exactly(self):
+        for amount in (Decimal('0.29'), 0.29, Decimal('1234.57'), 1234.57):
+            transfer, = _bulk_transfer_payload([{'amount': amount, 'recipient': 'RCP_1', 'reference': 'ref'}])['transfers']
+            self.assertEqual(transfer['amount'], to_kobo(amount))
+            result = {'status': True, 'data': {'status': 'success', 'amount': to_kobo(amount)}}
+            self.assertEqual(transfer_outcome(result, amount), 'paid')
+
+    def test_deposit_of_0_29_is_initialized_and_credited_in_full(self):
+        initialize = mock.AsyncMock(return_value={
+            'status': True, 'reference': 'ps-029', 'authorization_url': 'https://checkout.example/ps-029'
+        })
+        with mock.patch('wallet.views.ainitialize_transaction', initialize):
+            response = self.client.post('/api/wallet/wallet/deposit/', {'amount': '0.29'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        amount = initialize.call_args.kwargs['amount']
+        self.assertEqual(_initialize_payload('saver@example.com', amount)[1]['amount'], 29)
+
+        transaction = Transaction.objects.get(paystack_reference='ps-029')
+        self.assertEqual(self.charge_success(transaction, 29), {'processed': 1})
+        transaction.refresh_from_db()
+        self.wallet.refresh_from_db()
+        self.assertEqual(transaction.status, 'completed')
+        self.assertEqual(self.wallet.balance, Decimal('0.29'))
+        self.assert_ledger_balanced()
+
+
+class IdempotencyKeyTests(WalletTestCase):
+    url = '/api/wallet/wallet/deposit/'
+
+    def deposit(self, initialize, amount='10.00', key='key-1'):
+        with mock.patch('wallet.views.ainitialize_transaction', initialize):
+            return self.client.post(self.url, {'amount': amount}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        initialize = mock.AsyncMock(return_value={
+            'status': True, 'reference': 'ps-1', 'authorization_url': 'https://checkout.example/ps-1'
+        })
+
+        first = self.deposit(initialize)
+        retry = self.deposit(initialize)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(retry.content), json.loads(first.content))
+        self.assertEqual(initialize.await_count, 1)
+        self.assertEqual(Transaction.objects.filter(transaction_type='deposit').count(), 1)
+
+        # A new key is a new deposit
+        self.assertEqual(self.deposit(initialize, key='key-2').status_code, 200)
+        self.assertEqual(Transaction.objects.filter(transaction_type='deposit').count(), 2)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        initialize = mock.AsyncMock(return_value={
+            'status': True, 'reference': 'ps-1', 'authorization_url': 'https://checkout.example/ps-1'
+        })
+        self.deposit(initialize)
+
+        self.assertEqual(self.deposit(initialize, amount='20.00').status_code, 422)
+        self.assertEqual(initialize.await_count, 1)
+
+    def test_failed_request_releases_its_key(self):
+        declined = mock.AsyncMock(return_value={'status': False, 'message': 'Paystack unavailable'})
+        self.assertEqual(self.deposit(declined).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        initialize = mock.AsyncMock(return_value={
+            'status': True, 'reference': 'ps-1', 'authorization_url': 'https://checkout.example/ps-1'
+        })
+        response = self.deposit(initialize)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+
+class WalletResolverTests(WalletTestCase):
+    url = '/api/wallet/transactions/'
+
+    def references(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [row['reference'] for row in response.data['results']]
+
+    def test_follows_a_replaced_wallet(self):
+        Transaction.objects.create(wallet=self.wallet, amount=Decimal('1.00'), transaction_type='deposit',
+                                   reference='ref-old', status='completed')
+        self.assertEqual(self.references(), ['ref-old'])
+
+        self.wallet.delete()
+        wallet = Wallet.objects.create(user=self.user)
+        Transaction.objects.create(wallet=wallet, amount=Decimal('1.00'), transaction_type='deposit',
+                                   reference='ref-new', status='completed')
+        self.assertEqual(self.references(), ['ref-new'])
+
+
+class VirtualAccountTests(WalletTestCase):
+    def create(self, customer, account):
+        lookup = mock.AsyncMock(return_value=customer)
+        create = mock.AsyncMock(return_value=account)
+        with mock.patch('wallet.views.aget_or_create_customer', lookup), \
+                mock.patch('wallet.views.acreate_dedicated_account', create):
+            response = self.client.post('/api/wallet/wallet/virtual_account/')
+        return response, lookup, create
+
+    def test_customer_code_is_looked_up_once(self):
+        customer = {'status': True, 'data': {'customer_code': 'CUS_1'}}
+        response, lookup, create = self.create(customer, {'status': False, 'message': 'No account available'})
+        self.assertEqual(response.status_code, 400)
+        lookup.assert_awaited_once()
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.paystack_customer_code, 'CUS_1')
+
+        response, lookup, create = self.create(customer, {
+            'status': True, 'account_number': '0123456789', 'account_name': 'Saver', 'bank_name': 'Wema Bank',
+            'data': {'id': 7},
+        })
+        self.assertEqual(response.status_code, 200)
+        lookup.assert_not_awaited()
+        self.assertEqual(create.call_args.kwargs['customer_code'], 'CUS_1')
+        self.assertEqual(VirtualAccount.objects.get(user=self.user).account_number, '0123456789')
+
+    def test_failed_customer_lookup_saves_nothing(self):
+        response, lookup, create = self.create({'status': False, 'message': 'Customer creation failed'}, None)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['message'], 'Customer creation failed')
+        create.assert_not_awaited()
+        self.wallet.refresh_from_db()
+        self.assertIsNone(self.wallet.paystack_customer_code)
+        self.assertFalse(VirtualAccount.objects.exists())
+
+
+class TransactionHistoryTests(WalletTestCase):
+    url = '/api/wallet/transactions/'
+
+    def setUp(self):
+        super().setUp()
+        # Pairs share a timestamp, so pages must break ties on the id
+        now = timezone.now()
+        for i in range(7):
+            transaction = Transaction.objects.create(
+                wallet=self.wallet, amount=Decimal('1.00'), reference=f"ref-{i}", status='completed',
+                transaction_type='withdrawal' if i == 3 else 'deposit'
+            )
+            Transaction.objects.filter(pk=transaction.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_newest_first_without_gaps_or_repeats(self):
+        pages = [self.get(f"{self.url}?page_size=3")]
+        while pages[-1]['next']:
+            pages.append(self.get(pages[-1]['next']))
+
+        references = [row['reference'] for page in pages for row in page['results']]
+        self.assertEqual(references, ['ref-1', 'ref-0', 'ref-3', 'ref-2', 'ref-5', 'ref-4', 'ref-6'])
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+        self.assertIsNone(pages[0]['previous'])
+
+        previous = self.get(pages[-1]['previous'])
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_filters_and_rejects_bad_cursors(self):
+        rows = self.get(f"{self.url}?type=withdrawal")['results']
+        self.assertEqual([row['reference'] for row in rows], ['ref-3'])
+
+        self.assertEqual(self.client.get(f"{self.url}?cursor=garbage").status_code, 404)
+
+
+class WebhookBatchTests(WalletTestCase):
+    def create_deposit(self, reference, amount):
+        return Transaction.objects.create(
+            wallet=self.wallet, amount=Decimal(amount), transaction_type='deposit',
+            reference=f"ref-{reference}", paystack_reference=reference, status='pending'
+        )
+
+    def test_applies_each_event_and_isolates_failures(self):
+        good = self.create_deposit('ps-good', '10.00')
+        short = self.create_deposit('ps-short', '20.00')
+        for event_id, (transaction, kobo) in enumerate([(good, 1000), (short, 1999)]):
+            store_event(json.dumps({'event': 'charge.success', 'data': {
+                'id': event_id, 'reference': transaction.paystack_reference, 'amount': kobo,
+            }}).encode())
+        store_event(json.dumps({'event': 'subscription.create', 'data': {'id': 9}}).encode())
+
+        self.assertEqual(process_batch(), {'processed': 1, 'failed': 1, 'ignored': 1})
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('10.00'))
+        self.assertEqual(Transaction.objects.get(pk=short.pk).status, 'pending')
+        self.assertIn('does not match', PaystackEvent.objects.get(status='failed').error)
+        self.assert_ledger_balanced()
+        self.assertEqual(process_batch(), {})
+
+    def test_duplicate_deliveries_credit_once(self):
+        deposit = self.create_deposit('ps-dup', '5.00')
+        for _ in range(3):
+            self.charge_success(deposit, 500, event_id=42)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(PaystackEvent.objects.count(), 1)
+        self.assertEqual(self.wallet.balance, Decimal('5.00'))
+
+    def test_payment_for_a_failed_deposit_is_left_for_review(self):
+        deposit = self.create_deposit('ps-late', '5.00')
+        Transaction.objects.filter(pk=deposit.pk).update(status='failed')
+
+        self.assertEqual(self.charge_success(deposit, 500), {'failed': 1})
+        self.assertIn('needs review', PaystackEvent.objects.get().error)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('0.00'))
+
+    def test_payment_for_a_completed_deposit_is_ignored(self):
+        deposit = self.create_deposit('ps-done', '5.00')
+        self.charge_success(deposit, 500, event_id=1)
+
+        self.assertEqual(self.charge_success(deposit, 500, event_id=2), {'ignored': 1})
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('5.00'))
+
+    def test_rejects_missing_and_non_ascii_signatures(self):
+        body = json.dumps({'event': 'charge.success', 'data': {'id': 1}}).encode()
+        for signature in (None, 'é' * 128, sign(body)[:-1]):
+            headers = {} if signature is None else {'HTTP_X_PAYSTACK_SIGNATURE': signature}
+            response = self.client.post('/api/wallet/webhooks/paystack/', body, content_type='application/json', **headers)
+            self.assertEqual(response.status_code, 401)
+
+        response = self.client.post(
+            '/api/wallet/webhooks/paystack/', body, content_type='application/json', HTTP_X_PAYSTACK_SIGNATURE=sign(body)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaystackEvent.objects.count(), 1)
+
+    def test_skips_events_another_worker_applied(self):
+        deposit = self.create_deposit('ps-race', '5.00')
+        store_event(json.dumps({'event': 'charge.success', 'data': {
+            'id': 7, 'reference': 'ps-race', 'amount': 500,
+        }}).encode())
+
+        def applied_elsewhere(events):
+            PaystackEvent.objects.update(status='processed')
+            return load_context(events)
+
+        with mock.patch('wallet.webhooks._load_context', side_effect=applied_elsewhere):
+            self.assertEqual(process_batch(), {})
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, 'pending')
+
+
+class DisbursementTests(WalletTestCase):
+    def setUp(self):
+        super().setUp()
+        application = LoanApplication.objects.create(user=self.user, amount=Decimal('300.00'), reason='tuition')
+        self.loan = approve_application(application, Decimal('0'), 3)
+
+    def disburse(self):
+        create_disbursements(Loan.objects.filter(pk=self.loan.pk))
+        return Transaction.objects.filter(transaction_type='loan_disbursement').order_by('id')
+
+    def test_skips_loans_with_a_pending_or_completed_disbursement(self):
+        first, = self.disburse()
+        self.assertEqual(first.reference, f"loan-disbursement-{self.loan.id}")
+        self.assertEqual(self.disburse().count(), 1)
+
+        apply_outcomes(succeeded=[first.id])
+        self.assertEqual(self.disburse().count(), 1)
+        self.assert_ledger_balanced()
+
+    def test_retries_a_failed_transfer_under_a_new_reference(self):
+        first, = self.disburse()
+        apply_outcomes(failed=[first.id])
+
+        first, second = self.disburse()
+        self.assertEqual(second.reference, f"loan-disbursement-{self.loan.id}-2")
+        self.assertEqual((second.status, second.amount), ('pending', Decimal('300.00')))
+        self.assertEqual(self.disburse().count(), 2)
+
+        apply_outcomes(failed=[second.id])
+        self.assertEqual(self.disburse().last().reference, f"loan-disbursement-{self.loan.id}-3")
+
+    def test_does_not_retry_a_reversed_payout(self):
+        first, = self.disburse()
+        apply_outcomes(succeeded=[first.id])
+        reverse_disbursement(first)
+
+        self.assertEqual(self.disburse().count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('300.00'))
+        self.assert_ledger_balanced()
+
+
+class StatementTests(WalletMixin, TransactionTestCase):
+    # The statement reads through sync_to_async threads, which must see committed rows
+    def statement(self, output):
+        response = self.client.get(f"/api/wallet/statement/?output={output}")
+        self.assertEqual(response.status_code, 200)
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return async_to_sync(read)().decode()
+
+    def test_running_wallet_and_loan_balances(self):
+        application = LoanApplication.objects.create(user=self.user, amount=Decimal('300.00'), reason='tuition')
+        loan = approve_application(application, Decimal('0'), 3)
+        self.fund('250.00')
+        pay_from_wallet(loan.repayments.order_by('due_date').first())
+
+        rows = [json.loads(line) for line in self.statement('jsonl').splitlines()]
+        self.assertEqual(
+            [(row['type'], row['amount'], row['wallet_balance'], row['loan_balance']) for row in rows],
+            [
+                ('adjustment', '250.00', '250.00', ''),
+                ('loan_repayment', '-100.00', '150.00', ''),
+                ('loan_repayment', '100.00', '', '200.00'),
+            ]
+        )
+
+        apply_payment(loan.id, Decimal('30.00'), transaction_id='bank-1')
+        row = json.loads(self.statement('jsonl').splitlines()[-1])
+        self.assertEqual(
+            (row['type'], row['reference'], row['amount'], row['loan_balance']),
+            ('loan_prepayment', 'bank-1', '30.00', '170.00')
+        )
+
+        lines = self.statement('csv').splitlines()
+        self.assertEqual(lines[0], ','.join(STATEMENT_COLUMNS))
+        self.assertEqual(len(lines), 5)
+
+
+class ReconcilePendingTransactionsTests(WalletMixin, TransactionTestCase):
+    # The command applies results from a worker thread, which must see committed rows
+    def reconcile(self, kobo, status='success'):
+        verify = mock.AsyncMock(return_value={'status': True, 'data': {'status': status, 'amount': kobo}})
+        with mock.patch(
+            'wallet.management.commands.reconcile_pending_transactions.averify_transaction', verify
+        ):
+            call_command('reconcile_pending_transactions', older_than=0, stdout=io.StringIO())
+
+    def create_deposit(self, amount):
+        return Transaction.objects.create(
+            wallet=self.wallet, amount=Decimal(amount), transaction_type='deposit',
+            reference='ref-stale', paystack_reference='ps-stale', status='pending'
+        )
+
+    def test_completes_a_0_29_deposit_paid_in_full(self):
+        deposit = self.create_deposit('0.29')
+
+        self.reconcile(29)
+
+        deposit.refresh_from_db()
+        self.wallet.refresh_from_db()
+        self.assertEqual(deposit.status, 'completed')
+        self.assertEqual(self.wallet.balance, Decimal('0.29'))
+        self.assert_ledger_balanced()
+
+    def test_leaves_a_short_payment_pending(self):
+        deposit = self.create_deposit('0.29')
+
+        self.reconcile(28)
+
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, 'pending')
+
+    def test_fails_a_declined_deposit(self):
+        deposit = self.create_deposit('5.00')
+
+        self.reconcile(500, status='failed')
+
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, 'failed')
+
+    def test_fails_an_abandoned_checkout_only_after_the_cutoff(self):
+        deposit = self.create_deposit('5.00')
+
+        self.reconcile(500, status='abandoned')
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, 'pending')
+
+        Transaction.objects.filter(pk=deposit.pk).update(created_at=timezone.now() - timedelta(hours=25))
+        self.reconcile(500, status='abandoned')
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, 'failed')
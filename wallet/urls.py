@@ -8,6 +8,11 @@ router.register(r'transactions', views.TransactionViewSet, basename='transaction
 router.register(r'virtual-accounts', views.VirtualAccountViewSet, basename='virtual-account')
 
 urlpatterns = [
+    # Async views, routed ahead of the router so they sit under the wallet URLs
+    path('wallet/deposit/', views.deposit, name='wallet-deposit'),
+    path('wallet/virtual_account/', views.virtual_account, name='wallet-virtual-account'),
     path('', include(router.urls)),
     path('verify-payment/<str:reference>/', views.verify_payment, name='verify-payment'),
+    path('statement/', views.statement, name='wallet-statement'),
+    path('webhooks/paystack/', views.paystack_webhook, name='paystack-webhook'),
 ] 
\ No newline at end of file
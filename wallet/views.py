@@ -1,11 +1,25 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import viewsets, status, generics
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, action, authentication_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from .models import Wallet, Transaction, VirtualAccount
-from .serializers import WalletSerializer, TransactionSerializer, PaymentInitializeSerializer, VirtualAccountSerializer
-from .paystack import initialize_transaction, verify_transaction, create_dedicated_account
+from .serializers import (
+    WalletSerializer, TransactionSerializer, TransactionFilterSerializer, PaymentInitializeSerializer,
+    StatementSerializer, VirtualAccountSerializer
+)
+from .paystack import ainitialize_transaction, averify_transaction, acreate_dedicated_account, aget_or_create_customer
+from .idempotency import idempotent
+from .ledger import complete_deposit
+from .resolver import awallet_for, awallet_id_for, wallet_for, wallet_id_for
+from .statements import iter_csv, iter_jsonl, statement_rows
+from .webhooks import store_event, verify_signature
+from edufundz.async_api import async_api_view, request_data
+from edufundz.pagination import KeysetPagination
+from datetime import datetime, time, timedelta
 import uuid
 
 # Create your views here.
@@ -18,126 +32,42 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
         return Wallet.objects.filter(user=self.request.user)
     
     def list(self, request, *args, **kwargs):
-        wallet, created = Wallet.objects.get_or_create(user=request.user)
+        wallet = wallet_for(request)
         serializer = self.get_serializer(wallet)
         return Response(serializer.data)
-    
-    @action(detail=False, methods=['post'])
-    def deposit(self, request):
-        """Initiate a deposit to wallet using Paystack"""
-        serializer = PaymentInitializeSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        amount = serializer.validated_data['amount']
-        wallet, created = Wallet.objects.get_or_create(user=request.user)
-        
-        # Generate a unique reference
-        reference = str(uuid.uuid4())
-        
-        # Create a pending transaction
-        transaction = Transaction.objects.create(
-            wallet=wallet,
-            amount=amount,
-            transaction_type='deposit',
-            reference=reference,
-            status='pending',
-            description=f"Deposit of {amount} to wallet"
-        )
-        
-        # Initialize payment with Paystack
-        result = initialize_transaction(
-            email=request.user.email,
-            amount=float(amount)
-        )
-        
-        if result['status']:
-            # Update transaction with Paystack reference
-            transaction.paystack_reference = result['reference']
-            transaction.save()
-            
-            # Return the payment URL
-            return Response({
-                'status': 'success',
-                'transaction_id': transaction.id,
-                'reference': transaction.reference,
-                'payment_url': result['authorization_url']
-            })
-        else:
-            # Update transaction status to failed
-            transaction.status = 'failed'
-            transaction.save()
-            
-            return Response({
-                'status': 'error',
-                'message': result['message']
-            }, status=status.HTTP_400_BAD_REQUEST)
-    
-    @action(detail=False, methods=['get', 'post'])
-    def virtual_account(self, request):
-        """Get or create a virtual account for the user"""
-        wallet, created = Wallet.objects.get_or_create(user=request.user)
-        
-        # Try to get existing virtual account
-        try:
-            virtual_account = VirtualAccount.objects.get(user=request.user)
-            if request.method == 'GET':
-                serializer = VirtualAccountSerializer(virtual_account)
-                return Response(serializer.data)
-        except VirtualAccount.DoesNotExist:
-            if request.method == 'GET':
-                return Response({
-                    'status': 'error',
-                    'message': 'Virtual account not created yet'
-                }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Create virtual account if POST request
-        if request.method == 'POST':
-            # If already exists, return it
-            if 'virtual_account' in locals():
-                return Response({
-                    'status': 'success',
-                    'message': 'Virtual account already exists',
-                    'virtual_account': VirtualAccountSerializer(virtual_account).data
-                })
-            
-            # Create a virtual account with Paystack
-            result = create_dedicated_account(
-                customer_email=request.user.email,
-                first_name=request.user.first_name,
-                last_name=request.user.last_name,
-                phone=request.user.phone_number
-            )
-            
-            if result['status']:
-                # Create virtual account record
-                virtual_account = VirtualAccount.objects.create(
-                    wallet=wallet,
-                    user=request.user,
-                    account_number=result['account_number'],
-                    account_name=result['account_name'],
-                    bank_name=result['bank_name'],
-                    status='active',
-                    paystack_reference=result['data']['dedicated_account_number']
-                )
-                
-                return Response({
-                    'status': 'success',
-                    'message': 'Virtual account created successfully',
-                    'virtual_account': VirtualAccountSerializer(virtual_account).data
-                })
-            else:
-                return Response({
-                    'status': 'error',
-                    'message': result['message']
-                }, status=status.HTTP_400_BAD_REQUEST)
 
 class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The user's wallet transactions, newest first, a page at a time
+    
+    Optional ?type=, ?status=, ?start_date= and ?end_date= (YYYY-MM-DD,
+    inclusive). Pages follow the cursor in `next`, see KeysetPagination.
+    """
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        wallet = Wallet.objects.get(user=self.request.user)
-        return Transaction.objects.filter(wallet=wallet)
+        queryset = Transaction.objects.filter(wallet_id=wallet_id_for(self.request))
+        if self.action != 'list':
+            return queryset
+        
+        filters = TransactionFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        data = filters.validated_data
+        if 'type' in data:
+            queryset = queryset.filter(transaction_type=data['type'])
+        if 'status' in data:
+            queryset = queryset.filter(status=data['status'])
+        # Date bounds as datetime ranges on created_at, so they stay index range conditions
+        if 'start_date' in data:
+            queryset = queryset.filter(created_at__gte=_start_of_day(data['start_date']))
+        if 'end_date' in data:
+            queryset = queryset.filter(created_at__lt=_start_of_day(data['end_date'] + timedelta(days=1)))
+        return queryset
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
 
 class VirtualAccountViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = VirtualAccountSerializer
@@ -146,55 +76,241 @@ class VirtualAccountViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return VirtualAccount.objects.filter(user=self.request.user)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def verify_payment(request, reference):
-    """Verify a payment using Paystack"""
+# Views that call Paystack are async: under the ASGI deployment many
+# in-flight Paystack calls share one event loop instead of parking a thread each
+
+@async_api_view(['POST'])
+@idempotent('deposit')
+async def deposit(request):
+    """Initiate a deposit to wallet using Paystack"""
     try:
-        transaction = Transaction.objects.get(reference=reference)
-        
-        # Only verify pending transactions
-        if transaction.status != 'pending':
-            return Response({
-                'status': 'error',
-                'message': f"Transaction is already {transaction.status}"
-            })
+        serializer = PaymentInitializeSerializer(data=request_data(request))
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    amount = serializer.validated_data['amount']
+    wallet_id = await awallet_id_for(request)
+    
+    # Generate a unique reference
+    reference = str(uuid.uuid4())
+    
+    # Create a pending transaction
+    transaction = await Transaction.objects.acreate(
+        wallet_id=wallet_id,
+        amount=amount,
+        transaction_type='deposit',
+        reference=reference,
+        status='pending',
+        description=f"Deposit of {amount} to wallet"
+    )
+    
+    # Initialize payment with Paystack
+    result = await ainitialize_transaction(
+        email=request.user.email,
+        amount=amount
+    )
+    
+    if result['status']:
+        # Update transaction with Paystack reference
+        transaction.paystack_reference = result['reference']
+        await transaction.asave(update_fields=['paystack_reference', 'updated_at'])
         
-        # Verify with Paystack
-        result = verify_transaction(transaction.paystack_reference)
+        # Return the payment URL
+        return JsonResponse({
+            'status': 'success',
+            'transaction_id': transaction.id,
+            'reference': transaction.reference,
+            'payment_url': result['authorization_url']
+        })
+    else:
+        # Update transaction status to failed
+        transaction.status = 'failed'
+        await transaction.asave(update_fields=['status', 'updated_at'])
         
-        if result['status']:
-            paystack_data = result['data']
-            
-            if paystack_data['status'] == 'success':
-                # Update transaction status
-                transaction.status = 'completed'
-                transaction.save()
-                
-                # Update wallet balance
-                wallet = transaction.wallet
-                wallet.balance += transaction.amount
-                wallet.save()
-                
-                return Response({
-                    'status': 'success',
-                    'message': 'Payment verified successfully',
-                    'transaction': TransactionSerializer(transaction).data,
-                    'wallet_balance': wallet.balance
-                })
-            else:
-                return Response({
-                    'status': 'error',
-                    'message': f"Payment verification failed: {paystack_data['gateway_response']}"
-                })
-        else:
-            return Response({
+        return JsonResponse({
+            'status': 'error',
+            'message': result['message']
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+@async_api_view(['GET', 'POST'])
+@idempotent('virtual_account')
+async def virtual_account(request):
+    """Get or create a virtual account for the user"""
+    # Try to get existing virtual account
+    virtual_account = await VirtualAccount.objects.filter(user=request.user).afirst()
+    
+    if request.method == 'GET':
+        if virtual_account is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Virtual account not created yet'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse(VirtualAccountSerializer(virtual_account).data)
+    
+    # If already exists, return it
+    if virtual_account is not None:
+        return JsonResponse({
+            'status': 'success',
+            'message': 'Virtual account already exists',
+            'virtual_account': VirtualAccountSerializer(virtual_account).data
+        })
+    
+    wallet = await awallet_for(request)
+    
+    # Resolve the Paystack customer once, later calls reuse the stored code
+    if not wallet.paystack_customer_code:
+        customer = await aget_or_create_customer(
+            email=request.user.email,
+            first_name=request.user.first_name,
+            last_name=request.user.last_name,
+            phone=request.user.phone_number
+        )
+        if not customer['status']:
+            return JsonResponse({
                 'status': 'error',
-                'message': result['message']
+                'message': customer['message']
             }, status=status.HTTP_400_BAD_REQUEST)
-            
+        wallet.paystack_customer_code = customer['data']['customer_code']
+        await wallet.asave(update_fields=['paystack_customer_code', 'updated_at'])
+    
+    # Create a virtual account with Paystack
+    result = await acreate_dedicated_account(
+        customer_email=request.user.email,
+        first_name=request.user.first_name,
+        last_name=request.user.last_name,
+        phone=request.user.phone_number,
+        customer_code=wallet.paystack_customer_code
+    )
+    
+    if result['status']:
+        # Create virtual account record
+        virtual_account = await VirtualAccount.objects.acreate(
+            wallet=wallet,
+            user=request.user,
+            account_number=result['account_number'],
+            account_name=result['account_name'],
+            bank_name=result['bank_name'],
+            status='active',
+            paystack_reference=result['data'].get('id')
+        )
+        
+        return JsonResponse({
+            'status': 'success',
+            'message': 'Virtual account created successfully',
+            'virtual_account': VirtualAccountSerializer(virtual_account).data
+        })
+    else:
+        return JsonResponse({
+            'status': 'error',
+            'message': result['message']
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+@async_api_view(['GET'])
+async def verify_payment(request, reference):
+    """Verify a payment using Paystack"""
+    try:
+        transaction = await Transaction.objects.aget(reference=reference)
     except Transaction.DoesNotExist:
-        return Response({
+        return JsonResponse({
             'status': 'error',
             'message': 'Transaction not found'
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    # Only verify pending transactions
+    if transaction.status != 'pending':
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Transaction is already {transaction.status}"
+        })
+    
+    # Verify with Paystack
+    result = await averify_transaction(transaction.paystack_reference)
+    
+    if not result['status']:
+        return JsonResponse({
+            'status': 'error',
+            'message': result['message']
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    paystack_data = result['data']
+    if paystack_data['status'] != 'success':
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Payment verification failed: {paystack_data['gateway_response']}"
+        })
+    
+    # Complete the transaction and credit the wallet through the ledger
+    balance = await sync_to_async(complete_deposit)(transaction)
+    if balance is None:
+        await transaction.arefresh_from_db()
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Transaction is already {transaction.status}"
+        })
+    
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Payment verified successfully',
+        'transaction': TransactionSerializer(transaction).data,
+        'wallet_balance': balance
+    })
+
+@async_api_view(['GET'])
+async def statement(request):
+    """
+    Download the user's statement: wallet movements and loan repayments with running balances
+    
+    Optional ?start_date= and ?end_date= (YYYY-MM-DD, inclusive) and
+    ?output=csv|jsonl. Streamed from an async generator, so under ASGI
+    rows go out as they are read and the first byte leaves at once.
+    """
+    serializer = StatementSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    
+    wallet = await awallet_for(request)
+    start = _start_of_day(data['start_date']) if 'start_date' in data else None
+    end = _start_of_day(data['end_date'] + timedelta(days=1)) if 'end_date' in data else None
+    rows = statement_rows(wallet, start, end)
+    
+    filename = f"statement-{timezone.localdate().isoformat()}"
+    if data['output'] == 'jsonl':
+        response = StreamingHttpResponse(iter_jsonl(rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.jsonl"'
+    else:
+        response = StreamingHttpResponse(iter_csv(rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@throttle_classes([])
+def paystack_webhook(request):
+    """
+    Receive a Paystack webhook event
+    
+    Verifies the signature and stores the raw event, nothing else: events
+    are applied by the process_paystack_events worker, so Paystack gets its
+    acknowledgement without waiting on wallet updates.
+    """
+    body = request.body
+    if not verify_signature(body, request.META.get('HTTP_X_PAYSTACK_SIGNATURE')):
+        return Response({
+            'status': 'error',
+            'message': 'Invalid signature'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    try:
+        store_event(body)
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({'status': 'success'})
+
@@ -0,0 +1,240 @@
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from .ledger import complete_deposit, complete_disbursements, reverse_disbursement
+from .models import PaystackEvent, Transaction, VirtualAccount, Wallet
+import decimal
+import hashlib
+import hmac
+import json
+
+
+def sign(body):
+    """HMAC-SHA512 of a raw request body with the Paystack secret key, as sent in X-Paystack-Signature"""
+    return hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+
+
+def verify_signature(body, signature):
+    """Whether a signature header matches the body, False for a missing or non-ASCII one"""
+    try:
+        signature = (signature or '').encode('ascii')
+    except UnicodeEncodeError:
+        return False
+    return hmac.compare_digest(sign(body).encode(), signature)
+
+
+def event_id(payload, body):
+    """
+    Deduplication key of an event
+
+    Paystack retries a webhook until it is acknowledged and events carry no
+    id of their own, so the key is the event name plus the id of the object
+    it is about, or a hash of the body when there is none.
+    """
+    data = payload.get('data') or {}
+    if isinstance(data, dict) and data.get('id') is not None:
+        return f"{payload['event']}:{data['id']}"
+    return f"{payload['event']}:sha256:{hashlib.sha256(body).hexdigest()}"
+
+
+def store_event(body):
+    """
+    Persist a raw webhook body, ignoring events already received
+
+    A single INSERT ... ON CONFLICT DO NOTHING on the event id.
+
+    Raises:
+        ValueError: If the body is not a JSON event
+    """
+    payload = json.loads(body)
+    if not isinstance(payload, dict) or not payload.get('event'):
+        raise ValueError("Not a Paystack event")
+
+    PaystackEvent.objects.bulk_create([
+        PaystackEvent(event_id=event_id(payload, body), event=payload['event'], payload=payload)
+    ], ignore_conflicts=True)
+
+
+def process_batch(batch_size=500):
+    """
+    Apply the oldest pending events, at most batch_size of them
+
+    Each event is applied and marked in its own transaction, so the wallet
+    rows it locks are released as soon as it commits and no transaction
+    ever holds two wallets in event order. The event row is locked first
+    with SELECT ... FOR UPDATE SKIP LOCKED and must still be pending, so
+    several workers can drain the queue side by side: one skips what
+    another holds or has already applied. A failing event is marked failed
+    (its changes rolled back to a savepoint) without affecting the others.
+
+    Returns:
+        dict: Number of events per resulting status, empty when no event was applied
+    """
+    events = list(PaystackEvent.objects.filter(status='pending').order_by('id')[:batch_size])
+    if not events:
+        return {}
+
+    context = _load_context(events)
+    counts = {}
+    for event in events:
+        with db_transaction.atomic():
+            if not list(PaystackEvent.objects.select_for_update(skip_locked=True).filter(
+                pk=event.pk, status='pending'
+            ).values_list('pk', flat=True)):
+                continue
+
+            handler = HANDLERS.get(event.event)
+            event.attempts += 1
+            try:
+                with db_transaction.atomic():
+                    if handler is None:
+                        event.status, event.error = 'ignored', f"Unhandled event {event.event}"
+                    else:
+                        event.status, event.error = handler(event.payload.get('data') or {}, context)
+            except Exception as e:
+                event.status, event.error = 'failed', str(e)
+            event.processed_at = timezone.now()
+            event.save(update_fields=['status', 'attempts', 'error', 'processed_at'])
+        counts[event.status] = counts.get(event.status, 0) + 1
+    return counts
+
+
+def _load_context(events):
+    """Everything the handlers look up for a batch, in one query per model"""
+    references = set()
+    emails = set()
+    for event in events:
+        data = event.payload.get('data') or {}
+        if data.get('reference'):
+            references.add(data['reference'])
+        email = (data.get('customer') or {}).get('email')
+        if email:
+            emails.add(email)
+
+    return {
+        'transactions': {
+            transaction.paystack_reference: transaction
+            for transaction in Transaction.objects.filter(paystack_reference__in=references)
+        },
+        # Transfers carry the reference they were sent with, see wallet.disbursements
+        'disbursements': {
+            transaction.reference: transaction
+            for transaction in Transaction.objects.filter(
+                reference__in=references, transaction_type='loan_disbursement'
+            )
+        },
+        'wallets': dict(Wallet.objects.filter(user__email__in=emails).values_list('user__email', 'id')),
+        'virtual_accounts': {
+            account.user.email: account
+            for account in VirtualAccount.objects.filter(user__email__in=emails).select_related('user')
+        },
+    }
+
+
+def _charge_success(data, context):
+    """A payment went through: a checkout deposit or a transfer into a dedicated account"""
+    reference = data['reference']
+    amount = decimal.Decimal(data['amount']) / 100
+
+    transaction = context['transactions'].get(reference)
+    if transaction is None:
+        if data.get('channel') != 'dedicated_nuban':
+            return 'ignored', f"No transaction with reference {reference}"
+
+        # Transfers into a dedicated account have no pending transaction to match
+        wallet_id = context['wallets'].get((data.get('customer') or {}).get('email'))
+        if wallet_id is None:
+            raise ValueError("No wallet for the paying customer")
+        transaction, _ = Transaction.objects.get_or_create(
+            reference=reference,
+            defaults={
+                'wallet_id': wallet_id,
+                'amount': amount,
+                'transaction_type': 'deposit',
+                'paystack_reference': reference,
+                'status': 'pending',
+                'description': f"Transfer of {amount} to virtual account",
+            }
+        )
+        context['transactions'][reference] = transaction
+
+    if transaction.transaction_type != 'deposit':
+        return 'ignored', f"Transaction {reference} is a {transaction.transaction_type}"
+    if amount != transaction.amount:
+        raise ValueError(f"Paid amount {amount} does not match transaction amount {transaction.amount}")
+
+    if complete_deposit(transaction) is None:
+        # No longer pending: completed by another event or the verify endpoint, or failed
+        status = Transaction.objects.filter(pk=transaction.pk).values_list('status', flat=True).get()
+        if status == 'completed':
+            return 'ignored', f"Deposit {reference} is already completed"
+        return 'failed', f"Deposit {reference} is {status}, the payment needs review"
+    return 'processed', None
+
+
+def _dedicated_account_assigned(data, context):
+    account = context['virtual_accounts'].get((data.get('customer') or {}).get('email'))
+    if account is None:
+        return 'ignored', "No virtual account for the customer"
+
+    details = data.get('dedicated_account') or {}
+    account.account_number = details.get('account_number', account.account_number)
+    account.account_name = details.get('account_name', account.account_name)
+    account.bank_name = (details.get('bank') or {}).get('name', account.bank_name)
+    account.status = 'active'
+    account.save(update_fields=['account_number', 'account_name', 'bank_name', 'status', 'updated_at'])
+    return 'processed', None
+
+
+def _dedicated_account_failed(data, context):
+    account = context['virtual_accounts'].get((data.get('customer') or {}).get('email'))
+    if account is None:
+        return 'ignored', "No virtual account for the customer"
+
+    account.status = 'inactive'
+    account.save(update_fields=['status', 'updated_at'])
+    return 'processed', None
+
+
+def _transfer_success(data, context):
+    transaction = context['disbursements'].get(data.get('reference'))
+    if transaction is None:
+        return 'ignored', f"No disbursement with reference {data.get('reference')}"
+    if decimal.Decimal(data['amount']) / 100 != transaction.amount:
+        raise ValueError(f"Transferred amount does not match disbursement amount {transaction.amount}")
+
+    complete_disbursements([transaction.id])
+    return 'processed', None
+
+
+def _transfer_failed(data, context):
+    transaction = context['disbursements'].get(data.get('reference'))
+    if transaction is None:
+        return 'ignored', f"No disbursement with reference {data.get('reference')}"
+
+    Transaction.objects.filter(pk=transaction.pk, status='pending').update(status='failed', updated_at=timezone.now())
+    return 'processed', None
+
+
+def _transfer_reversed(data, context):
+    transaction = context['disbursements'].get(data.get('reference'))
+    if transaction is None:
+        return 'ignored', f"No disbursement with reference {data.get('reference')}"
+
+    # Reversed before we saw it succeed is a plain failure, after it the money goes back to the wallet
+    if not Transaction.objects.filter(pk=transaction.pk, status='pending').update(
+        status='failed', updated_at=timezone.now()
+    ):
+        reverse_disbursement(transaction)
+    return 'processed', None
+
+
+# Event name -> handler(data, context) returning (status, error)
+HANDLERS = {
+    'charge.success': _charge_success,
+    'dedicatedaccount.assign.success': _dedicated_account_assigned,
+    'dedicatedaccount.assign.failed': _dedicated_account_failed,
+    'transfer.success': _transfer_success,
+    'transfer.failed': _transfer_failed,
+    'transfer.reversed': _transfer_reversed,
+}